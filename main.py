@@ -1,5 +1,6 @@
 import argparse
 import asyncio
+import json
 import logging
 import os
 import shutil
@@ -76,6 +77,16 @@ def _resolve_index_chunker(
   return effective
 
 
+def _disable_answer_caches_for_eval(config_data: dict) -> None:
+  """Eval сравнивает ответы на перефразировки: кеш ответов выдал бы один ответ на все."""
+  rag_cfg = config_data.setdefault("rag_pipeline", {})
+  for name in ("semantic_cache", "generation_cache"):
+    block = rag_cfg.get(name)
+    if isinstance(block, dict) and block.get("enabled", False):
+      block["enabled"] = False
+      print(f"🔧 rag_pipeline.{name} выключен на время оценки")
+
+
 def _apply_rag_stack_env_overrides(config_data: dict) -> None:
   """Подмена имени моделей из окружения (A/B через test.sh или CI).
 
@@ -118,6 +129,68 @@ def _apply_rag_stack_env_overrides(config_data: dict) -> None:
   _set(("evaluation_model", "name"), "RAG_EVAL_EMBEDDING_MODEL")
 
 
+async def _run_broadcast_cli(container: Container, args) -> None:
+  """main.py broadcast: рассылка из консоли тем же BroadcastService, что и /broadcast."""
+  from aiogram import Bot
+  from aiogram.client.default import DefaultBotProperties
+  from aiogram.enums import ParseMode
+  from src.tg_bot.services.broadcast import latest_unfinished_broadcast
+
+  logging.getLogger("src.tg_bot.services.broadcast").setLevel(logging.INFO)
+  service = container.broadcast_service()
+  broadcast_id = None
+  text = args.text
+  if args.file:
+    with open(args.file, "r", encoding="utf-8") as f:
+      text = f.read()
+  if args.resume:
+    broadcast_id = args.resume
+    if broadcast_id == "latest":
+      broadcast_id = latest_unfinished_broadcast(service.checkpoint_dir)
+      if broadcast_id is None:
+        sys.exit(f"Незавершённых рассылок в {service.checkpoint_dir} нет.")
+
+  bot = Bot(
+      token=os.getenv("TGSERVER__TOKEN"),
+      default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+  )
+  try:
+    stats = await service.run(
+        bot, text, broadcast_id=broadcast_id, resume=bool(args.resume),
+    )
+  finally:
+    await bot.session.close()
+  print(f"📣 Рассылка завершена: {stats.summary()}")
+
+
+async def _run_faq_rebuild(container: Container, config: dict) -> None:
+  """main.py faq-rebuild: qa_test_set + одобренные ответы rag_bot_answers → paths.faq_store."""
+  from src.tg_bot.services.faq_store import approved_faq_entries, build_faq_store
+  from src.util.hf_embeddings import shared_huggingface_embeddings
+
+  logging.getLogger("src.tg_bot.services.faq_store").setLevel(logging.INFO)
+  try:
+    approved = approved_faq_entries(await container.bot_answer_repo().get_faq_approved())
+  except Exception as e:
+    # БД недоступна (индексация на машине без Postgres) — FAQ только из qa_test_set.
+    print(f"⚠️  FAQ: одобренные ответы не прочитаны ({e}), только qa_test_set")
+    approved = []
+  embeddings = shared_huggingface_embeddings(config.get("embedding_model") or {})
+  path = build_faq_store(config, embeddings, approved)
+  if path:
+    print(f"📚 FAQ пересобран: {path} (одобренных ответов: {len(approved)})")
+
+
+async def _run_faq_approve(container: Container, args) -> None:
+  """main.py faq-approve: отметить ответы rag_bot_answers для FAQ (или снять отметку)."""
+  repo = container.bot_answer_repo()
+  for answer_id in args.answer_ids:
+    found = await repo.set_faq_approved(answer_id, not args.revoke, args.url)
+    state = "снято" if args.revoke else "одобрено"
+    print(f"{'✅' if found else '❌'} Ответ {answer_id}: {state if found else 'не найден'}")
+  print("Изменения попадут в FAQ после: python main.py faq-rebuild")
+
+
 # --- MAIN CLI ---
 
 def main():
@@ -236,6 +309,55 @@ def main():
       help="Продолжить с check_points/default_checkpoint.json",
   )
 
+  # BENCH-DISPATCH (разбор и диспетчеризация апдейтов: asyncio+json vs uvloop+orjson)
+  bd_parser = subparsers.add_parser("bench-dispatch")
+  bd_parser.add_argument("--updates", type=int, default=5000,
+                         help="Число синтетических апдейтов на прогон")
+  bd_parser.add_argument("--concurrency", type=int, default=64,
+                         help="Сколько апдейтов обрабатывается одновременно")
+  bd_parser.add_argument("--rounds", type=int, default=3,
+                         help="Прогонов на режим; берётся лучший")
+
+  # BENCH-ROUTING (точность и латентность методов semantic_routing на размеченном наборе)
+  br_parser = subparsers.add_parser("bench-routing")
+  br_parser.add_argument("--dataset", default="config/routing_bench.yaml",
+                         help="YAML {smalltalk: [...], direct_link: [...], rag: [...]}")
+  br_parser.add_argument("--methods", default="regex,embedding,llm,llm_bounded,fused",
+                         help="Методы через запятую")
+  br_parser.add_argument("--concurrency", type=int, default=8,
+                         help="Сколько сообщений роутится одновременно")
+  br_parser.add_argument("--llm", choices=["stub", "replay", "live"], default="stub",
+                         help="LLM роутера: заглушка без сети, записанные ответы или модель из конфига")
+  br_parser.add_argument("--stub-latency-ms", type=float, default=50.0,
+                         help="Задержка ответа заглушки LLM")
+  br_parser.add_argument("--record", default="data/routing/bench_llm_records.json",
+                         help="Файл ответов LLM: пишется при --llm live, читается при --llm replay")
+  br_parser.add_argument("--json", dest="json_output", default=None,
+                         help="Сохранить отчёт в JSON")
+
+  # FAQ (готовые ответы на первый вопрос сессии, bot.faq)
+  subparsers.add_parser("faq-rebuild")
+  fa_parser = subparsers.add_parser("faq-approve")
+  fa_parser.add_argument("answer_ids", type=int, nargs="+",
+                         help="id строк rag_bot_answers")
+  fa_parser.add_argument("--url", default=None,
+                         help="Ссылка на источник, которую FAQ добавит к ответу")
+  fa_parser.add_argument("--revoke", action="store_true",
+                         help="Снять одобрение")
+
+  # BROADCAST (рассылка объявления всем пользователям бота)
+  bc_parser = subparsers.add_parser("broadcast")
+  bc_source = bc_parser.add_mutually_exclusive_group(required=True)
+  bc_source.add_argument("--text", help="Текст объявления (HTML-разметка Telegram)")
+  bc_source.add_argument("--file", help="Файл с текстом объявления (UTF-8, HTML)")
+  bc_source.add_argument(
+      "--resume",
+      nargs="?",
+      const="latest",
+      metavar="BROADCAST_ID",
+      help="Продолжить рассылку после сбоя; без id — последнюю незавершённую",
+  )
+
   args = parser.parse_args()
 
   try:
@@ -246,6 +368,9 @@ def main():
 
   _apply_rag_stack_env_overrides(config)
 
+  if args.command in ("test", "answer", "test-matrix"):
+    _disable_answer_caches_for_eval(config)
+
   # --- Переопределение режима из CLI ---
   if hasattr(args, 'eval_mode') and args.eval_mode:
     if 'evaluation_settings' not in config:
@@ -287,6 +412,37 @@ def main():
   if os.environ.get("HYDE_CONSOLE", "").lower() in ("1", "true", "yes"):
     _hyde_lc.setLevel(logging.INFO)
 
+  if args.command == "bench-dispatch":
+    from src.tg_bot.server.bench_dispatch import run_dispatch_benchmark
+    results = run_dispatch_benchmark(
+        args.updates, concurrency=args.concurrency, rounds=args.rounds,
+    )
+    print(f"{'режим':<8} {'цикл':<8} {'json':<7} {'апдейт/с':>10} {'мкс/апдейт':>11}")
+    for row in results:
+      print(
+          f"{row['mode']:<8} {row['loop']:<8} {row['json']:<7} "
+          f"{row['updates_per_second']:>10} {row['us_per_update']:>11}"
+      )
+    return
+
+  if args.command == "bench-routing":
+    from src.pipelines.routing.bench import format_routing_report, run_routing_benchmark
+    results = asyncio.run(run_routing_benchmark(
+        config,
+        args.dataset,
+        methods=[m.strip() for m in args.methods.split(",") if m.strip()],
+        concurrency=args.concurrency,
+        llm_mode=args.llm,
+        stub_latency_ms=args.stub_latency_ms,
+        record_path=args.record,
+    ))
+    print(format_routing_report(results))
+    if args.json_output:
+      with open(args.json_output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+      print(f"Отчёт: {args.json_output}")
+    return
+
   if args.command == "test-matrix":
     from src.evaluation.matrix_runner import run_matrix
     asyncio.run(run_matrix(config, args))
@@ -295,6 +451,18 @@ def main():
   container = Container()
   container.config.from_dict(config)
 
+  if args.command == "broadcast":
+    asyncio.run(_run_broadcast_cli(container, args))
+    return
+
+  if args.command == "faq-rebuild":
+    asyncio.run(_run_faq_rebuild(container, config))
+    return
+
+  if args.command == "faq-approve":
+    asyncio.run(_run_faq_approve(container, args))
+    return
+
   if args.command == "test":
     em = config.get("evaluation_metrics") or {}
     use_judge = bool(em.get("enabled", False))
@@ -361,6 +529,9 @@ def main():
     processor = container.data_processor()
     # Запуск универсального пайплайна индексации
     run_indexing(config, processor, args.mode)
+    faq_cfg = (config.get("bot") or {}).get("faq") or {}
+    if faq_cfg.get("enabled", False):
+      asyncio.run(_run_faq_rebuild(container, config))
 
   elif args.command == "retrieve":
     retrieval_step = container.retrieval_chain()
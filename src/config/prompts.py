@@ -73,6 +73,28 @@ ROUTER_HUMAN_PROMPT = """Категории:
 Сообщение: {query}
 Класс:"""
 
+# Роутинг с ограниченным выводом (semantic_routing.method: llm_bounded): Ollama format=json,
+# num_predict в несколько токенов. Фигурные скобки JSON удвоены: шаблон ChatPromptTemplate.
+ROUTER_JSON_SYSTEM_PROMPT = """Ты классификатор намерений пользователя. Ответь строго JSON-объектом {{"route": "<класс>"}}, где класс — одно из: smalltalk, direct_link, rag. Без пояснений."""
+
+# Роутинг и переформулировка одним вызовом (semantic_routing.method: fused).
+# Фигурные скобки JSON удвоены: шаблон ChatPromptTemplate.
+FUSED_ROUTER_SYSTEM_PROMPT = """Ты классификатор намерений пользователя и оптимизатор поисковых запросов бота ФПМИ БГУ.
+По истории чата и последнему сообщению верни строго один JSON-объект без пояснений:
+{{"route": "smalltalk" | "direct_link" | "rag", "standalone_question": "..."}}
+
+Категории route:
+- smalltalk: приветствия, прощания, благодарности, общие вопросы не по теме факультета (например, "сколько будет 2+2", "какая погода", "расскажи анекдот"), абстрактные рассуждения.
+- direct_link: просьба дать ссылку, сайт, URL; где посмотреть расписание; официальный сайт.
+- rag: любые фактические вопросы ИМЕННО о факультете ФПМИ БГУ, учебе, преподавателях, деканате, баллах, поступлении, правилах, а также уточняющие вопросы по уже обсуждаемым фактам.
+
+standalone_question: последнее сообщение, переформулированное так, чтобы оно было понятно без истории чата.
+Например, если обсуждали "ФПМИ", а пользователь спрашивает "А какой там проходной балл?", верни "Какой проходной балл на ФПМИ?".
+НЕ отвечай на вопрос. Если сообщение уже самостоятельное, верни его как есть."""
+
+FUSED_ROUTER_HUMAN_PROMPT = """Сообщение: {query}
+JSON:"""
+
 # ============================================================================
 # MEMORY & SUMMARIZATION PROMPTS
 # ============================================================================
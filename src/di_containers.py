@@ -42,9 +42,20 @@ from src.pipelines.routing.router import create_semantic_routing_service
 # Импорты Бота
 from src.tg_bot.repositories.implementations import UserRepository, \
   AnswerRepository, SessionRepository
+from src.tg_bot.repositories.write_behind import create_write_behind_answer_repo
 from src.tg_bot.services.implementations import UserService, AnswerService, \
   SessionService
 from src.tg_bot.services.summarizer import SummarizerService
+from src.tg_bot.services.identity_cache import create_identity_cache
+from src.tg_bot.db.history import create_history_prefetcher
+from src.tg_bot.services.answer_streamer import create_answer_streamer
+from src.tg_bot.services.fair_scheduler import create_request_scheduler
+from src.tg_bot.services.active_runs import create_active_run_registry
+from src.tg_bot.services.message_debouncer import create_message_debouncer
+from src.tg_bot.services.speculative_retrieval import create_speculative_retrieval
+from src.tg_bot.services.faq_store import create_faq_fast_path
+from src.tg_bot.services.broadcast import create_broadcast_service
+from src.util.generation_cache import create_generation_cache
 
 logger = logging.getLogger(__name__)
 
@@ -100,11 +111,33 @@ class Container(containers.DeclarativeContainer):
   bot_user_repo = providers.Singleton(UserRepository)
   bot_answer_repo = providers.Singleton(AnswerRepository)
   bot_session_repo = providers.Singleton(SessionRepository)
-  bot_user_service = providers.Factory(UserService, user_repo=bot_user_repo)
+  # Write-behind (bot.write_behind) — только для бота: server-startup подменяет им
+  # bot_answer_repo; eval и CLI пишут ответы синхронно.
+  bot_write_behind_answer_repo = providers.Singleton(
+      create_write_behind_answer_repo,
+      config=config,
+      inner=providers.Singleton(AnswerRepository),
+  )
+  bot_identity_cache = providers.Singleton(create_identity_cache, config=config)
+  bot_user_service = providers.Factory(UserService, user_repo=bot_user_repo,
+                                       cache=bot_identity_cache)
   bot_answer_service = providers.Factory(AnswerService,
                                          answer_repo=bot_answer_repo)
   bot_session_service = providers.Factory(SessionService,
-                                          session_repo=bot_session_repo)
+                                          session_repo=bot_session_repo,
+                                          cache=bot_identity_cache)
+  history_prefetcher = providers.Singleton(
+      create_history_prefetcher, config=config, answer_repo=bot_answer_repo,
+  )
+  answer_streamer = providers.Singleton(create_answer_streamer, config=config)
+  request_scheduler = providers.Singleton(create_request_scheduler, config=config)
+  active_runs = providers.Singleton(create_active_run_registry, config=config)
+  message_debouncer = providers.Singleton(create_message_debouncer, config=config)
+  speculative_retrieval = providers.Singleton(create_speculative_retrieval, config=config)
+  faq_fast_path = providers.Singleton(create_faq_fast_path, config=config)
+  broadcast_service = providers.Singleton(
+      create_broadcast_service, config=config, user_repo=bot_user_repo,
+  )
 
   # --- Retrieval Components ---
   hyde_llm = providers.Callable(
@@ -140,8 +173,9 @@ class Container(containers.DeclarativeContainer):
   # 2. Провайдер реранкера (вернет объект или None)
   reranker = providers.Factory(create_reranker, config=config)
 
-  # 3. Финальная сборка ретривера (Поиск + Реранкер)
-  final_retriever = providers.Factory(
+  # 3. Финальная сборка ретривера (Поиск + Реранкер). Singleton: цепочки и прогрев
+  # server-startup работают с одним экземпляром, модели грузятся один раз на контейнер.
+  final_retriever = providers.Singleton(
       create_final_retriever,
       base_retriever=base_retriever,
       reranker=reranker,
@@ -171,6 +205,9 @@ class Container(containers.DeclarativeContainer):
       timeout=config.memory.summary_timeout_seconds,
   )
 
+  # Singleton: одно соединение с SQLite кеша генерации на процесс, тиры берут этот же экземпляр.
+  generation_cache = providers.Singleton(create_generation_cache, config=config)
+
   rag_chain = providers.Factory(
     create_rag_chain,
     config=config,
@@ -178,6 +215,8 @@ class Container(containers.DeclarativeContainer):
     answer_repo=bot_answer_repo,
     session_repo=bot_session_repo,
     summarizer=summarizer_service,
+    history_prefetcher=history_prefetcher,
+    generation_cache=generation_cache,
   )
 
   chat_only_chain = providers.Factory(
@@ -186,6 +225,7 @@ class Container(containers.DeclarativeContainer):
       answer_repo=bot_answer_repo,
       session_repo=bot_session_repo,
       summarizer=summarizer_service,
+      history_prefetcher=history_prefetcher,
   )
 
   semantic_routing_service = providers.Factory(
@@ -7,7 +7,6 @@
 """
 from __future__ import annotations
 
-import copy
 import json
 import logging
 import os
@@ -18,6 +17,7 @@ from typing import Any, Dict, List, Optional
 
 from src.di_containers import Container
 from src.evaluation.runner import EvaluationPause, TestPipelineRunner
+from src.util.config_merge import deep_merge
 
 logger = logging.getLogger(__name__)
 
@@ -30,23 +30,6 @@ def _sanitize_key(value: str) -> str:
   return s.strip("-") or "x"
 
 
-def deep_merge(base: dict, override: Any) -> dict:
-  """Рекурсивное слияние dict; если override не dict — возвращает base."""
-  result = copy.deepcopy(base)
-  if override is None or not isinstance(override, dict):
-    return result
-
-  def _merge_into(dst: dict, src: dict) -> None:
-    for k, v in src.items():
-      if k in dst and isinstance(dst[k], dict) and isinstance(v, dict):
-        _merge_into(dst[k], v)
-      else:
-        dst[k] = copy.deepcopy(v)
-
-  _merge_into(result, override)
-  return result
-
-
 def checkpoint_path(config: dict) -> str:
   paths = config.get("paths") or {}
   return paths.get("default_checkpoint_path", "check_points/default_checkpoint.json")
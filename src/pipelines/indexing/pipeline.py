@@ -17,7 +17,9 @@ from langchain_qdrant import FastEmbedSparse, QdrantVectorStore, RetrievalMode
 
 from src.interfaces.data_processor_interfaces import DataSourceProcessor
 from src.pipelines.indexing.crawlers.website_crawler import WebsiteCrawler
+from src.pipelines.routing.direct_link_index import build_direct_link_index
 from src.util.hf_embeddings import huggingface_embedding_model_kwargs
+from src.util.index_version import index_version_path, write_index_version
 from src.retrievers.e5_query_embeddings import E5QueryEmbeddings
 from src.util.yaml_parser import TestSetLoader
 
@@ -259,4 +261,8 @@ def run_indexing(config: dict, processor: DataSourceProcessor, mode: str):
     logger.error("Неизвестный retrievers.active_type: %s", active_retriever_type)
     return
 
-  logger.info("Индексация успешно завершена")
\ No newline at end of file
+  # 6. Индекс «заголовок → URL» для ответов direct_link без LLM
+  build_direct_link_index(all_chunks, config)
+
+  version = write_index_version(index_version_path(config))
+  logger.info("Индексация успешно завершена, версия индекса: %s", version)
\ No newline at end of file
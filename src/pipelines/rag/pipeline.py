@@ -3,10 +3,15 @@
 Основной сценарий для бота — create_rag_chain + RunnableWithMessageHistory
 и ReadOnlyPostgresHistory для подгрузки диалога из БД.
 """
+import asyncio
+import hashlib
+import json
 import logging
 import os
 import time
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Dict, Optional
+
+import numpy as np
 from dotenv import load_dotenv
 
 from langchain_core.prompts import PromptTemplate
@@ -31,6 +36,12 @@ from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from src.tg_bot.db.history import ReadOnlyPostgresHistory
+from src.util.generation_cache import GenerationCache, generation_cache_key
+from src.util.index_version import index_version_path, read_index_version
+from src.util.runtime_metrics import runtime_metrics
+from src.util.semantic_cache import SemanticAnswerCache, SemanticCacheEntry
+from src.util.single_flight import SingleFlight
+from src.util.text_processing import normalize_question
 
 load_dotenv()
 
@@ -66,6 +77,7 @@ def get_llm_from_config(provider_config: dict):
     """Строит инстанс LLM по YAML-блоку провайдера (ollama / yandex_gpt).
 
     URL Ollama и секрет Yandex при необходимости читаются из окружения.
+    Для Ollama опционально: num_ctx, num_predict, stop, keep_alive, format ("json").
     """
     if not isinstance(provider_config, dict):
         provider_config = dict(provider_config)
@@ -76,8 +88,9 @@ def get_llm_from_config(provider_config: dict):
             "base_url": os.getenv("OLLAMA_HOST", "http://localhost:11434"),
             "temperature": provider_config.get("temperature", 0.7),
         }
-        if "num_ctx" in provider_config:
-            ollama_kwargs["num_ctx"] = provider_config.get("num_ctx")
+        for key in ("num_ctx", "num_predict", "stop", "keep_alive", "format"):
+            if key in provider_config:
+                ollama_kwargs[key] = provider_config.get(key)
         return Ollama(**ollama_kwargs)
     elif provider_type == "yandex_gpt":
         secret_key = os.getenv("YANDEX_GPT_SECRET")
@@ -168,6 +181,223 @@ def _create_history_aware_retriever_with_timing(
         history_path,
     ).with_config(run_name="chat_retriever_chain")
 
+
+def _with_precomputed_question(
+    history_aware_retriever: Runnable,
+    retriever: BaseRetriever,
+) -> Runnable:
+    """standalone_question во входе (роутер fused или шаг reformulation кеша генерации) — поиск по нему.
+
+    Без этого ключа — прежний history-aware retriever со своей reformulation.
+    """
+    def _precomputed(x: dict) -> str:
+        logger.debug("Поиск по standalone_question: %r", x["standalone_question"])
+        return x["standalone_question"]
+
+    return RunnableBranch(
+        (
+            lambda x: bool(x.get("standalone_question")),
+            RunnableLambda(_precomputed) | retriever,
+        ),
+        history_aware_retriever,
+    ).with_config(run_name="chat_retriever_chain")
+
+
+def _create_reformulation_step(llm: Any, prompt: Any, timing: bool) -> Runnable:
+    """Переформулировка уточняющего вопроса отдельным шагом: ``standalone_question`` во входе.
+
+    Нужна только кешу генерации: поиск (_with_precomputed_question) и ключ кеша видят один
+    и тот же вопрос. Пустая история или готовый standalone_question роутера (fused) — вход
+    без изменений.
+    """
+    reformulate_chain = prompt | llm | StrOutputParser()
+
+    def _reform_sync(x: dict, config: RunnableConfig) -> str:
+        t0 = time.perf_counter()
+        try:
+            return reformulate_chain.invoke(x, config).strip()
+        finally:
+            if timing:
+                logger.info(
+                    "[TIMING] stage=reformulation elapsed=%.2fs",
+                    time.perf_counter() - t0,
+                )
+
+    async def _reform_async(x: dict, config: RunnableConfig) -> str:
+        t0 = time.perf_counter()
+        try:
+            return (await reformulate_chain.ainvoke(x, config)).strip()
+        finally:
+            if timing:
+                logger.info(
+                    "[TIMING] stage=reformulation elapsed=%.2fs",
+                    time.perf_counter() - t0,
+                )
+
+    def _from_router(x: dict) -> dict:
+        if timing and x.get("chat_history"):
+            logger.info(
+                "[TIMING] stage=reformulation elapsed=0.00s (skipped; standalone_question from router)"
+            )
+        return x
+
+    return RunnableBranch(
+        (lambda x: bool(x.get("standalone_question")), RunnableLambda(_from_router)),
+        (
+            lambda x: bool(x.get("chat_history")),
+            RunnablePassthrough.assign(
+                standalone_question=RunnableLambda(_reform_sync, afunc=_reform_async)
+            ),
+        ),
+        RunnablePassthrough(),
+    ).with_config(run_name="reformulation")
+
+
+def _standalone_answer_inputs(inputs: dict) -> dict:
+    """Вход промпта ответа при кеше генерации: standalone-вопрос вместо исходного, без истории.
+
+    Ответ зависит только от того, что хеширует ключ кеша (вопрос и контекст), поэтому
+    одинаковые уточнения разных диалогов делят одну запись.
+    """
+    return {
+        **inputs,
+        "input": inputs.get("standalone_question") or inputs.get("input") or "",
+        "chat_history": [],
+    }
+
+
+def _with_generation_cache(
+    question_answer_chain: Runnable,
+    config: dict,
+    provider_config: dict,
+    cache: Optional[GenerationCache],
+) -> Runnable:
+    """Точный кеш на границе генерации: тот же вопрос по тем же чанкам — ответ без LLM.
+
+    Ключ — hash(standalone-вопрос (или вопрос при пустой истории), chunk_id контекста
+    по порядку, версия промпта, модель, версия индекса). Промпт ответа при этом получает
+    standalone-вопрос и контекст без истории (_standalone_answer_inputs): ответ зависит
+    только от ключа, и уточнения разных диалогов, сведённые к одному вопросу, делят запись.
+    Значение — ответ; память (LRU + TTL) и опционально SQLite. Вход без standalone-вопроса
+    при непустой истории — мимо кеша, с историей в промпте. ``cache`` — экземпляр
+    контейнера (create_generation_cache), None — кеш выключен.
+    """
+    if cache is None:
+        return question_answer_chain
+    standalone_answer_chain = RunnableLambda(_standalone_answer_inputs) | question_answer_chain
+    gc_cfg = (config.get("rag_pipeline") or {}).get("generation_cache") or {}
+    prompt_version = str(
+        gc_cfg.get("prompt_version")
+        or hashlib.sha1(f"{QA_SYSTEM_PROMPT}\x00{QA_HUMAN_PROMPT}".encode("utf-8")).hexdigest()[:12]
+    )
+    provider_config = provider_config if isinstance(provider_config, dict) else dict(provider_config)
+    model = str(provider_config.get("model") or provider_config.get("type") or "")
+    version_path = index_version_path(config)
+
+    def _key(inputs: dict) -> Optional[str]:
+        question = inputs.get("standalone_question") or (
+            None if inputs.get("chat_history") else inputs.get("input")
+        )
+        question = normalize_question(question or "")
+        if not question:
+            return None
+        chunk_ids = [
+            str(doc.metadata.get("chunk_id") or hashlib.md5(doc.page_content.encode("utf-8")).hexdigest())
+            for doc in inputs.get("context") or []
+        ]
+        return generation_cache_key(
+            question,
+            chunk_ids,
+            prompt_version=prompt_version,
+            model=model,
+            index_version=read_index_version(version_path),
+        )
+
+    def _hit(answer: str) -> str:
+        runtime_metrics.incr("rag.generation_cache_hit")
+        logger.info("[TIMING] stage=generation elapsed=0.00s (generation cache hit)")
+        return answer
+
+    def _gc_sync(inputs: dict, config: RunnableConfig | None = None) -> str:
+        key = _key(inputs)
+        if key is None:
+            return question_answer_chain.invoke(inputs, config)
+        cached = cache.get_memory(key) or cache.get_persisted(key)
+        if cached is not None:
+            return _hit(cached)
+        runtime_metrics.incr("rag.generation_cache_miss")
+        answer = standalone_answer_chain.invoke(inputs, config)
+        if str(answer).strip():
+            cache.set_memory(key, answer)
+            cache.persist(key, answer)
+        return answer
+
+    async def _gc_async(
+        inputs: dict, config: RunnableConfig | None = None
+    ) -> AsyncIterator[str]:
+        key = _key(inputs)
+        if key is None:
+            async for token in question_answer_chain.astream(inputs, config):
+                yield token
+            return
+        cached = cache.get_memory(key)
+        if cached is None and cache.persistent:
+            cached = await asyncio.to_thread(cache.get_persisted, key)
+        if cached is not None:
+            yield _hit(cached)
+            return
+        runtime_metrics.incr("rag.generation_cache_miss")
+        parts = []
+        async for token in standalone_answer_chain.astream(inputs, config):
+            parts.append(str(token))
+            yield token
+        # Прогон прерван (отмена, ошибка) — сюда не дойдём, и обрывок ответа не кешируется.
+        answer = "".join(parts)
+        if answer.strip():
+            cache.set_memory(key, answer)
+            if cache.persistent:
+                await asyncio.to_thread(cache.persist, key, answer)
+
+    logger.info(
+        "Кеш генерации: включён (модель %s, промпт %s, SQLite: %s)",
+        model, prompt_version, cache.persistent,
+    )
+    return RunnableLambda(_gc_sync, afunc=_gc_async).with_config(run_name="generation_cache")
+
+
+def _with_prefetched_context(retrieval: Runnable) -> Runnable:
+    """Готовые документы спекулятивного поиска (``prefetched_context`` во входе), если применимы.
+
+    ``prefetched_context`` — SpeculativeRetrieval хендлера (matches / take / cancel):
+    поиск по сырому тексту, начатый параллельно с роутингом. Берётся, только если
+    цепочка искала бы по тому же тексту: standalone-вопрос (роутера или reformulation)
+    или, при пустой истории, сам вопрос. Иначе — отменяется и поиск идёт как обычно.
+    """
+    def _retrieve_sync(x: dict, config: RunnableConfig) -> Any:
+        prefetched = x.get("prefetched_context")
+        if prefetched is not None:
+            prefetched.cancel()
+        return retrieval.invoke(x, config)
+
+    async def _retrieve_async(x: dict, config: RunnableConfig) -> Any:
+        prefetched = x.get("prefetched_context")
+        if prefetched is not None:
+            query = x.get("standalone_question") or (
+                None if x.get("chat_history") else x.get("input")
+            )
+            if query is not None and prefetched.matches(query):
+                try:
+                    return await prefetched.take()
+                except Exception as exc:
+                    logger.warning("Спекулятивный поиск не удался (%s) — ищем заново", exc)
+                    return await retrieval.ainvoke(x, config)
+            prefetched.cancel()
+        return await retrieval.ainvoke(x, config)
+
+    return RunnableLambda(_retrieve_sync, afunc=_retrieve_async).with_config(
+        run_name="chat_retriever_chain"
+    )
+
 # --- ЦЕПОЧКИ ---
 
 def create_search_only_chain(config: dict, retriever: BaseRetriever) -> Runnable:
@@ -222,11 +452,17 @@ def create_rag_chain(
     answer_repo: Any,
     session_repo: Any = None,
     summarizer: Any = None,
+    history_prefetcher: Any = None,
+    generation_cache: Optional[GenerationCache] = None,
 ):
     """Собирает conversational RAG: history-aware retrieve → stuff documents → ответ.
 
     Шаги: (1) LLM для reformulation/answer из LLM_PROVIDER + config.providers;
-    (2) history-aware или ветка без reformulation при пустой истории;
+    (2) history-aware retrieve (или поиск по готовому ``standalone_question`` роутера
+    semantic_routing.method: fused); при кеше генерации reformulation — отдельный шаг до
+    поиска, чтобы ключ кеша и поиск видели один вопрос; готовые документы спекулятивного поиска
+    (``prefetched_context``, bot.speculative_retrieval), если применимы; генерация за точным
+    кешем (rag_pipeline.generation_cache);
     (3) обёртка RunnableWithMessageHistory с историей из БД через get_session_history.
     """
     logger.info(
@@ -240,7 +476,8 @@ def create_rag_chain(
     timing = stage_timing_logs_enabled(config)
     save_prompts = config.get("rag_pipeline", {}).get("save_prompts", {}).get("enabled", False)
 
-    # 1. Умный ретривер (переформулирует вопрос с учетом истории)
+    # 1. Умный ретривер (переформулирует вопрос с учетом истории, если роутер
+    #    не передал готовый standalone_question)
     if timing:
         history_aware_retriever = _create_history_aware_retriever_with_timing(
             llm, retriever, contextualize_q_prompt
@@ -249,15 +486,23 @@ def create_rag_chain(
         history_aware_retriever = create_history_aware_retriever(
             llm, retriever, contextualize_q_prompt
         )
+    history_aware_retriever = _with_prefetched_context(
+        _with_precomputed_question(history_aware_retriever, retriever)
+    )
 
-    # 2. Цепочка ответов (генерирует ответ по найденным документам)
-    question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
+    # 2. Цепочка ответов (генерирует ответ по найденным документам) за точным кешем генерации
+    question_answer_chain = _with_generation_cache(
+        create_stuff_documents_chain(llm, qa_prompt), config, provider_config, generation_cache
+    )
 
     # 3. Общая RAG-цепочка (Поиск + Ответ)
     if timing or save_prompts:
+        # При кеше генерации промпт ответа видит standalone-вопрос без истории — так и сохраняем.
+        prompt_inputs = _standalone_answer_inputs if generation_cache is not None else dict
+
         def _gen_sync(inputs: dict, config: RunnableConfig | None = None) -> str:
             if save_prompts:
-                _save_prompt_to_file(inputs, qa_prompt)
+                _save_prompt_to_file(prompt_inputs(inputs), qa_prompt)
             t0 = time.perf_counter()
             try:
                 return question_answer_chain.invoke(inputs, config)
@@ -268,12 +513,23 @@ def create_rag_chain(
                         time.perf_counter() - t0,
                     )
 
-        async def _gen_async(inputs: dict, config: RunnableConfig | None = None) -> str:
+        async def _gen_async(
+            inputs: dict, config: RunnableConfig | None = None
+        ) -> AsyncIterator[str]:
+            # Async-генератор: astream отдаёт токены дальше, ainvoke склеивает их сам.
             if save_prompts:
-                _save_prompt_to_file(inputs, qa_prompt)
+                _save_prompt_to_file(prompt_inputs(inputs), qa_prompt)
             t0 = time.perf_counter()
+            first_token_logged = False
             try:
-                return await question_answer_chain.ainvoke(inputs, config)
+                async for token in question_answer_chain.astream(inputs, config):
+                    if timing and not first_token_logged:
+                        first_token_logged = True
+                        logger.info(
+                            "[TIMING] stage=generation_first_token elapsed=%.2fs",
+                            time.perf_counter() - t0,
+                        )
+                    yield token
             finally:
                 if timing:
                     logger.info(
@@ -294,6 +550,12 @@ def create_rag_chain(
             history_aware_retriever, question_answer_chain
         )
 
+    # Кеш генерации: reformulation отдельным шагом, standalone_question видят и поиск, и ключ.
+    # Без кеша переформулирует history-aware retriever выше, лишнего шага в цепочке нет.
+    if generation_cache is not None:
+        rag_chain = _create_reformulation_step(llm, contextualize_q_prompt, timing) | rag_chain
+    rag_chain = _with_semantic_cache(_with_single_flight(rag_chain, config), config)
+
     # 4. Функция для получения истории из нашей БД
     mem = config.get("memory") or {}
 
@@ -306,6 +568,7 @@ def create_rag_chain(
             window_size=int(mem.get("window_size", 5)),
             summarization_threshold=int(mem.get("summarization_threshold", 4)),
             memory_enabled=bool(mem.get("enabled", False)),
+            prefetcher=history_prefetcher,
         )
 
     # 5. Оборачиваем в менеджер памяти
@@ -321,6 +584,139 @@ def create_rag_chain(
     return conversational_rag_chain
 
 
+def _with_single_flight(rag_chain: Runnable, config: dict) -> Runnable:
+    """Одинаковые вопросы без истории, пришедшие одновременно, делят один прогон.
+
+    Ключ — нормализованный вопрос + версия индекса: при пустой chat_history вопрос
+    и есть standalone-вопрос (reformulation не вызывается). Вопросы с историей и
+    sync invoke идут мимо реестра.
+    """
+    sf_cfg = (config.get("rag_pipeline") or {}).get("single_flight") or {}
+    if not sf_cfg.get("enabled", False):
+        return rag_chain
+    flights: SingleFlight = SingleFlight("rag.single_flight")
+    version_path = index_version_path(config)
+
+    # Параметр обязан называться config: RunnableLambda передаёт конфиг прогона
+    # (callbacks, теги, run_name) только так. Общий прогон идёт с конфигом первого запроса.
+    def _sf_sync(inputs: dict, config: RunnableConfig | None = None) -> dict:
+        return rag_chain.invoke(inputs, config)
+
+    async def _sf_async(
+        inputs: dict, config: RunnableConfig | None = None
+    ) -> AsyncIterator[dict]:
+        question = normalize_question(inputs.get("input") or "")
+        if inputs.get("chat_history") or not question:
+            async for chunk in rag_chain.astream(inputs, config):
+                yield chunk
+            return
+        key = (question, read_index_version(version_path))
+        async for chunk in flights.stream(
+            key, lambda: rag_chain.astream(inputs, config)
+        ):
+            yield chunk
+
+    logger.info("RAG single-flight: включён (ключ — вопрос без истории + версия индекса)")
+    return RunnableLambda(_sf_sync, afunc=_sf_async).with_config(run_name="single_flight")
+
+
+def _with_semantic_cache(rag_chain: Runnable, config: dict) -> Runnable:
+    """Перефразированный вопрос без истории, на который недавно уже ответили, — ответ из кеша.
+
+    Вектор вопроса (embedding_model, как у ретривера) сравнивается с матрицей недавних
+    ответов (SemanticAnswerCache, LRU + TTL); близость не ниже ``threshold`` — ответ и
+    документы контекста из кеша без retrieval и генерации. Кеш очищается при смене версии
+    индекса. Вопросы с историей (уточнения зависят от диалога) и sync invoke идут мимо.
+    """
+    sc_cfg = (config.get("rag_pipeline") or {}).get("semantic_cache") or {}
+    if not sc_cfg.get("enabled", False):
+        return rag_chain
+    from src.util.hf_embeddings import shared_huggingface_embeddings
+
+    embeddings = shared_huggingface_embeddings(config.get("embedding_model") or {})
+    version_path = index_version_path(config)
+    ttl = sc_cfg.get("ttl_seconds", 1800)
+    # Размерность известна только после первого encode — кеш создаётся лениво.
+    holder: Dict[str, SemanticAnswerCache] = {}
+
+    def _cache(dim: int) -> SemanticAnswerCache:
+        cache = holder.get("cache")
+        if cache is None:
+            cache = holder.setdefault("cache", SemanticAnswerCache(
+                dim,
+                max_entries=int(sc_cfg.get("max_entries", 1000)),
+                ttl_seconds=float(ttl) if ttl else None,
+                threshold=float(sc_cfg.get("threshold", 0.95)),
+            ))
+        return cache
+
+    def _encode(question: str) -> np.ndarray:
+        vec = np.asarray(embeddings.embed_query(question), dtype=np.float32)
+        return vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+    def _sc_sync(inputs: dict, config: RunnableConfig | None = None) -> dict:
+        return rag_chain.invoke(inputs, config)
+
+    async def _sc_async(
+        inputs: dict, config: RunnableConfig | None = None
+    ) -> AsyncIterator[dict]:
+        question = (inputs.get("input") or "").strip()
+        if inputs.get("chat_history") or not question:
+            if question:
+                runtime_metrics.incr("rag.semantic_cache_bypass_history")
+            async for chunk in rag_chain.astream(inputs, config):
+                yield chunk
+            return
+        version = read_index_version(version_path)
+        t0 = time.perf_counter()
+        # encode держит CPU ~десятки мс: в потоке, чтобы не останавливать event loop.
+        vector = await asyncio.to_thread(_encode, question)
+        cache = _cache(vector.shape[0])
+        hit, invalidated = cache.lookup(vector, version)
+        runtime_metrics.observe("rag.semantic_cache_lookup_seconds", time.perf_counter() - t0)
+        if invalidated:
+            runtime_metrics.incr("rag.semantic_cache_invalidated")
+            logger.info("RAG semantic cache: новая версия индекса %s — кеш очищен", version)
+        if hit is not None:
+            runtime_metrics.incr("rag.semantic_cache_hit")
+            logger.info(
+                "RAG semantic cache: попадание score=%.3f вопрос=%r chunks=%s",
+                hit.score, hit.entry.question, len(hit.entry.chunk_ids),
+            )
+            yield {"answer": hit.entry.answer, "context": list(hit.entry.context)}
+            return
+        runtime_metrics.incr("rag.semantic_cache_miss")
+
+        answer_parts = []
+        context = None
+        async for chunk in rag_chain.astream(inputs, config):
+            if isinstance(chunk, dict):
+                if chunk.get("context") is not None:
+                    context = chunk["context"]
+                if chunk.get("answer") is not None:
+                    answer_parts.append(str(chunk["answer"]))
+            yield chunk
+        answer = "".join(answer_parts).strip()
+        if answer and context is not None:
+            chunk_ids = tuple(
+                str(doc.metadata.get("chunk_id"))
+                for doc in context
+                if doc.metadata.get("chunk_id")
+            )
+            cache.add(
+                vector,
+                SemanticCacheEntry(question, answer, chunk_ids, tuple(context)),
+                version,
+            )
+            runtime_metrics.set_gauge("rag.semantic_cache_entries", len(cache))
+
+    logger.info(
+        "RAG semantic cache: включён (порог %s, вопросы без истории, сброс при переиндексации)",
+        sc_cfg.get("threshold", 0.95),
+    )
+    return RunnableLambda(_sc_sync, afunc=_sc_async).with_config(run_name="semantic_cache")
+
+
 def _inject_non_rag_system_prompt(input_dict: dict) -> dict:
   """Убирает служебный non_rag_label, подставляет system_prompt для chat-only ветки."""
   label = input_dict.get("non_rag_label") or "smalltalk"
@@ -337,6 +733,7 @@ def create_chat_only_chain(
     answer_repo: Any,
     session_repo: Any = None,
     summarizer: Any = None,
+    history_prefetcher: Any = None,
 ):
   """Диалог с тем же PostgresHistory/summary, что и RAG, но без retrieval по документам."""
   provider_name = os.getenv("LLM_PROVIDER", "ollama")
@@ -351,13 +748,16 @@ def create_chat_only_chain(
   
   save_prompts = config.get("rag_pipeline", {}).get("save_prompts", {}).get("enabled", False)
   if save_prompts:
-      def _chat_sync(inputs: dict, config_run: RunnableConfig | None = None) -> str:
+      def _chat_sync(inputs: dict, config: RunnableConfig | None = None) -> str:
           _save_prompt_to_file(inputs, chat_prompt)
-          return (chat_prompt | llm | StrOutputParser()).invoke(inputs, config_run)
+          return (chat_prompt | llm | StrOutputParser()).invoke(inputs, config)
 
-      async def _chat_async(inputs: dict, config_run: RunnableConfig | None = None) -> str:
+      async def _chat_async(
+          inputs: dict, config: RunnableConfig | None = None
+      ) -> AsyncIterator[str]:
           _save_prompt_to_file(inputs, chat_prompt)
-          return await (chat_prompt | llm | StrOutputParser()).ainvoke(inputs, config_run)
+          async for token in (chat_prompt | llm | StrOutputParser()).astream(inputs, config):
+              yield token
 
       llm_branch = RunnableLambda(_chat_sync, afunc=_chat_async)
   else:
@@ -379,6 +779,7 @@ def create_chat_only_chain(
         window_size=int(mem.get("window_size", 5)),
         summarization_threshold=int(mem.get("summarization_threshold", 4)),
         memory_enabled=bool(mem.get("enabled", False)),
+        prefetcher=history_prefetcher,
     )
 
   return RunnableWithMessageHistory(
@@ -1,13 +1,23 @@
 """Sprint 8: семантическое ветвление запросов в Telegram-боте (config: semantic_routing)."""
 
 from src.pipelines.routing.router import (
+    BoundedLlmSemanticRouting,
+    CachedSemanticRouting,
+    FusedSemanticRouting,
     RoutingDecision,
     SemanticRoutingPort,
     create_semantic_routing_service,
+    routing_llm_configs,
+    routing_uses_llm,
 )
 
 __all__ = [
+    "BoundedLlmSemanticRouting",
+    "CachedSemanticRouting",
+    "FusedSemanticRouting",
     "RoutingDecision",
     "SemanticRoutingPort",
     "create_semantic_routing_service",
+    "routing_llm_configs",
+    "routing_uses_llm",
 ]
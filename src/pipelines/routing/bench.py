@@ -0,0 +1,283 @@
+"""Бенчмарк роутеров на размеченных сообщениях: точность (матрица ошибок) и латентность.
+
+Каждый выбранный метод semantic_routing собирается тем же create_semantic_routing_service,
+что и в боте (без кеша решений), и прогоняется по сообщениям YAML-набора
+``{smalltalk: [...], direct_link: [...], rag: [...]}`` с ограничением параллельности.
+Отчёт: матрица ошибок, accuracy, p50/p95/p99 латентности одного сообщения, сообщений в секунду.
+
+LLM для методов llm / llm_bounded / fused:
+  * ``live`` — модель из конфига (Ollama / YandexGPT);
+  * ``stub`` — заглушка без сети: класс по правилам classify_regex, ответ в формате промпта
+    (слово / JSON с route / JSON с standalone_question) после ``stub_latency_ms``;
+  * ``replay`` — ответы, записанные live-прогоном с ``record_path``, с их же задержкой.
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.language_models.llms import LLM
+from pydantic import Field, PrivateAttr
+
+from src.pipelines.routing.embedding_router import ROUTE_LABELS, load_routing_examples
+from src.pipelines.routing.router import (
+    RoutingDecision,
+    SemanticRoutingPort,
+    classify_regex,
+    create_semantic_routing_service,
+)
+from src.util.runtime_metrics import RuntimeMetrics
+
+logger = logging.getLogger(__name__)
+
+BENCH_METHODS: Tuple[str, ...] = ("regex", "embedding", "llm", "llm_bounded", "fused")
+LLM_MODES: Tuple[str, ...] = ("stub", "replay", "live")
+
+# Последнее «Сообщение: …» перед «Класс:» / «JSON:» — текст пользователя в промптах роутера.
+_PROMPT_QUERY = re.compile(r"Сообщение:\s*(.*)\n\s*(?:Класс|JSON):", re.DOTALL)
+
+
+def _prompt_key(prompt: str) -> str:
+  return hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+
+
+class StubRoutingLLM(LLM):
+  """Заглушка LLM роутера: метка по правилам, формат ответа — по промпту."""
+
+  latency_seconds: float = 0.0
+
+  @property
+  def _llm_type(self) -> str:
+    return "routing-stub"
+
+  def _answer(self, prompt: str) -> str:
+    matches = _PROMPT_QUERY.findall(prompt)
+    query = matches[-1].strip() if matches else ""
+    label = classify_regex(query)
+    if '"standalone_question"' in prompt:
+      return json.dumps({"route": label, "standalone_question": query}, ensure_ascii=False)
+    if '"route"' in prompt:
+      # Как у Ollama со stop ["}"]: закрывающая скобка срезана.
+      return f'{{"route": "{label}"'
+    return label
+
+  def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+    time.sleep(self.latency_seconds)
+    return self._answer(prompt)
+
+  async def _acall(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+    await asyncio.sleep(self.latency_seconds)
+    return self._answer(prompt)
+
+
+class RecordedRoutingLLM(LLM):
+  """Запись (``inner`` задан) или воспроизведение ответов LLM по хешу промпта.
+
+  В записи хранится ответ и его задержка; воспроизведение ждёт ту же задержку,
+  чтобы латентность offline-прогона была похожа на live.
+  """
+
+  inner: Optional[Any] = None
+  records: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
+  _missing: int = PrivateAttr(default=0)
+
+  @property
+  def _llm_type(self) -> str:
+    return "routing-recorded"
+
+  @property
+  def missing(self) -> int:
+    return self._missing
+
+  def _replay(self, prompt: str) -> Tuple[str, float]:
+    record = self.records.get(_prompt_key(prompt))
+    if record is None:
+      self._missing += 1
+      raise KeyError("нет записанного ответа для промпта (перезапишите: --llm live --record)")
+    return str(record["response"]), float(record.get("seconds", 0.0))
+
+  def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+    if self.inner is None:
+      response, seconds = self._replay(prompt)
+      time.sleep(seconds)
+      return response
+    t0 = time.perf_counter()
+    response = str(self.inner.invoke(prompt))
+    self.records[_prompt_key(prompt)] = {"response": response, "seconds": time.perf_counter() - t0}
+    return response
+
+  async def _acall(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+    if self.inner is None:
+      response, seconds = self._replay(prompt)
+      await asyncio.sleep(seconds)
+      return response
+    t0 = time.perf_counter()
+    response = str(await self.inner.ainvoke(prompt))
+    self.records[_prompt_key(prompt)] = {"response": response, "seconds": time.perf_counter() - t0}
+    return response
+
+
+def decision_label(decision: RoutingDecision) -> str:
+  if decision.use_rag:
+    return "rag"
+  return decision.non_rag_label or "smalltalk"
+
+
+def _bench_config(config: dict, method: str) -> dict:
+  cfg = copy.deepcopy(config)
+  block = cfg.setdefault("semantic_routing", {})
+  block["enabled"] = True
+  block["method"] = method
+  # Кеш решений спрятал бы латентность повторов и самого роутера.
+  block["cache"] = {"enabled": False}
+  return cfg
+
+
+async def _run_router(
+    router: SemanticRoutingPort,
+    samples: Sequence[Tuple[str, str]],
+    concurrency: int,
+) -> Dict[str, Any]:
+  semaphore = asyncio.Semaphore(max(1, concurrency))
+  timings = RuntimeMetrics(max_samples=max(1, len(samples)))
+  confusion = {true: {pred: 0 for pred in ROUTE_LABELS} for true in ROUTE_LABELS}
+  errors = 0
+
+  async def _one(text: str, label: str) -> None:
+    nonlocal errors
+    async with semaphore:
+      t0 = time.perf_counter()
+      try:
+        decision = await router.route(text)
+      except Exception as exc:
+        errors += 1
+        logger.warning("bench-routing: %r — ошибка роутера: %s", text, exc)
+        return
+      timings.observe("route", time.perf_counter() - t0)
+      confusion[label][decision_label(decision)] += 1
+
+  t0 = time.perf_counter()
+  await asyncio.gather(*(_one(text, label) for text, label in samples))
+  wall = time.perf_counter() - t0
+  correct = sum(confusion[label][label] for label in ROUTE_LABELS)
+  answered = sum(sum(row.values()) for row in confusion.values())
+  return {
+      "messages": len(samples),
+      "errors": errors,
+      "accuracy": round(correct / answered, 4) if answered else None,
+      "confusion": confusion,
+      "p50_ms": _ms(timings.percentile("route", 50)),
+      "p95_ms": _ms(timings.percentile("route", 95)),
+      "p99_ms": _ms(timings.percentile("route", 99)),
+      "messages_per_second": round(len(samples) / wall, 1) if wall > 0 else None,
+  }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+  return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def _load_records(path: Optional[str]) -> Dict[str, Dict[str, Any]]:
+  if not path or not os.path.exists(path):
+    return {}
+  with open(path, "r", encoding="utf-8") as f:
+    return json.load(f)
+
+
+def _save_records(path: str, records: Dict[str, Dict[str, Any]]) -> None:
+  os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+  with open(path, "w", encoding="utf-8") as f:
+    json.dump(records, f, ensure_ascii=False, indent=2)
+
+
+async def run_routing_benchmark(
+    config: dict,
+    dataset_path: str,
+    *,
+    methods: Sequence[str] = BENCH_METHODS,
+    concurrency: int = 8,
+    llm_mode: str = "stub",
+    stub_latency_ms: float = 50.0,
+    record_path: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+  """Прогон методов по набору; метод, который не собрался (нет модели, конфига), — с ``error``."""
+  if llm_mode not in LLM_MODES:
+    raise ValueError(f"llm_mode must be one of {LLM_MODES}, got: {llm_mode!r}")
+  if llm_mode == "replay" and not (record_path and os.path.exists(record_path)):
+    raise ValueError(f"replay: нет файла записанных ответов {record_path!r}")
+  examples = load_routing_examples(dataset_path)
+  samples = [(text, label) for label in ROUTE_LABELS for text in examples[label]]
+  records = _load_records(record_path) if llm_mode != "stub" else {}
+  recorders: List[RecordedRoutingLLM] = []
+
+  def _llm_factory(provider_cfg: dict) -> Any:
+    if llm_mode == "stub":
+      return StubRoutingLLM(latency_seconds=max(0.0, stub_latency_ms) / 1000)
+    inner = None
+    if llm_mode == "live":
+      from src.pipelines.rag.pipeline import get_llm_from_config
+
+      inner = get_llm_from_config(provider_cfg)
+    recorder = RecordedRoutingLLM(inner=inner, records=records)
+    recorders.append(recorder)
+    return recorder
+
+  results: List[Dict[str, Any]] = []
+  for method in methods:
+    try:
+      router = create_semantic_routing_service(_bench_config(config, method), llm_factory=_llm_factory)
+    except Exception as exc:
+      logger.warning("bench-routing: метод %s не собран: %s", method, exc)
+      results.append({"method": method, "error": str(exc)})
+      continue
+    row = await _run_router(router, samples, concurrency)
+    row["method"] = method
+    results.append(row)
+
+  if llm_mode == "live" and record_path:
+    for recorder in recorders:
+      records.update(recorder.records)
+    _save_records(record_path, records)
+    logger.info("bench-routing: %s ответов LLM записано в %s", len(records), record_path)
+  missing = sum(r.missing for r in recorders)
+  if missing:
+    logger.warning("bench-routing: %s промптов без записанного ответа", missing)
+  return results
+
+
+def format_routing_report(results: Sequence[Dict[str, Any]]) -> str:
+  """Сводная таблица методов и матрица ошибок каждого (строки — истинная метка)."""
+  lines = [
+      f"{'метод':<12} {'accuracy':>8} {'p50 мс':>9} {'p95 мс':>9} {'p99 мс':>9} {'сообщ/с':>9} {'ошибок':>7}"
+  ]
+  for row in results:
+    if "error" in row:
+      lines.append(f"{row['method']:<12} не собран: {row['error']}")
+      continue
+    lines.append(
+        f"{row['method']:<12} {_cell(row['accuracy']):>8} {_cell(row['p50_ms']):>9} "
+        f"{_cell(row['p95_ms']):>9} {_cell(row['p99_ms']):>9} "
+        f"{_cell(row['messages_per_second']):>9} {row['errors']:>7}"
+    )
+  for row in results:
+    if "error" in row:
+      continue
+    lines.append("")
+    lines.append(f"[{row['method']}] истинная \\ решение")
+    lines.append(f"{'':<12}" + "".join(f"{label:>12}" for label in ROUTE_LABELS))
+    for true in ROUTE_LABELS:
+      lines.append(
+          f"{true:<12}" + "".join(f"{row['confusion'][true][pred]:>12}" for pred in ROUTE_LABELS)
+      )
+  return "\n".join(lines)
+
+
+def _cell(value: Any) -> str:
+  return "—" if value is None else str(value)
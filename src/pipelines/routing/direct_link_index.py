@@ -0,0 +1,261 @@
+"""Индекс «заголовок страницы → URL» для ответов direct_link без LLM.
+
+run_indexing уже обходит все страницы и кладёт в metadata чанков заголовки
+(title, H1–H3 у MarkdownProcessor, heading у HTML-чанкеров, title у parent-child).
+Из них при индексации строится маленький инвертированный индекс: основа слова
+(первые ``_STEM_CHARS`` букв) → страницы с весом tf·idf; слова заголовка страницы
+весят больше заголовков разделов. Файл лежит рядом с прочими артефактами
+(paths.direct_link_index). Роутер при метке direct_link отвечает списком лучших
+страниц за доли миллисекунды; если ничего не нашлось — прежний ответ.
+"""
+from __future__ import annotations
+
+import html
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlparse
+
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
+
+from src.pipelines.routing.router import RoutingDecision, SemanticRoutingPort
+from src.util.runtime_metrics import runtime_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIRECT_LINK_INDEX_PATH = "data/direct_link_index.json"
+
+# Грубый стемминг для русского: «расписание» / «расписания» / «расписанию» → «распис».
+_STEM_CHARS = 6
+_WORD = re.compile(r"\w+", re.UNICODE)
+# Слова просьбы о ссылке и служебные — есть почти в каждом сообщении direct_link, но не в заголовках.
+_STOP_STEMS = frozenset(
+    word[:_STEM_CHARS]
+    for word in (
+        "где", "как", "что", "это", "для", "или", "при", "над", "под", "все", "тут",
+        "ссылка", "ссылку", "сайт", "сайте", "страница", "страницу", "найти", "посмотреть",
+        "открыть", "искать", "дай", "скинь", "кинь", "подскажи", "пожалуйста", "http", "https", "www",
+    )
+)
+_FIELD_WEIGHTS = {"title": 3.0, "heading": 1.0, "url": 2.0}
+_HEADING_KEYS = ("H1", "H2", "H3", "heading")
+
+
+def direct_link_index_path(config: dict) -> str:
+  paths = (config or {}).get("paths") or {}
+  return str(paths.get("direct_link_index") or DEFAULT_DIRECT_LINK_INDEX_PATH)
+
+
+def _stems(text: str) -> List[str]:
+  out = []
+  for word in _WORD.findall((text or "").lower().replace("ё", "е")):
+    if len(word) < 3 or word.isdigit():
+      continue
+    stem = word[:_STEM_CHARS]
+    if stem not in _STOP_STEMS:
+      out.append(stem)
+  return out
+
+
+def _display_title(title: str) -> str:
+  # «Расписание | Факультет прикладной математики…» → «Расписание».
+  return re.split(r"\s+[|—–-]\s+", title.strip(), maxsplit=1)[0].strip()
+
+
+@dataclass(frozen=True)
+class DirectLink:
+  url: str
+  title: str
+  score: float
+
+
+class DirectLinkIndex:
+  """Страницы и постинги ``основа → [(номер страницы, вес)]``; поиск — сумма весов."""
+
+  def __init__(self, pages: List[Dict[str, Any]], postings: Dict[str, List[Tuple[int, float]]]) -> None:
+    self._pages = pages
+    self._postings = postings
+
+  def __len__(self) -> int:
+    return len(self._pages)
+
+  @classmethod
+  def from_documents(cls, documents: Iterable[Document]) -> "DirectLinkIndex":
+    """Заголовки страниц из metadata чанков: title, H1–H3, heading; URL — metadata.source."""
+    pages: Dict[str, Dict[str, Any]] = {}
+    for doc in documents:
+      meta = doc.metadata or {}
+      url = str(meta.get("source") or "").strip()
+      if not url.startswith(("http://", "https://")):
+        continue
+      page = pages.setdefault(url, {"url": url, "title": "", "headings": []})
+      title = str(meta.get("title") or "").strip()
+      if title and title != "No Title" and not page["title"]:
+        page["title"] = _display_title(title)
+      for key in _HEADING_KEYS:
+        heading = str(meta.get(key) or "").strip()
+        if heading and heading not in page["headings"]:
+          page["headings"].append(heading)
+
+    ordered = list(pages.values())
+    field_tf: List[Dict[str, float]] = []
+    df: Dict[str, int] = defaultdict(int)
+    for page in ordered:
+      path = unquote(urlparse(page["url"]).path).replace("-", " ").replace("_", " ").replace("/", " ")
+      weights: Dict[str, float] = defaultdict(float)
+      for stem in _stems(page["title"]):
+        weights[stem] += _FIELD_WEIGHTS["title"]
+      for heading in page["headings"]:
+        for stem in _stems(heading):
+          weights[stem] += _FIELD_WEIGHTS["heading"]
+      for stem in _stems(path):
+        weights[stem] += _FIELD_WEIGHTS["url"]
+      field_tf.append(weights)
+      for stem in weights:
+        df[stem] += 1
+
+    n = max(1, len(ordered))
+    postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+    for page_id, weights in enumerate(field_tf):
+      for stem, weight in weights.items():
+        # Основы из заголовка каждой страницы («фпми», «факуль») почти ничего не весят.
+        idf = math.log((n + 1) / df[stem])
+        if idf > 0:
+          postings[stem].append((page_id, round((1 + math.log(weight)) * idf, 4)))
+    for page in ordered:
+      if not page["title"]:
+        page["title"] = page["headings"][0] if page["headings"] else page["url"]
+    return cls(ordered, dict(postings))
+
+  def search(self, query: str, *, top_k: int = 3, min_score: float = 0.0) -> List[DirectLink]:
+    scores: Dict[int, float] = defaultdict(float)
+    for stem in set(_stems(query)):
+      for page_id, weight in self._postings.get(stem, ()):
+        scores[page_id] += weight
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return [
+        DirectLink(self._pages[page_id]["url"], self._pages[page_id]["title"], round(score, 3))
+        for page_id, score in ranked[: max(1, top_k)]
+        if score >= min_score
+    ]
+
+  def save(self, path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+      json.dump({"pages": self._pages, "postings": self._postings}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+  @classmethod
+  def load(cls, path: str) -> "DirectLinkIndex":
+    with open(path, "r", encoding="utf-8") as f:
+      raw = json.load(f)
+    postings = {stem: [(int(p), float(w)) for p, w in items] for stem, items in raw["postings"].items()}
+    return cls(list(raw["pages"]), postings)
+
+
+def build_direct_link_index(documents: Sequence[Document], config: dict) -> Optional[str]:
+  """Строит индекс по чанкам индексации и пишет его в paths.direct_link_index."""
+  index = DirectLinkIndex.from_documents(documents)
+  if not len(index):
+    logger.warning("Индекс ссылок direct_link: нет страниц с URL — не записан")
+    return None
+  path = direct_link_index_path(config)
+  index.save(path)
+  logger.info("Индекс ссылок direct_link: %s страниц → %s", len(index), path)
+  return path
+
+
+class DirectLinkSemanticRouting:
+  """Решение direct_link → ответ списком страниц из DirectLinkIndex вместо заготовки / LLM.
+
+  Индекс перечитывается, когда индексация перезаписала файл (смена mtime); нет файла
+  или совпадений — решение внутреннего роутера как есть.
+  """
+
+  def __init__(
+      self,
+      inner: SemanticRoutingPort,
+      index_path: str,
+      *,
+      top_k: int = 3,
+      min_score: float = 0.5,
+      header: str = "Вот страницы сайта факультета по вашему запросу:",
+  ) -> None:
+    self._inner = inner
+    self._path = index_path
+    self._top_k = max(1, int(top_k))
+    self._min_score = float(min_score)
+    self._header = header
+    self._lock = threading.Lock()
+    self._index: Optional[DirectLinkIndex] = None
+    self._mtime: Optional[float] = None
+
+  @property
+  def inner(self) -> SemanticRoutingPort:
+    return self._inner
+
+  @property
+  def needs_history(self) -> bool:
+    return self._inner.needs_history
+
+  def _current_index(self) -> Optional[DirectLinkIndex]:
+    try:
+      mtime = os.stat(self._path).st_mtime
+    except OSError:
+      return None
+    with self._lock:
+      if self._mtime != mtime:
+        try:
+          self._index = DirectLinkIndex.load(self._path)
+          logger.info("Индекс ссылок direct_link: %s страниц из %s", len(self._index), self._path)
+        except (OSError, ValueError, KeyError) as exc:
+          logger.warning("Индекс ссылок direct_link %s не прочитан: %s", self._path, exc)
+          self._index = None
+        self._mtime = mtime
+      return self._index
+
+  def links(self, query: str) -> List[DirectLink]:
+    index = self._current_index()
+    if index is None:
+      return []
+    return index.search(query, top_k=self._top_k, min_score=self._min_score)
+
+  def format_links(self, links: Sequence[DirectLink]) -> str:
+    """Ответ уходит с ParseMode.HTML: заголовки и URL со страниц сайта экранируются."""
+    return "\n".join([
+        self._header,
+        *(f"• {html.escape(link.title)} — {html.escape(link.url)}" for link in links),
+    ])
+
+  async def route(
+      self, query: str, history: Optional[Sequence[BaseMessage]] = None,
+  ) -> RoutingDecision:
+    decision = await self._inner.route(query, history=history)
+    if decision.non_rag_label != "direct_link":
+      return decision
+    links = self.links(query)
+    if not links:
+      runtime_metrics.incr("routing.direct_link_index_miss")
+      return decision
+    runtime_metrics.incr("routing.direct_link_index_hit")
+    logger.info(
+        "[semantic_routing] direct_link из индекса ссылок: %s",
+        ", ".join(f"{link.url} ({link.score})" for link in links),
+    )
+    return RoutingDecision(
+        use_rag=False,
+        answer=self.format_links(links),
+        non_rag_label="direct_link",
+        use_llm_for_reply=False,
+        cacheable=decision.cacheable,
+    )
@@ -0,0 +1,241 @@
+"""Роутинг по эмбеддингам: ближайшие размеченные примеры вместо вызова LLM на каждое сообщение.
+
+Примеры smalltalk / direct_link / rag лежат в YAML (semantic_routing.embedding.examples_path),
+их эмбеддинги считаются один раз моделью embedding_model (тот же экземпляр, что у ретривера,
+через src.util.hf_embeddings) и кешируются матрицей .npy. Запрос — один encode и одно
+умножение матрицы на вектор. Оценка класса: среднее k ближайших примеров класса (knn)
+или близость к центроиду класса (centroid). Если лучший класс ниже ``threshold`` или
+отрыв от второго меньше ``margin`` — решение отдаётся запасному роутингу (regex или LLM).
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import yaml
+from langchain_core.messages import BaseMessage
+
+from src.pipelines.routing.router import (
+    RouteLabel,
+    RoutingDecision,
+    SemanticRoutingPort,
+    routing_decision,
+)
+from src.util.hf_embeddings import shared_huggingface_embeddings
+from src.util.runtime_metrics import runtime_metrics
+
+logger = logging.getLogger(__name__)
+
+ROUTE_LABELS: Tuple[RouteLabel, ...] = ("smalltalk", "direct_link", "rag")
+
+
+def load_routing_examples(path: str) -> Dict[str, List[str]]:
+  """YAML ``{smalltalk: [...], direct_link: [...], rag: [...]}`` → примеры по меткам."""
+  with open(path, "r", encoding="utf-8") as f:
+    raw = yaml.safe_load(f) or {}
+  if not isinstance(raw, dict):
+    raise ValueError(f"{path}: ожидается словарь метка → список примеров")
+  unknown = sorted(set(raw) - set(ROUTE_LABELS))
+  if unknown:
+    raise ValueError(f"{path}: неизвестные метки {unknown}, допустимы {list(ROUTE_LABELS)}")
+  examples = {
+      label: [str(t).strip() for t in (raw.get(label) or []) if str(t).strip()]
+      for label in ROUTE_LABELS
+  }
+  if not all(examples.values()):
+    empty = [label for label, texts in examples.items() if not texts]
+    raise ValueError(f"{path}: нет примеров для меток {empty}")
+  return examples
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+  norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+  return matrix / np.maximum(norms, 1e-12)
+
+
+class EmbeddingSemanticRouting:
+  """Классификатор по матрице эмбеддингов примеров; неуверенные случаи — в ``fallback``."""
+
+  def __init__(
+      self,
+      embeddings: Any,
+      examples: Dict[str, List[str]],
+      smalltalk_reply: str,
+      direct_link_reply: str,
+      *,
+      fallback: SemanticRoutingPort,
+      mode: str = "knn",
+      k: int = 5,
+      threshold: float = 0.6,
+      margin: float = 0.04,
+      use_llm_reply: bool = True,
+      matrix: Optional[np.ndarray] = None,
+  ) -> None:
+    if mode not in ("knn", "centroid"):
+      raise ValueError(f"semantic_routing.embedding.mode must be 'knn' or 'centroid', got: {mode!r}")
+    self._embeddings = embeddings
+    self._smalltalk_reply = smalltalk_reply
+    self._direct_link_reply = direct_link_reply
+    self._fallback = fallback
+    self._mode = mode
+    self._k = max(1, int(k))
+    self._threshold = float(threshold)
+    self._margin = float(margin)
+    self._use_llm_reply = use_llm_reply
+
+    self._labels: List[RouteLabel] = [label for label in ROUTE_LABELS if examples.get(label)]
+    texts = [text for label in self._labels for text in examples[label]]
+    if matrix is None:
+      matrix = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    if matrix.shape[0] != len(texts):
+      raise ValueError(f"матрица примеров: {matrix.shape[0]} строк на {len(texts)} примеров")
+    self._matrix = np.ascontiguousarray(_normalize_rows(matrix.astype(np.float32)))
+    # Примеры одной метки идут подряд: срез строк матрицы на метку.
+    self._slices: List[slice] = []
+    start = 0
+    for label in self._labels:
+      self._slices.append(slice(start, start + len(examples[label])))
+      start += len(examples[label])
+    self._centroids = _normalize_rows(
+        np.stack([self._matrix[sl].mean(axis=0) for sl in self._slices])
+    )
+
+  @property
+  def matrix(self) -> np.ndarray:
+    return self._matrix
+
+  @property
+  def needs_history(self) -> bool:
+    # История нужна только запасному роутингу (fused) — ему её и передаём.
+    return self._fallback.needs_history
+
+  def _encode(self, query: str) -> np.ndarray:
+    # embed_documents и для запроса: примеры закодированы так же (без префиксов E5 query:).
+    vec = np.asarray(self._embeddings.embed_documents([query])[0], dtype=np.float32)
+    return vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+  def scores(self, query: str) -> Dict[str, float]:
+    """Оценка каждой метки для запроса (косинусная близость, −1…1)."""
+    vec = self._encode(query)
+    if self._mode == "centroid":
+      sims = self._centroids @ vec
+      return {label: float(s) for label, s in zip(self._labels, sims)}
+    sims = self._matrix @ vec
+    out: Dict[str, float] = {}
+    for label, sl in zip(self._labels, self._slices):
+      label_sims = sims[sl]
+      k = min(self._k, label_sims.shape[0])
+      out[label] = float(np.partition(label_sims, -k)[-k:].mean())
+    return out
+
+  def classify(self, query: str) -> Tuple[RouteLabel, float, float]:
+    """(метка, оценка лучшей метки, отрыв от второй)."""
+    ranked = sorted(self.scores(query).items(), key=lambda item: item[1], reverse=True)
+    best_label, best = ranked[0]
+    second = ranked[1][1] if len(ranked) > 1 else -1.0
+    return best_label, best, best - second
+
+  def is_confident(self, score: float, margin: float) -> bool:
+    return score >= self._threshold and margin >= self._margin
+
+  async def route(
+      self, query: str, history: Optional[Sequence[BaseMessage]] = None,
+  ) -> RoutingDecision:
+    if not (query or "").strip():
+      return RoutingDecision(use_rag=True, answer=None)
+    t0 = time.perf_counter()
+    # encode держит CPU ~десятки мс: в потоке, чтобы не останавливать event loop.
+    label, score, margin = await asyncio.to_thread(self.classify, query)
+    elapsed = time.perf_counter() - t0
+    runtime_metrics.observe("routing.embedding_seconds", elapsed)
+    if not self.is_confident(score, margin):
+      runtime_metrics.incr("routing.embedding_escalated")
+      logger.info(
+          "[semantic_routing] method=embedding label=%s score=%.3f margin=%.3f %.1fms — неуверенно, запасной роутинг",
+          label, score, margin, elapsed * 1000,
+      )
+      return await self._fallback.route(query, history=history)
+    runtime_metrics.incr(f"routing.embedding.{label}")
+    logger.info(
+        "[semantic_routing] method=embedding label=%s score=%.3f margin=%.3f %.1fms",
+        label, score, margin, elapsed * 1000,
+    )
+    return routing_decision(
+        label, self._smalltalk_reply, self._direct_link_reply, self._use_llm_reply,
+    )
+
+
+def _matrix_cache_path(cache_dir: str, model_name: str, examples: Dict[str, List[str]]) -> str:
+  digest = hashlib.sha1(model_name.encode("utf-8"))
+  for label in ROUTE_LABELS:
+    for text in examples.get(label) or []:
+      digest.update(f"\x00{label}\x00{text}".encode("utf-8"))
+  return os.path.join(cache_dir, f"routing_examples.{digest.hexdigest()[:16]}.npy")
+
+
+def _load_or_build_matrix(
+    embeddings: Any, examples: Dict[str, List[str]], cache_path: Optional[str],
+) -> np.ndarray:
+  if cache_path and os.path.exists(cache_path):
+    logger.info("Роутинг по эмбеддингам: матрица примеров из %s", cache_path)
+    return np.load(cache_path)
+  texts = [text for label in ROUTE_LABELS for text in examples.get(label) or []]
+  t0 = time.perf_counter()
+  matrix = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+  logger.info(
+      "Роутинг по эмбеддингам: %s примеров закодировано за %.1fs",
+      len(texts), time.perf_counter() - t0,
+  )
+  if cache_path:
+    try:
+      os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+      np.save(cache_path, matrix)
+    except OSError as exc:
+      logger.warning("Роутинг по эмбеддингам: не удалось сохранить %s: %s", cache_path, exc)
+  return matrix
+
+
+def create_embedding_routing(
+    config: Any,
+    *,
+    fallback: SemanticRoutingPort,
+    smalltalk_reply: str,
+    direct_link_reply: str,
+    use_llm_reply: bool = True,
+) -> EmbeddingSemanticRouting:
+  """Роутер по semantic_routing.embedding; модель — embedding_model, если не задана своя."""
+  cfg_dict = config if isinstance(config, dict) else {}
+  block = (cfg_dict.get("semantic_routing") or {}).get("embedding") or {}
+  emb_cfg = cfg_dict.get("embedding_model") or {}
+  model_name = block.get("model") or emb_cfg.get("name")
+  if not model_name:
+    raise ValueError("semantic_routing.method=embedding требует embedding_model.name")
+  examples = load_routing_examples(
+      str(block.get("examples_path", "config/routing_examples.yaml"))
+  )
+  embeddings = shared_huggingface_embeddings(emb_cfg, model_name)
+  cache_dir = block.get("cache_dir", "data/routing")
+  cache_path = _matrix_cache_path(str(cache_dir), model_name, examples) if cache_dir else None
+  router = EmbeddingSemanticRouting(
+      embeddings,
+      examples,
+      smalltalk_reply,
+      direct_link_reply,
+      fallback=fallback,
+      mode=str(block.get("mode", "knn")),
+      k=int(block.get("k", 5)),
+      threshold=float(block.get("threshold", 0.6)),
+      margin=float(block.get("margin", 0.04)),
+      use_llm_reply=use_llm_reply,
+      matrix=_load_or_build_matrix(embeddings, examples, cache_path),
+  )
+  logger.info(
+      "Роутинг по эмбеддингам: модель %s, примеров %s, режим %s, запасной — %s",
+      model_name, router.matrix.shape[0], block.get("mode", "knn"), type(fallback).__name__,
+  )
+  return router
@@ -1,17 +1,34 @@
-"""Семантический роутинг для бота: smalltalk / direct_link / rag (regex или LLM)."""
+"""Семантический роутинг для бота: smalltalk / direct_link / rag (regex, LLM или эмбеддинги).
+
+Режим llm_bounded — JSON-ответ Ollama с лимитом в несколько токенов (прежняя LLM-цепочка —
+запасной путь). Режим fused — один LLM-вызов возвращает и метку, и самостоятельный вопрос для поиска
+(RoutingDecision.standalone_question): RAG-цепочка тогда не переформулирует вопрос сама.
+"""
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
 import re
+import time
 from dataclasses import dataclass
-from typing import Any, Literal, Optional, Protocol, runtime_checkable
+from typing import Any, Callable, Dict, Literal, Optional, Protocol, Sequence, Tuple, runtime_checkable
 
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import Runnable
 
-from src.config.prompts import ROUTER_SYSTEM_PROMPT, ROUTER_HUMAN_PROMPT
+from src.config.prompts import (
+    FUSED_ROUTER_HUMAN_PROMPT,
+    FUSED_ROUTER_SYSTEM_PROMPT,
+    ROUTER_HUMAN_PROMPT,
+    ROUTER_JSON_SYSTEM_PROMPT,
+    ROUTER_SYSTEM_PROMPT,
+)
+from src.util.lru_ttl_cache import LruTtlCache
+from src.util.runtime_metrics import runtime_metrics
+from src.util.text_processing import normalize_short_message
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +51,35 @@ _ROUTER_PROMPT = ChatPromptTemplate.from_messages(
     ]
 )
 
+_BOUNDED_ROUTER_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", ROUTER_JSON_SYSTEM_PROMPT),
+        ("human", ROUTER_HUMAN_PROMPT),
+    ]
+)
+
+# Ограничения вывода llm_bounded поверх semantic_routing.llm (переопределяются bounded.llm).
+# stop "}" обрезает ответ сразу после значения: парсер не ждёт закрывающую скобку.
+_BOUNDED_LLM_DEFAULTS: Dict[str, Any] = {
+    "temperature": 0.0,
+    "format": "json",
+    "num_predict": 16,
+    "stop": ["}"],
+    "keep_alive": "30m",
+}
+
+_ROUTE_FIELD = re.compile(r'"route"\s*:\s*"([a-z_]+)', re.IGNORECASE)
+
+_FUSED_ROUTER_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", FUSED_ROUTER_SYSTEM_PROMPT),
+        MessagesPlaceholder("chat_history"),
+        ("human", FUSED_ROUTER_HUMAN_PROMPT),
+    ]
+)
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
 # Сначала «ссылка / расписание», затем короткий smalltalk (см. порядок в classify_regex).
 _DIRECT_HINTS = re.compile(
     r"(расписан|расписани|ссылк|\burl\b|https?://|www\.|"
@@ -66,20 +112,82 @@ class RoutingDecision:
   answer: Optional[str]
   non_rag_label: Optional[Literal["smalltalk", "direct_link"]] = None
   use_llm_for_reply: bool = False
+  # False — вынужденное решение (таймаут/ошибка LLM): CachedSemanticRouting его не запоминает.
+  cacheable: bool = True
+  # Вопрос без ссылок на историю (роутинг fused): RAG ищет по нему без своей reformulation.
+  standalone_question: Optional[str] = None
+
+
+def routing_decision(
+    label: RouteLabel,
+    smalltalk_reply: str,
+    direct_link_reply: str,
+    use_llm_reply: bool,
+    *,
+    cacheable: bool = True,
+    standalone_question: Optional[str] = None,
+) -> RoutingDecision:
+  """Решение по метке класса: rag — в поиск, остальное — заготовка (или LLM + история)."""
+  if label == "smalltalk":
+    return RoutingDecision(
+        use_rag=False,
+        answer=smalltalk_reply,
+        non_rag_label="smalltalk",
+        use_llm_for_reply=use_llm_reply,
+        cacheable=cacheable,
+    )
+  if label == "direct_link":
+    return RoutingDecision(
+        use_rag=False,
+        answer=direct_link_reply,
+        non_rag_label="direct_link",
+        use_llm_for_reply=use_llm_reply,
+        cacheable=cacheable,
+    )
+  return RoutingDecision(
+      use_rag=True,
+      answer=None,
+      cacheable=cacheable,
+      standalone_question=standalone_question,
+  )
+
+
+def classify_regex(query: str) -> RouteLabel:
+  """Метка по правилам: сначала подсказки «ссылка / расписание», затем строгий smalltalk."""
+  t = (query or "").strip()
+  if not t:
+    return "rag"
+  tl = t.lower()
+  if _DIRECT_HINTS.search(tl):
+    return "direct_link"
+  if _SMALLTALK_STRICT.match(tl):
+    return "smalltalk"
+  return "rag"
 
 
 @runtime_checkable
 class SemanticRoutingPort(Protocol):
-    async def route(self, query: str) -> RoutingDecision: ...
+    # True — роутеру нужна история чата (fused): хендлер ждёт её предзагрузку до роутинга.
+    needs_history: bool
+
+    async def route(
+        self, query: str, history: Optional[Sequence[BaseMessage]] = None,
+    ) -> RoutingDecision: ...
 
 
 class PassthroughSemanticRouting:
-  async def route(self, query: str) -> RoutingDecision:
-    _ = query
+  needs_history = False
+
+  async def route(
+      self, query: str, history: Optional[Sequence[BaseMessage]] = None,
+  ) -> RoutingDecision:
+    _ = query, history
     return RoutingDecision(use_rag=True, answer=None)
 
 
 class RegexSemanticRouting:
+  needs_history = False
+
   def __init__(
       self,
       smalltalk_reply: str,
@@ -91,35 +199,68 @@ class RegexSemanticRouting:
     self._direct_link_reply = direct_link_reply
     self._use_llm_reply = use_llm_reply
 
-  def _label(self, query: str) -> RouteLabel:
-    t = (query or "").strip()
-    if not t:
-      return "rag"
-    tl = t.lower()
-    if _DIRECT_HINTS.search(tl):
-      return "direct_link"
-    if _SMALLTALK_STRICT.match(tl):
-      return "smalltalk"
-    return "rag"
-
-  async def route(self, query: str) -> RoutingDecision:
-    label = self._label(query)
+  async def route(
+      self, query: str, history: Optional[Sequence[BaseMessage]] = None,
+  ) -> RoutingDecision:
+    _ = history
+    label = classify_regex(query)
     logger.info("[semantic_routing] method=regex label=%s", label)
-    if label == "smalltalk":
-      return RoutingDecision(
-          use_rag=False,
-          answer=self._smalltalk_reply,
-          non_rag_label="smalltalk",
-          use_llm_for_reply=self._use_llm_reply,
-      )
-    if label == "direct_link":
-      return RoutingDecision(
-          use_rag=False,
-          answer=self._direct_link_reply,
-          non_rag_label="direct_link",
-          use_llm_for_reply=self._use_llm_reply,
-      )
-    return RoutingDecision(use_rag=True, answer=None)
+    return routing_decision(
+        label, self._smalltalk_reply, self._direct_link_reply, self._use_llm_reply,
+    )
+
+
+class CachedSemanticRouting:
+  """LRU+TTL кеш решений перед любым SemanticRoutingPort.
+
+  Ключ — сообщение без регистра, пунктуации и лишних пробелов (normalize_short_message):
+  «Спасибо!», «спасибо» и «СПАСИБО.» классифицируются один раз. Длинные сообщения
+  (больше ``max_key_chars``) почти не повторяются и идут мимо кеша, чтобы не вытеснять
+  короткие. Счётчики ``routing.cache_hit`` / ``routing.cache_miss``.
+  Для роутера с историей (fused) сообщения с непустой историей идут мимо кеша:
+  решение и standalone-вопрос зависят от предыдущих реплик.
+  """
+
+  def __init__(
+      self,
+      inner: SemanticRoutingPort,
+      *,
+      max_entries: int = 10_000,
+      ttl_seconds: Optional[float] = 3600,
+      max_key_chars: int = 200,
+  ) -> None:
+    self._inner = inner
+    self._cache: LruTtlCache[str, RoutingDecision] = LruTtlCache(
+        maxsize=max_entries, ttl_seconds=ttl_seconds,
+    )
+    self._max_key_chars = max(1, int(max_key_chars))
+
+  @property
+  def inner(self) -> SemanticRoutingPort:
+    return self._inner
+
+  @property
+  def needs_history(self) -> bool:
+    return self._inner.needs_history
+
+  async def route(
+      self, query: str, history: Optional[Sequence[BaseMessage]] = None,
+  ) -> RoutingDecision:
+    if history and self._inner.needs_history:
+      return await self._inner.route(query, history=history)
+    key = normalize_short_message(query)
+    if not key or len(key) > self._max_key_chars:
+      return await self._inner.route(query, history=history)
+    cached = self._cache.get(key)
+    if cached is not None:
+      runtime_metrics.incr("routing.cache_hit")
+      logger.info("[semantic_routing] cache hit use_rag=%s", cached.use_rag)
+      return cached
+    runtime_metrics.incr("routing.cache_miss")
+    decision = await self._inner.route(query, history=history)
+    if decision.cacheable:
+      self._cache.set(key, decision)
+    return decision
 
 
 def _normalize_llm_route(raw: str) -> RouteLabel:
@@ -138,7 +279,40 @@ def _normalize_llm_route(raw: str) -> RouteLabel:
     return "rag"
 
 
+def parse_fused_route(raw: str) -> Optional[Tuple[RouteLabel, str]]:
+    """Ответ fused-роутера ``{"route": ..., "standalone_question": ...}`` → (метка, вопрос).
+
+    None — в ответе нет JSON-объекта или поля route.
+    """
+    match = _JSON_OBJECT.search(raw or "")
+    if not match:
+        return None
+    try:
+        payload = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(payload, dict) or not payload.get("route"):
+        return None
+    label = _normalize_llm_route(str(payload["route"]))
+    return label, str(payload.get("standalone_question") or "").strip()
+
+
+def parse_bounded_route(raw: str) -> Optional[RouteLabel]:
+    """``{"route": "..."`` (закрывающая скобка срезана stop) → метка; None — поля нет или класс чужой."""
+    match = _ROUTE_FIELD.search(raw or "")
+    if not match:
+        return None
+    word = match.group(1).lower()
+    if word == "directlink":
+        return "direct_link"
+    if word in ("smalltalk", "direct_link", "rag"):
+        return word
+    return None
+
+
 class LlmSemanticRouting:
+  needs_history = False
+
   def __init__(
       self,
       chain: Runnable,
@@ -154,14 +328,20 @@ class LlmSemanticRouting:
     self._timeout_seconds = timeout_seconds
     self._use_llm_reply = use_llm_reply
 
-  async def route(self, query: str) -> RoutingDecision:
+  async def route(
+      self, query: str, history: Optional[Sequence[BaseMessage]] = None,
+  ) -> RoutingDecision:
+    _ = history
     label: RouteLabel = "rag"
+    answered = False
+    t0 = time.perf_counter()
     try:
       raw = await asyncio.wait_for(
           self._chain.ainvoke({"query": query}),
           timeout=self._timeout_seconds,
       )
       label = _normalize_llm_route(str(raw))
+      answered = True
     except asyncio.TimeoutError:
       logger.warning(
           "[semantic_routing] method=llm timeout=%ss — fallback rag",
@@ -172,26 +352,160 @@ class LlmSemanticRouting:
           "[semantic_routing] method=llm error=%s — fallback rag",
           exc,
       )
+    finally:
+      runtime_metrics.observe("routing.llm_seconds", time.perf_counter() - t0)
     logger.info("[semantic_routing] method=llm label=%s", label)
-    if label == "smalltalk":
-      return RoutingDecision(
-          use_rag=False,
-          answer=self._smalltalk_reply,
-          non_rag_label="smalltalk",
-          use_llm_for_reply=self._use_llm_reply,
+    return routing_decision(
+        label, self._smalltalk_reply, self._direct_link_reply, self._use_llm_reply,
+        cacheable=answered,
+    )
+
+
+class BoundedLlmSemanticRouting:
+  """Классификация JSON-ответом с жёстким лимитом: format=json, num_predict, stop, keep_alive.
+
+  Модель не рассуждает свободным текстом перед меткой, поэтому ответ занимает доли секунды
+  и таймаут может быть коротким. Таймаут, ошибка или ответ без допустимого ``route`` —
+  решение отдаётся ``fallback`` (прежняя LlmSemanticRouting), без него — rag.
+  Гистограмма ``routing.llm_bounded_seconds`` рядом с ``routing.llm_seconds`` прежнего режима.
+  """
+
+  needs_history = False
+
+  def __init__(
+      self,
+      chain: Runnable,
+      smalltalk_reply: str,
+      direct_link_reply: str,
+      timeout_seconds: float,
+      *,
+      fallback: Optional[SemanticRoutingPort] = None,
+      use_llm_reply: bool = True,
+  ) -> None:
+    self._chain = chain
+    self._smalltalk_reply = smalltalk_reply
+    self._direct_link_reply = direct_link_reply
+    self._timeout_seconds = timeout_seconds
+    self._fallback = fallback
+    self._use_llm_reply = use_llm_reply
+
+  async def route(
+      self, query: str, history: Optional[Sequence[BaseMessage]] = None,
+  ) -> RoutingDecision:
+    label: Optional[RouteLabel] = None
+    t0 = time.perf_counter()
+    try:
+      raw = await asyncio.wait_for(
+          self._chain.ainvoke({"query": query}),
+          timeout=self._timeout_seconds,
       )
-    if label == "direct_link":
-      return RoutingDecision(
-          use_rag=False,
-          answer=self._direct_link_reply,
-          non_rag_label="direct_link",
-          use_llm_for_reply=self._use_llm_reply,
+      label = parse_bounded_route(str(raw))
+      if label is None:
+        logger.warning("[semantic_routing] method=llm_bounded ответ без route: %.200r", raw)
+    except asyncio.TimeoutError:
+      logger.warning(
+          "[semantic_routing] method=llm_bounded timeout=%ss", self._timeout_seconds,
       )
-    return RoutingDecision(use_rag=True, answer=None)
+    except Exception as exc:
+      logger.warning("[semantic_routing] method=llm_bounded error=%s", exc)
+    finally:
+      runtime_metrics.observe("routing.llm_bounded_seconds", time.perf_counter() - t0)
+    if label is None:
+      runtime_metrics.incr("routing.llm_bounded_fallback")
+      if self._fallback is not None:
+        logger.info("[semantic_routing] method=llm_bounded — запасной роутинг")
+        return await self._fallback.route(query, history=history)
+      logger.info("[semantic_routing] method=llm_bounded — fallback rag")
+      return routing_decision(
+          "rag", self._smalltalk_reply, self._direct_link_reply, self._use_llm_reply,
+          cacheable=False,
+      )
+    logger.info("[semantic_routing] method=llm_bounded label=%s", label)
+    return routing_decision(
+        label, self._smalltalk_reply, self._direct_link_reply, self._use_llm_reply,
+    )
+
+
+class FusedSemanticRouting:
+  """Роутинг и переформулировка вопроса одним LLM-вызовом со структурированным ответом.
+
+  Вместо двух последовательных вызовов перед поиском (классификация + history-aware
+  reformulation в RAG-цепочке) модель видит последние ``history_pairs`` пар истории и
+  возвращает JSON с меткой и самостоятельным вопросом. Вопрос попадает в
+  RoutingDecision.standalone_question только при метке rag и непустой истории: без
+  истории цепочка и так не переформулирует. Ответ без JSON, таймаут или ошибка —
+  метка rag без standalone-вопроса, цепочка переформулирует сама (как раньше).
+  """
+
+  needs_history = True
+
+  def __init__(
+      self,
+      chain: Runnable,
+      smalltalk_reply: str,
+      direct_link_reply: str,
+      timeout_seconds: float,
+      *,
+      use_llm_reply: bool = True,
+      history_pairs: int = 3,
+  ) -> None:
+    self._chain = chain
+    self._smalltalk_reply = smalltalk_reply
+    self._direct_link_reply = direct_link_reply
+    self._timeout_seconds = timeout_seconds
+    self._use_llm_reply = use_llm_reply
+    self._history_messages = 2 * max(0, int(history_pairs))
+
+  async def route(
+      self, query: str, history: Optional[Sequence[BaseMessage]] = None,
+  ) -> RoutingDecision:
+    messages = list(history or [])[-self._history_messages:] if self._history_messages else []
+    parsed: Optional[Tuple[RouteLabel, str]] = None
+    try:
+      raw = await asyncio.wait_for(
+          self._chain.ainvoke({"query": query, "chat_history": messages}),
+          timeout=self._timeout_seconds,
+      )
+      parsed = parse_fused_route(str(raw))
+      if parsed is None:
+        runtime_metrics.incr("routing.fused_parse_error")
+        logger.warning("[semantic_routing] method=fused ответ без JSON — fallback rag: %.200r", raw)
+    except asyncio.TimeoutError:
+      logger.warning(
+          "[semantic_routing] method=fused timeout=%ss — fallback rag",
+          self._timeout_seconds,
+      )
+    except Exception as exc:
+      logger.warning(
+          "[semantic_routing] method=fused error=%s — fallback rag",
+          exc,
+      )
+    label, standalone = parsed if parsed is not None else ("rag", "")
+    if label != "rag" or not messages:
+      standalone = ""
+    if standalone:
+      runtime_metrics.incr("routing.fused_standalone")
+    logger.info(
+        "[semantic_routing] method=fused label=%s history=%s standalone=%r",
+        label, len(messages), standalone,
+    )
+    return routing_decision(
+        label, self._smalltalk_reply, self._direct_link_reply, self._use_llm_reply,
+        cacheable=parsed is not None and not messages,
+        standalone_question=standalone or None,
+    )
 
 
-def create_semantic_routing_service(config: Any) -> SemanticRoutingPort:
-    """Собирает сервис по корню config (ожидается dict из config.yaml)."""
+def create_semantic_routing_service(
+    config: Any,
+    *,
+    llm_factory: Optional[Callable[[dict], Any]] = None,
+) -> SemanticRoutingPort:
+    """Собирает сервис по корню config (ожидается dict из config.yaml).
+
+    ``llm_factory`` — блок провайдера → LLM вместо get_llm_from_config (bench-routing
+    подставляет заглушку или записанные ответы).
+    """
     cfg_dict = config if isinstance(config, dict) else {}
     block = cfg_dict.get("semantic_routing")
     if not isinstance(block, dict):
@@ -205,22 +519,154 @@ def create_semantic_routing_service(config: Any) -> SemanticRoutingPort:
 
     use_llm_reply = bool(block.get("use_llm_reply", True))
 
+    if method == "embedding":
+        # Ленивый импорт: numpy + sentence-transformers нужны только этому методу.
+        from src.pipelines.routing.embedding_router import create_embedding_routing
+
+        emb_block = block.get("embedding") or {}
+        fallback_method = str(emb_block.get("fallback", "regex")).lower().strip()
+        if fallback_method not in ("regex", "llm", "llm_bounded", "fused"):
+            raise ValueError(
+                "semantic_routing.embedding.fallback must be 'regex', 'llm', 'llm_bounded' or 'fused', "
+                f"got: {fallback_method!r}"
+            )
+        service = create_embedding_routing(
+            cfg_dict,
+            fallback=_create_method_routing(
+                fallback_method, block, smalltalk, direct, use_llm_reply, llm_factory,
+            ),
+            smalltalk_reply=smalltalk,
+            direct_link_reply=direct,
+            use_llm_reply=use_llm_reply,
+        )
+    else:
+        service = _create_method_routing(
+            method, block, smalltalk, direct, use_llm_reply, llm_factory,
+        )
+    service = _with_direct_links(service, block.get("direct_links"), cfg_dict)
+    return _with_decision_cache(service, block.get("cache"))
+
+
+def _with_direct_links(service: SemanticRoutingPort, links_cfg: Any, cfg_dict: dict) -> SemanticRoutingPort:
+    """semantic_routing.direct_links.enabled — ответ direct_link страницами из индекса ссылок."""
+    if not isinstance(links_cfg, dict) or not links_cfg.get("enabled", False):
+        return service
+    from src.pipelines.routing.direct_link_index import (
+        DirectLinkSemanticRouting,
+        direct_link_index_path,
+    )
+
+    return DirectLinkSemanticRouting(
+        service,
+        direct_link_index_path(cfg_dict),
+        top_k=int(links_cfg.get("top_k", 3)),
+        min_score=float(links_cfg.get("min_score", 0.5)),
+    )
+
+
+def _with_decision_cache(service: SemanticRoutingPort, cache_cfg: Any) -> SemanticRoutingPort:
+    """semantic_routing.cache.enabled — обернуть сервис в CachedSemanticRouting."""
+    if not isinstance(cache_cfg, dict) or not cache_cfg.get("enabled", False):
+        return service
+    ttl = cache_cfg.get("ttl_seconds", 3600)
+    logger.info("[semantic_routing] кеш решений включён: %s", type(service).__name__)
+    return CachedSemanticRouting(
+        service,
+        max_entries=int(cache_cfg.get("max_entries", 10_000)),
+        ttl_seconds=float(ttl) if ttl else None,
+        max_key_chars=int(cache_cfg.get("max_key_chars", 200)),
+    )
+
+
+def bounded_llm_config(block: dict) -> dict:
+    """Блок LLM для llm_bounded: semantic_routing.llm + ограничения вывода + bounded.llm.
+
+    bounded.llm может задать свою (меньшую) модель; null-значения не переопределяют.
+    """
+    bounded = block.get("bounded") or {}
+    overrides = {k: v for k, v in (bounded.get("llm") or {}).items() if v is not None}
+    return {**dict(block.get("llm") or {}), **_BOUNDED_LLM_DEFAULTS, **overrides}
+
+
+def routing_llm_configs(config: Any) -> Dict[str, dict]:
+    """LLM, которые роутинг вызывает на сообщениях: компонент прогрева → блок провайдера."""
+    cfg_dict = config if isinstance(config, dict) else {}
+    block = cfg_dict.get("semantic_routing") or {}
+    if not isinstance(block, dict) or not block.get("enabled", False):
+        return {}
+    method = str(block.get("method", "regex")).lower().strip()
+    if method == "embedding":
+        method = str((block.get("embedding") or {}).get("fallback", "regex")).lower().strip()
+    if method in ("llm", "fused"):
+        return {"routing": block.get("llm")}
+    if method == "llm_bounded":
+        out = {"routing": bounded_llm_config(block)}
+        if str((block.get("bounded") or {}).get("fallback", "llm")).lower().strip() == "llm":
+            out["routing_fallback"] = block.get("llm")
+        return out
+    return {}
+
+
+def routing_uses_llm(config: Any) -> bool:
+    """Вызывает ли роутинг LLM на сообщениях (method llm/llm_bounded/fused или как запасной путь embedding)."""
+    return bool(routing_llm_configs(config))
+
+
+def _create_method_routing(
+    method: str,
+    block: dict,
+    smalltalk: str,
+    direct: str,
+    use_llm_reply: bool,
+    llm_factory: Optional[Callable[[dict], Any]] = None,
+) -> SemanticRoutingPort:
     if method == "regex":
         return RegexSemanticRouting(
             smalltalk,
             direct,
             use_llm_reply=use_llm_reply,
         )
-    if method == "llm":
-        # Ленивый импорт: pipeline тянет history/БД — для regex не нужен.
-        from src.pipelines.rag.pipeline import get_llm_from_config
+    if method in ("llm", "llm_bounded", "fused"):
+        if llm_factory is None:
+            # Ленивый импорт: pipeline тянет history/БД — для regex не нужен.
+            from src.pipelines.rag.pipeline import get_llm_from_config as llm_factory
 
         llm_cfg = block.get("llm")
         if not isinstance(llm_cfg, dict):
-            raise ValueError("semantic_routing.method=llm требует секцию semantic_routing.llm")
-        llm = get_llm_from_config(llm_cfg)
-        chain = _ROUTER_PROMPT | llm | StrOutputParser()
+            raise ValueError(f"semantic_routing.method={method} требует секцию semantic_routing.llm")
         timeout = float(block.get("timeout_seconds", 20))
+        if method == "llm_bounded":
+            bounded = block.get("bounded") or {}
+            fallback_method = str(bounded.get("fallback", "llm")).lower().strip()
+            if fallback_method not in ("llm", "none"):
+                raise ValueError(
+                    f"semantic_routing.bounded.fallback must be 'llm' or 'none', got: {fallback_method!r}"
+                )
+            fallback = (
+                _create_method_routing("llm", block, smalltalk, direct, use_llm_reply, llm_factory)
+                if fallback_method == "llm"
+                else None
+            )
+            return BoundedLlmSemanticRouting(
+                _BOUNDED_ROUTER_PROMPT | llm_factory(bounded_llm_config(block)) | StrOutputParser(),
+                smalltalk,
+                direct,
+                float(bounded.get("timeout_seconds", 5)),
+                fallback=fallback,
+                use_llm_reply=use_llm_reply,
+            )
+        llm = llm_factory(llm_cfg)
+        if method == "fused":
+            fused_cfg = block.get("fused") or {}
+            return FusedSemanticRouting(
+                _FUSED_ROUTER_PROMPT | llm | StrOutputParser(),
+                smalltalk,
+                direct,
+                timeout,
+                use_llm_reply=use_llm_reply,
+                history_pairs=int(fused_cfg.get("history_pairs", 3)),
+            )
+        chain = _ROUTER_PROMPT | llm | StrOutputParser()
         return LlmSemanticRouting(
             chain,
             smalltalk,
@@ -229,5 +675,6 @@ def create_semantic_routing_service(config: Any) -> SemanticRoutingPort:
             use_llm_reply=use_llm_reply,
         )
     raise ValueError(
-        f"semantic_routing.method must be 'regex' or 'llm', got: {method!r}"
+        "semantic_routing.method must be 'regex', 'llm', 'llm_bounded', 'fused' or 'embedding', "
+        f"got: {method!r}"
     )
@@ -11,10 +11,10 @@ from langchain_chroma import Chroma
 from langchain_community.retrievers import BM25Retriever
 from langchain_core.language_models import BaseLanguageModel
 from langchain_core.retrievers import BaseRetriever
-from langchain_huggingface import HuggingFaceEmbeddings
 
 from src.retrievers.async_ensemble_retriever import AsyncEnsembleRetriever
-from src.util.hf_embeddings import huggingface_embedding_model_kwargs
+from src.util.hf_embeddings import shared_huggingface_embeddings
+from src.util.model_registry import shared_model
 from src.util.text_processing import tokenize_for_bm25
 
 from .e5_query_embeddings import E5QueryEmbeddings
@@ -38,11 +38,7 @@ def create_chroma_bm25_retriever(
     emb_cfg = config['embedding_model']
     model_name = emb_cfg['name']
 
-    base_embeddings = HuggingFaceEmbeddings(
-        model_name=model_name,
-        model_kwargs=huggingface_embedding_model_kwargs(emb_cfg),
-        encode_kwargs={'normalize_embeddings': True}
-    )
+    base_embeddings = shared_huggingface_embeddings(emb_cfg)
 
     if "e5" in model_name:
         embeddings_for_query = E5QueryEmbeddings(base_embeddings)
@@ -76,14 +72,21 @@ def create_chroma_bm25_retriever(
             f"BM25 индекс не найден: {bm25_index_path}. Запустите индексацию."
         )
 
-    with open(bm25_index_path, "rb") as f:
-        bm25_data = pickle.load(f)
+    def _load_bm25() -> BM25Retriever:
+        with open(bm25_index_path, "rb") as f:
+            bm25_data = pickle.load(f)
+        return BM25Retriever.from_documents(
+            documents=bm25_data['docs'],
+            preprocess_func=tokenize_for_bm25
+        )
 
-    bm25_retriever = BM25Retriever.from_documents(
-        documents=bm25_data['docs'],
-        preprocess_func=tokenize_for_bm25
+    # Индекс общий для всех цепочек процесса; k у каждой своя (копия без перестроения).
+    bm25_index = shared_model(
+        "bm25", (bm25_index_path, os.path.getmtime(bm25_index_path)), _load_bm25
+    )
+    bm25_retriever = bm25_index.model_copy(
+        update={"k": config['retrievers']['vector_store']['search_k']}
     )
-    bm25_retriever.k = config['retrievers']['vector_store']['search_k']
 
     weights_config = config['retrievers'].get('hybrid_weights', {})
     vector_weight = weights_config.get('vector', 0.7)
@@ -1,13 +1,16 @@
 """HyDE (Hypothetical Document Embeddings) — обёртка над Embeddings для dense-поиска.
 
 LLM строит гипотетический фрагмент ответа, он эмбеддится через inner; события пишутся в
-``hyde_trace_append`` для evaluation/trace.
+``hyde_trace_append`` для evaluation/trace. Гипотеза — ``ainvoke`` LLM в собственном event
+loop обёртки (фоновый поток): таймаут или отмена прогона отменяют задачу, и клиент модели
+обрывает запрос, а не дожидается ненужного ответа.
 """
 
 from __future__ import annotations
 
 import asyncio
 import logging
+import threading
 import time
 from concurrent import futures
 from typing import Any, Dict, List, Optional, Sequence, Tuple
@@ -18,6 +21,7 @@ from langchain_core.language_models import BaseLanguageModel
 from langchain_core.prompts import PromptTemplate
 
 from src.retrievers.hyde_trace_context import hyde_trace_append
+from src.util.run_cancellation import RunCancelledError, raise_if_run_cancelled
 
 from src.config.prompts import HYDE_PROMPT
 
@@ -25,6 +29,8 @@ logger = logging.getLogger(__name__)
 
 _PREVIEW_Q = 300
 _PREVIEW_H = 900
+# Как часто ожидание гипотезы проверяет отмену прогона (новое сообщение пользователя).
+_CANCEL_POLL_SECONDS = 0.25
 
 _HYDE_PROMPT_TEMPLATE = PromptTemplate(
     template=HYDE_PROMPT,
@@ -75,6 +81,8 @@ class HyDEQueryEmbeddings(Embeddings):
         self._timeout_seconds = max(0.001, float(timeout_seconds))
         self._num_hypotheses = max(1, int(num_hypotheses))
         self._verbose_console = bool(verbose_console)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Индексация документов: тот же inner, без гипотез."""
@@ -143,6 +151,7 @@ class HyDEQueryEmbeddings(Embeddings):
                 )
                 return self._inner.embed_query(text)
 
+            raise_if_run_cancelled()
             embeddings = [
                 self._inner.embed_query(hyp)
                 for hyp in hypotheses
@@ -198,6 +207,7 @@ class HyDEQueryEmbeddings(Embeddings):
         out: List[str] = []
         notes: List[str] = []
         for hi in range(self._num_hypotheses):
+            raise_if_run_cancelled()
             hyp, note = self._one_hypothesis_with_timeout(question, slot=hi)
             if hyp:
                 out.append(hyp)
@@ -205,39 +215,76 @@ class HyDEQueryEmbeddings(Embeddings):
                 notes.append(f"h{hi + 1}:{note}")
         return out, notes
 
+    def _llm_loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop гипотез в фоновом потоке; один на всё время жизни обёртки.
+
+        Async-клиент LLM (httpx у Ollama) держит соединения в пуле своего цикла, поэтому
+        цикл не пересоздаётся на каждый вызов.
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="hyde-llm", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
     def _one_hypothesis_with_timeout(
         self,
         question: str,
         *,
         slot: int,
     ) -> Tuple[Optional[str], Optional[str]]:
-        """Один вызов LLM в отдельном потоке с таймаутом; возвращает (текст, заметка_ошибки)."""
+        """Один ``ainvoke`` LLM с таймаутом; возвращает (текст, заметка_ошибки).
+
+        По таймауту и отмене прогона задача отменяется — запрос к модели обрывается.
+        LLM без собственной async-реализации (``ainvoke`` через executor) так не
+        прерывается: её поток дорабатывает вхолостую, ответ отбрасывается.
+        """
         prompt_text = _HYDE_PROMPT_TEMPLATE.format(question=question)
 
-        def _invoke() -> Tuple[str, Optional[str]]:
-            raw = self._llm.invoke(prompt_text)
+        async def _ainvoke() -> Tuple[str, Optional[str]]:
+            raw = await self._llm.ainvoke(prompt_text)
             coerced = _coerce_llm_text(raw)
             if not coerced:
                 return "", "empty_llm_body"
             return coerced, None
 
         try:
-            with futures.ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(_invoke)
-                try:
-                    body, invoke_note = future.result(timeout=self._timeout_seconds)
-                    if invoke_note == "empty_llm_body":
-                        return None, "empty_llm_body"
-                    return body, None
-                except futures.TimeoutError:
-                    logger.warning(
-                        "HyDE LLM timed out after %.2fs (slot=%s)",
-                        self._timeout_seconds,
-                        slot + 1,
-                    )
-                    return None, "timeout"
+            future = asyncio.run_coroutine_threadsafe(_ainvoke(), self._llm_loop())
+            try:
+                body, invoke_note = self._await_hypothesis(future)
+                if invoke_note == "empty_llm_body":
+                    return None, "empty_llm_body"
+                return body, None
+            except futures.TimeoutError:
+                future.cancel()
+                logger.warning(
+                    "HyDE LLM timed out after %.2fs (slot=%s)",
+                    self._timeout_seconds,
+                    slot + 1,
+                )
+                return None, "timeout"
+            except RunCancelledError:
+                future.cancel()
+                logger.info("HyDE: прогон отменён, запрос гипотезы slot=%s оборван", slot + 1)
+                raise
         except Exception as exc:
             logger.exception(
                 "HyDE LLM invocation error (slot=%s)", slot + 1,
             )
             return None, f"{type(exc).__name__}: {exc!s}"
+
+    def _await_hypothesis(
+        self, future: "futures.Future[Tuple[str, Optional[str]]]",
+    ) -> Tuple[str, Optional[str]]:
+        """``future.result`` с таймаутом, но с проверкой отмены прогона каждые 0.25s."""
+        deadline = time.monotonic() + self._timeout_seconds
+        while True:
+            raise_if_run_cancelled()
+            left = deadline - time.monotonic()
+            if left <= 0:
+                raise futures.TimeoutError()
+            try:
+                return future.result(timeout=min(left, _CANCEL_POLL_SECONDS))
+            except futures.TimeoutError:
+                continue
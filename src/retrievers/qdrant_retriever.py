@@ -8,11 +8,11 @@ from typing import Optional
 
 from langchain_core.language_models import BaseLanguageModel
 from langchain_core.retrievers import BaseRetriever
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_qdrant import FastEmbedSparse, QdrantVectorStore, RetrievalMode
 from qdrant_client import QdrantClient
 
-from src.util.hf_embeddings import huggingface_embedding_model_kwargs
+from src.util.hf_embeddings import shared_huggingface_embeddings
+from src.util.model_registry import shared_model
 
 from .e5_query_embeddings import E5QueryEmbeddings
 from .hyde_retriever import HyDEQueryEmbeddings
@@ -34,11 +34,7 @@ def create_qdrant_retriever(
   # 1. Dense Embeddings (E5)
   emb_cfg = config['embedding_model']
   model_name = emb_cfg['name']
-  base_embeddings = HuggingFaceEmbeddings(
-      model_name=model_name,
-      model_kwargs=huggingface_embedding_model_kwargs(emb_cfg),
-      encode_kwargs={'normalize_embeddings': True}
-  )
+  base_embeddings = shared_huggingface_embeddings(emb_cfg)
   embeddings_for_query = E5QueryEmbeddings(
     base_embeddings) if "e5" in model_name else base_embeddings
 
@@ -54,7 +50,9 @@ def create_qdrant_retriever(
     )
 
   # 2. Sparse Embeddings (BM25-like) через FastEmbed
-  sparse_embeddings = FastEmbedSparse(model_name="Qdrant/bm25")
+  sparse_embeddings = shared_model(
+      "fastembed_sparse", "Qdrant/bm25", lambda: FastEmbedSparse(model_name="Qdrant/bm25")
+  )
 
   # 3. Подключение
   host = os.getenv("QDRANT_HOST", qdrant_config.get('host', 'localhost'))
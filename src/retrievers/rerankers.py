@@ -1,14 +1,46 @@
-from typing import Optional
+import operator
+from typing import Optional, Sequence
 
 from langchain.retrievers.document_compressors import CrossEncoderReranker
 from langchain_community.cross_encoders import HuggingFaceCrossEncoder
-from langchain_core.documents import BaseDocumentCompressor
+from langchain_core.callbacks import Callbacks
+from langchain_core.documents import BaseDocumentCompressor, Document
 
 import logging
 
+from src.util.model_registry import shared_model
+
 logger = logging.getLogger(__name__)
 
 
+class ScoredCrossEncoderReranker(CrossEncoderReranker):
+  """CrossEncoderReranker, оставляющий оценку cross-encoder в metadata["relevance_score"].
+
+  Оценку показывают /api/retrieve и источники /api/answer; исходные документы
+  ретривера не меняются — в выдачу идут копии.
+  """
+
+  def compress_documents(
+      self,
+      documents: Sequence[Document],
+      query: str,
+      callbacks: Optional[Callbacks] = None,
+  ) -> Sequence[Document]:
+    _ = callbacks
+    if not documents:
+      return []
+    scores = self.model.score([(query, doc.page_content) for doc in documents])
+    ranked = sorted(zip(documents, scores), key=operator.itemgetter(1), reverse=True)
+    return [
+        Document(
+            id=doc.id,
+            page_content=doc.page_content,
+            metadata={**doc.metadata, "relevance_score": float(score)},
+        )
+        for doc, score in ranked[: self.top_n]
+    ]
+
+
 def create_reranker(config: dict) -> Optional[BaseDocumentCompressor]:
   """Cross-encoder reranker или None, если reranker.enabled ложь в конфиге."""
   reranker_conf = config['retrievers'].get('reranker', {})
@@ -19,9 +51,11 @@ def create_reranker(config: dict) -> Optional[BaseDocumentCompressor]:
 
   model = reranker_conf.get('model')
   logger.info("Reranker: загрузка модели %s top_n=%s", model, reranker_conf.get('top_n'))
-  cross_encoder = HuggingFaceCrossEncoder(model_name=reranker_conf['model'])
+  cross_encoder = shared_model(
+      "cross_encoder", model, lambda: HuggingFaceCrossEncoder(model_name=model)
+  )
 
-  return CrossEncoderReranker(
+  return ScoredCrossEncoderReranker(
       model=cross_encoder,
       top_n=reranker_conf['top_n']
-  )
\ No newline at end of file
+  )
@@ -0,0 +1,29 @@
+"""add_session_latency_tier
+
+Revision ID: 3e7b9c5d1a42
+Revises: 8c4d2a1e9f00
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3e7b9c5d1a42"
+down_revision: Union[str, Sequence[str], None] = "8c4d2a1e9f00"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+  op.add_column(
+      "rag_bot_sessions",
+      sa.Column("latency_tier", sa.String(), nullable=True),
+  )
+
+
+def downgrade() -> None:
+  op.drop_column("rag_bot_sessions", "latency_tier")
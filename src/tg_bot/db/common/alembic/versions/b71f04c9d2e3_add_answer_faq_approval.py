@@ -0,0 +1,34 @@
+"""add_answer_faq_approval
+
+Revision ID: b71f04c9d2e3
+Revises: 3e7b9c5d1a42
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b71f04c9d2e3"
+down_revision: Union[str, Sequence[str], None] = "3e7b9c5d1a42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+  op.add_column(
+      "rag_bot_answers",
+      sa.Column("faq_approved", sa.Boolean(), server_default=sa.false(), nullable=False),
+  )
+  op.add_column(
+      "rag_bot_answers",
+      sa.Column("faq_source_url", sa.String(), nullable=True),
+  )
+
+
+def downgrade() -> None:
+  op.drop_column("rag_bot_answers", "faq_source_url")
+  op.drop_column("rag_bot_answers", "faq_approved")
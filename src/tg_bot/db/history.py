@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import TYPE_CHECKING, List, Optional
+import sys
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.messages import (
@@ -18,6 +21,92 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# Предзагрузка, которую так и не забрала цепочка (шаблонный ответ, отмена), живёт не дольше.
+_PREFETCH_TTL_SECONDS = 30.0
+
+
+def history_fetch_limit(memory_cfg: Optional[dict]) -> int:
+  """Сколько пар Q/A читает aget_messages при данных настройках memory."""
+  mem = memory_cfg or {}
+  if mem.get("enabled", False):
+    return 100
+  return int(mem.get("window_size", 5))
+
+
+class SessionHistoryPrefetcher:
+  """Чтение ответов сессии, начатое хендлером сразу после получения session_id.
+
+  ``start`` запускает задачу ``get_session_answers``, ``ReadOnlyPostgresHistory``
+  забирает её через ``take`` вместо собственного запроса в БД — чтение истории
+  идёт параллельно с роутингом, а не после него.
+  """
+
+  def __init__(self, answer_repo: IAnswerRepository, limit: int = 5) -> None:
+    self._repo = answer_repo
+    self._limit = max(1, int(limit))
+    self._tasks: Dict[str, Tuple[float, int, "asyncio.Future[Any]"]] = {}
+
+  def start(self, session_id: str) -> None:
+    self._purge_stale()
+    if session_id in self._tasks:
+      return
+    task = asyncio.create_task(
+        self._repo.get_session_answers(session_id, limit=self._limit)
+    )
+    self._tasks[session_id] = (time.monotonic(), self._limit, task)
+
+  def preload(self, session_id: str, answers: List[Any]) -> None:
+    """Готовая история без запроса в БД (разовые сессии HTTP API — всегда пустая)."""
+    self._purge_stale()
+    future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+    future.set_result(list(answers))
+    # История передана целиком — покрывает любой limit.
+    self._tasks[session_id] = (time.monotonic(), sys.maxsize, future)
+
+  def take(self, session_id: str, limit: int) -> Optional["asyncio.Future[Any]"]:
+    """Задача предзагрузки, если она покрывает limit; забирается один раз."""
+    item = self._tasks.pop(session_id, None)
+    if item is None:
+      return None
+    _, fetched_limit, task = item
+    if fetched_limit < limit:
+      task.cancel()
+      return None
+    return task
+
+  async def peek_messages(self, session_id: str) -> List[BaseMessage]:
+    """История из предзагрузки, не забирая её у цепочки (роутинг fused видит историю).
+
+    Нет предзагрузки или она упала — пустая история: роутер решает по одному сообщению.
+    """
+    item = self._tasks.get(session_id)
+    if item is None:
+      return []
+    try:
+      # shield: отмена хендлера не должна отменять чтение, которое ждёт цепочка.
+      answers = await asyncio.shield(item[2])
+    except Exception:
+      logger.warning("История сессии %s: предзагрузка для роутинга упала", session_id, exc_info=True)
+      return []
+    return ReadOnlyPostgresHistory._qa_pairs_to_messages(answers)
+
+  def discard(self, session_id: str) -> None:
+    item = self._tasks.pop(session_id, None)
+    if item is not None:
+      item[2].cancel()
+
+  def _purge_stale(self) -> None:
+    deadline = time.monotonic() - _PREFETCH_TTL_SECONDS
+    for sid in [sid for sid, (at, _, _) in self._tasks.items() if at < deadline]:
+      self.discard(sid)
+
+
+def create_history_prefetcher(config: Any, answer_repo: IAnswerRepository) -> SessionHistoryPrefetcher:
+  cfg_dict = config if isinstance(config, dict) else {}
+  return SessionHistoryPrefetcher(
+      answer_repo, limit=history_fetch_limit(cfg_dict.get("memory")),
+  )
+
 
 class ReadOnlyPostgresHistory(BaseChatMessageHistory):
   """История для LangChain: только чтение из БД; summary в rag_bot_sessions."""
@@ -31,6 +120,7 @@ class ReadOnlyPostgresHistory(BaseChatMessageHistory):
     window_size: int = 5,
     summarization_threshold: int = 4,
     memory_enabled: bool = False,
+    prefetcher: Optional[SessionHistoryPrefetcher] = None,
   ) -> None:
     self.session_id = session_id
     self._repo = answer_repo
@@ -39,6 +129,7 @@ class ReadOnlyPostgresHistory(BaseChatMessageHistory):
     self._window_size = window_size
     self._summarization_threshold = summarization_threshold
     self._memory_enabled = memory_enabled
+    self._prefetcher = prefetcher
 
   @property
   def messages(self) -> List[BaseMessage]:
@@ -54,6 +145,20 @@ class ReadOnlyPostgresHistory(BaseChatMessageHistory):
       out.append(AIMessage(content=ans.bot_answer))
     return out
 
+  async def _load_answers(self, limit: int):
+    """Последние limit пар: из предзагрузки хендлера, если она есть, иначе из БД."""
+    task = self._prefetcher.take(self.session_id, limit) if self._prefetcher else None
+    if task is not None:
+      try:
+        answers = await task
+        return list(answers)[-limit:]
+      except Exception:
+        logger.warning(
+            "История сессии %s: предзагрузка упала, читаем заново", self.session_id,
+            exc_info=True,
+        )
+    return await self._repo.get_session_answers(self.session_id, limit)
+
   async def aget_messages(self) -> List[BaseMessage]:
     """Собирает сообщения для LangChain: либо последние Q/A, либо summary + окно.
 
@@ -67,9 +172,7 @@ class ReadOnlyPostgresHistory(BaseChatMessageHistory):
     )
 
     if not memory_on:
-      answers = await self._repo.get_session_answers(
-          self.session_id, self._window_size
-      )
+      answers = await self._load_answers(self._window_size)
       logger.debug(
           "История сессии %s: режим окна без summary, пар=%s",
           self.session_id,
@@ -77,9 +180,7 @@ class ReadOnlyPostgresHistory(BaseChatMessageHistory):
       )
       return self._qa_pairs_to_messages(answers)
 
-    all_answers = await self._repo.get_session_answers(
-        self.session_id, limit=100
-    )
+    all_answers = await self._load_answers(100)
 
     if len(all_answers) < self._summarization_threshold:
       recent = all_answers[-self._window_size :]
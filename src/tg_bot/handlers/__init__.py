@@ -1,5 +1,8 @@
 from aiogram import Router
+from .admin import admin_router
 from .common import common_router
 
 main_router = Router()
+# Команды админов — раньше common_router: его question_handler принимает любое сообщение.
+main_router.include_router(admin_router)
 main_router.include_router(common_router)
\ No newline at end of file
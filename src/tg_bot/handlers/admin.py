@@ -0,0 +1,46 @@
+"""Команды администраторов бота (bot.broadcast.admin_ids)."""
+import logging
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from src.tg_bot.services.broadcast import (
+    BroadcastAlreadyRunningError,
+    BroadcastService,
+    BroadcastStats,
+)
+
+logger = logging.getLogger(__name__)
+
+admin_router = Router()
+
+
+@admin_router.message(Command("broadcast"))
+async def broadcast_handler(message: Message, broadcast_service: BroadcastService):
+  """/broadcast <текст> — рассылка всем пользователям; итог приходит автору команды.
+
+  Текст берётся с HTML-разметкой сообщения (жирный, ссылки), без самой команды.
+  """
+  if not broadcast_service.is_admin(message.from_user.id):
+    await message.answer("Команда доступна только администраторам бота.")
+    return
+  parts = (message.html_text or "").split(maxsplit=1)
+  text = parts[1].strip() if len(parts) > 1 else ""
+  if not text:
+    await message.answer("Использование: /broadcast текст объявления")
+    return
+
+  async def _report(broadcast_id: str, stats: BroadcastStats) -> None:
+    await message.answer(f"✅ Рассылка {broadcast_id} завершена: {stats.summary()}")
+
+  try:
+    broadcast_id = broadcast_service.start_in_background(message.bot, text, on_done=_report)
+  except BroadcastAlreadyRunningError as exc:
+    await message.answer(f"Уже идёт рассылка {exc}. Дождитесь её завершения.")
+    return
+  logger.info("Рассылка %s запущена админом user_id=%s", broadcast_id, message.from_user.id)
+  await message.answer(
+      f"📣 Рассылка {broadcast_id} запущена. Если бот перезапустится, продолжить: "
+      f"python main.py broadcast --resume {broadcast_id}"
+  )
@@ -1,23 +1,43 @@
-"""Хендлеры Aiogram: старт, сброс сессии, основной вопрос с роутингом и RAG.
+"""Хендлеры Aiogram: старт, сброс сессии, выбор тира, основной вопрос с роутингом и RAG.
 
-Поток вопроса: user/session → typing → semantic_routing → либо быстрый ответ,
-либо RAG (ainvoke, при AttributeError — sync invoke, блокирует event loop).
+Поток вопроса: пролог (user → session ‖ typing ‖ semantic_routing, через asyncio.gather) →
+либо быстрый ответ, либо RAG (ainvoke, при AttributeError — sync invoke, блокирует event loop).
 """
+import asyncio
 import logging
+import time
+from typing import Any, Awaitable, Dict, Optional, Tuple, TypeVar
 
 from aiogram import Router
-from aiogram.filters import CommandStart, Command
+from aiogram.filters import CommandObject, CommandStart, Command
 from aiogram.types import Message
 from langchain_core.runnables import Runnable
 
 from src.util.callbacks import ProfilingCallbackHandler
+from src.util.runtime_metrics import runtime_metrics
+from src.tg_bot.db.history import SessionHistoryPrefetcher
+from src.tg_bot.services.active_runs import ActiveRunRegistry, StaleRunCancelled
+from src.tg_bot.services.answer_streamer import TelegramAnswerStreamer
+from src.tg_bot.services.faq_store import FaqFastPath
+from src.tg_bot.services.fair_scheduler import (
+    FairRequestScheduler,
+    SchedulerTicket,
+    UserQueueFullError,
+)
+from src.tg_bot.services.latency_tiers import LatencyTiers
+from src.tg_bot.services.message_debouncer import MessageDebouncer
+from src.tg_bot.services.speculative_retrieval import (
+    SpeculativeRetrieval,
+    SpeculativeRetrievalStarter,
+)
 from src.tg_bot.services.interfaces import IUserService, IAnswerService, ISessionService
-from src.pipelines.routing import SemanticRoutingPort
 
 logger = logging.getLogger(__name__)
 
 common_router = Router()
 
+T = TypeVar("T")
+
 
 @common_router.message(CommandStart())
 async def start_handler(
@@ -47,122 +67,331 @@ async def newchat_handler(message: Message, session_service: ISessionService):
   await message.answer("🔄 Контекст очищен! Начат новый диалог. О чем хочешь спросить?")
 
 
+@common_router.message(Command("fast", "balanced", "thorough", "tier"))
+async def tier_handler(
+    message: Message,
+    command: CommandObject,
+    session_service: ISessionService,
+    latency_tiers: LatencyTiers,
+):
+  """/fast, /balanced, /thorough — тир латентности чата; /tier — текущий тир и список."""
+  if not latency_tiers.enabled:
+    await message.answer("Режимы скорости ответа сейчас выключены.")
+    return
+  uid = message.from_user.id
+  if command.command == "tier":
+    session_id = await session_service.get_or_create_active_session(uid)
+    current = latency_tiers.resolve(await session_service.get_latency_tier(session_id))
+    lines = [_tier_line(latency_tiers, name) for name in latency_tiers.names]
+    await message.answer(f"Текущий режим: {current}\n\n" + "\n".join(lines))
+    return
+  tier = command.command
+  if tier not in latency_tiers.names:
+    await message.answer(f"Режим {tier} не настроен. Доступны: /tier")
+    return
+  await session_service.set_latency_tier(uid, tier)
+  runtime_metrics.incr(f"tier.{tier}.selected")
+  logger.info("Тир латентности user_id=%s: %s", uid, tier)
+  await message.answer(f"⚙️ Режим {_tier_line(latency_tiers, tier)}")
+
+
 @common_router.message()
 async def question_handler(
     message: Message,
     user_service: IUserService,
     answer_service: IAnswerService,
     session_service: ISessionService,
-    rag_chain: Runnable,
     chat_only_chain: Runnable,
-    semantic_routing_service: SemanticRoutingPort,
+    latency_tiers: LatencyTiers,
+    answer_streamer: TelegramAnswerStreamer,
+    request_scheduler: FairRequestScheduler,
+    active_runs: ActiveRunRegistry,
+    message_debouncer: MessageDebouncer,
+    history_prefetcher: SessionHistoryPrefetcher,
+    speculative_retrieval: SpeculativeRetrievalStarter,
+    faq_fast_path: FaqFastPath,
 ):
   """Обычное сообщение: роутинг → RAG или заготовка; ответ и запись в БД.
 
   Для не-текстовых апдейтов message.text может быть None — передаём в RAG пустую строку
-  для роутера; сохраняем как есть (осторожно с NOT NULL в Answer).
+  для роутера; пара без текста вопроса в БД не пишется (Answer.question NOT NULL).
+  При bot.debounce серия быстрых сообщений чата склеивается: отвечает хендлер
+  последнего сообщения, а в БД уходит одна пара вопрос/ответ со склеенным вопросом.
+  Роутинг и RAG-цепочка берутся из тира латентности сессии (LatencyTiers). При bot.faq
+  первый вопрос сессии с маршрутом rag сначала ищется среди готовых ответов (FaqFastPath).
+  Новое сообщение в той же сессии отменяет незавершённый прогон (ActiveRunRegistry,
+  bot.cancellation); отменённый ответ в БД не пишется.
   """
-  text = message.text or ""
+  merged_text = await message_debouncer.collect(message.chat.id, message.text or "")
+  if merged_text is None:
+    return
+  text = merged_text
+  question = text or message.text
   uid = message.from_user.id
 
-  await user_service.get_or_create_user(
-      user_id=uid,
-      first_name=message.from_user.first_name,
-      username=message.from_user.username
-  )
+  # Пролог параллельно: typing, роутинг и цепочка user → session → тир → предзагрузка
+  # истории (сессию создаём только после upsert пользователя — FK rag_bot_sessions.user_id).
+  # Роутинг ждёт только тир: с identity-кешем это память процесса. Роутеру с историей
+  # (fused: метка + standalone-вопрос одним вызовом) нужна ещё предзагрузка истории.
+  prelude_t0 = time.perf_counter()
+  loop = asyncio.get_running_loop()
+  tier_ready: "asyncio.Future[str]" = loop.create_future()
+  session_ready: "asyncio.Future[str]" = loop.create_future()
+  # bot.speculative_retrieval: поиск по сырому тексту идёт параллельно с роутингом,
+  # RAG-цепочка забирает документы (prefetched_context), иначе поиск отменяется.
+  speculation: Optional[SpeculativeRetrieval] = None
+
+  async def _identity() -> Tuple[str, int]:
+    try:
+      await _timed_step(
+          "prelude_user",
+          user_service.get_or_create_user(
+              user_id=uid,
+              first_name=message.from_user.first_name,
+              username=message.from_user.username
+          ),
+      )
+      sid = await _timed_step(
+          "prelude_session", session_service.get_or_create_active_session(uid),
+      )
+      stored_tier = None
+      if latency_tiers.enabled:
+        stored_tier = await _timed_step("prelude_tier", session_service.get_latency_tier(sid))
+      tier_ready.set_result(latency_tiers.resolve(stored_tier))
+      history_prefetcher.start(sid)
+      session_ready.set_result(sid)
+    except BaseException:
+      tier_ready.cancel()
+      session_ready.cancel()
+      raise
+    return sid, active_runs.begin((uid, sid))
 
-  session_id = await session_service.get_or_create_active_session(uid)
+  async def _route():
+    nonlocal speculation
+    variant = latency_tiers.variant(await tier_ready)
+    speculation = speculative_retrieval.start(variant.retriever, text)
+    routing = variant.routing
+    if not routing.needs_history:
+      return await _timed_step("prelude_route", routing.route(text))
+    history = await history_prefetcher.peek_messages(await session_ready)
+    return await _timed_step("prelude_route", routing.route(text, history=history))
+
+  try:
+    (session_id, run_generation), _, decision = await asyncio.gather(
+        _identity(),
+        _timed_step(
+            "prelude_typing",
+            message.bot.send_chat_action(chat_id=message.chat.id, action="typing"),
+        ),
+        _route(),
+    )
+  except BaseException:
+    _cancel_speculation(speculation)
+    raise
+  tier = tier_ready.result()
+  prelude_elapsed = time.perf_counter() - prelude_t0
+  runtime_metrics.observe("handler.prelude_seconds", prelude_elapsed)
+  logger.info("[TIMING] stage=prelude elapsed=%.2fs", prelude_elapsed)
   logger.info(
-      "Сообщение user_id=%s session_id=%s has_text=%s",
+      "Сообщение user_id=%s session_id=%s tier=%s has_text=%s",
       uid,
       session_id,
+      tier,
       bool(message.text),
   )
+  run_key = (uid, session_id)
 
-  await message.bot.send_chat_action(chat_id=message.chat.id, action="typing")
+  if decision.use_rag and faq_fast_path.enabled:
+    # FAQ только для первого вопроса: уточнение без контекста диалога сравнивать не с чем.
+    history = await history_prefetcher.peek_messages(session_id)
+    faq_answer = await _timed_step(
+        "faq_lookup", faq_fast_path.answer(text, has_history=bool(history)),
+    )
+    if faq_answer is not None:
+      _cancel_speculation(speculation)
+      history_prefetcher.discard(session_id)
+      logger.info("Маршрут: FAQ session_id=%s", session_id)
+      await message.answer(faq_answer)
+      _record_tier(latency_tiers, tier, prelude_t0)
+      await _save_answer(answer_service, session_id, question, faq_answer)
+      return
 
-  decision = await semantic_routing_service.route(text)
   if not decision.use_rag:
-    if decision.use_llm_for_reply:
-      profiler_nc = ProfilingCallbackHandler()
-      chain_config_nc = {
-          "configurable": {"session_id": session_id},
-          "callbacks": [profiler_nc],
-      }
-      try:
-        response_nc = await chat_only_chain.ainvoke(
-            {
-                "input": text,
-                "non_rag_label": decision.non_rag_label or "smalltalk",
-            },
-            config=chain_config_nc,
-        )
-        bot_answer = response_nc["answer"]
-      except AttributeError:
-        response_nc = chat_only_chain.invoke(
-            {
-                "input": text,
-                "non_rag_label": decision.non_rag_label or "smalltalk",
-            },
-            config=chain_config_nc,
-        )
-        bot_answer = response_nc["answer"]
-      except Exception as exc:
-        logger.warning(
-            "chat_only_chain ошибка session_id=%s: %s — шаблон из конфига",
-            session_id,
-            exc,
-        )
-        bot_answer = (decision.answer or "").strip() or (
-            "Задайте вопрос о факультете — я отвечу по базе знаний."
-        )
-    else:
-      bot_answer = (decision.answer or "").strip() or (
-          "Задайте вопрос о факультете — я отвечу по базе знаний."
-      )
+    _cancel_speculation(speculation)
+    template_answer = (decision.answer or "").strip() or (
+        "Задайте вопрос о факультете — я отвечу по базе знаний."
+    )
     logger.info(
         "Маршрут: без RAG (%s) session_id=%s llm=%s",
         decision.non_rag_label,
         session_id,
         decision.use_llm_for_reply,
     )
-    await message.answer(bot_answer)
-    await answer_service.save_answer(
-        session_id=session_id,
-        question=message.text,
-        bot_answer=bot_answer,
-    )
-    return
-
-  profiler = ProfilingCallbackHandler()
+    if not decision.use_llm_for_reply:
+      history_prefetcher.discard(session_id)
+      await message.answer(template_answer)
+      _record_tier(latency_tiers, tier, prelude_t0)
+      await _save_answer(answer_service, session_id, question, template_answer)
+      return
+    chain, label, fallback_answer = chat_only_chain, "chat_only", template_answer
+    inputs = {
+        "input": text,
+        "non_rag_label": decision.non_rag_label or "smalltalk",
+    }
+  else:
+    chain, label, fallback_answer = latency_tiers.variant(tier).rag_chain, "rag", None
+    inputs = {"input": text}
+    if decision.standalone_question:
+      # Роутер fused уже переформулировал вопрос: цепочка ищет по нему без своего LLM-вызова.
+      inputs["standalone_question"] = decision.standalone_question
+    if speculation is not None:
+      inputs["prefetched_context"] = speculation
 
   chain_config = {
     "configurable": {"session_id": session_id},
-    "callbacks": [profiler]
+    "callbacks": [ProfilingCallbackHandler()]
   }
 
   try:
-    response = await rag_chain.ainvoke(
-        {"input": text},
-        config=chain_config
+    bot_answer = await active_runs.run(
+        run_key,
+        run_generation,
+        _answer_with_chain(
+            message,
+            chain,
+            inputs,
+            chain_config,
+            label=label,
+            answer_streamer=answer_streamer,
+            request_scheduler=request_scheduler,
+            fallback_answer=fallback_answer,
+        ),
     )
-    bot_answer = response["answer"]
-    logger.info("RAG ответ получен (ainvoke) session_id=%s", session_id)
-  except AttributeError:
-    logger.warning(
-        "rag_chain без ainvoke — fallback на sync invoke (блокирует event loop) session_id=%s",
+  except StaleRunCancelled:
+    logger.info(
+        "Прогон %s отменён новым сообщением session_id=%s — ответ не сохраняем",
+        label,
         session_id,
     )
-    response = rag_chain.invoke(
-        {"input": text},
-        config=chain_config
-    )
-    bot_answer = response["answer"]
+    return
+  finally:
+    # Цепочка не забрала документы (reformulation, ошибка, отмена) — работа выброшена.
+    _cancel_speculation(speculation)
+  if bot_answer is None:
+    return
+  _record_tier(latency_tiers, tier, prelude_t0)
+  logger.info("Ответ %s получен session_id=%s", label, session_id)
+
+  await _save_answer(answer_service, session_id, question, bot_answer)
+
 
+async def _answer_with_chain(
+    message: Message,
+    chain: Runnable,
+    inputs: Dict[str, Any],
+    chain_config: Dict[str, Any],
+    *,
+    label: str,
+    answer_streamer: TelegramAnswerStreamer,
+    request_scheduler: FairRequestScheduler,
+    fallback_answer: Optional[str] = None,
+) -> Optional[str]:
+  """Прогон цепочки под слотом планировщика и выдача ответа в чат.
+
+  Планировщик (bot.concurrency) — общий лимит параллельности и очередь по кругу между
+  пользователями. None — пользователь упёрся в лимит очереди (ему уже ответили).
+  При bot.streaming ответ стримится (astream + edit_message_text). ``fallback_answer``
+  задан — ошибка цепочки заменяется им (chat-only), иначе пробрасывается (RAG). При
+  стриминге запасной ответ ставит стример — в уже отправленное сообщение, без второго.
+  """
+  ticket = await _enqueue_run(message, request_scheduler, message.from_user.id)
+  if ticket is None:
+    return None
+  async with ticket:
+    if answer_streamer.enabled:
+      return await answer_streamer.stream_answer(
+          message, chain, inputs, chain_config, label=label, fallback_answer=fallback_answer,
+      )
+    try:
+      try:
+        response = await chain.ainvoke(inputs, config=chain_config)
+      except AttributeError:
+        logger.warning(
+            "%s без ainvoke — fallback на sync invoke (блокирует event loop)", label,
+        )
+        response = chain.invoke(inputs, config=chain_config)
+      bot_answer = response["answer"]
+    except Exception as exc:
+      if fallback_answer is None:
+        raise
+      logger.warning("%s ошибка: %s — шаблон из конфига", label, exc)
+      bot_answer = fallback_answer
   await message.answer(bot_answer)
+  return bot_answer
 
+
+def _tier_line(latency_tiers: LatencyTiers, tier: str) -> str:
+  description = latency_tiers.variant(tier).description
+  return f"/{tier} — {description}" if description else f"/{tier}"
+
+
+def _record_tier(latency_tiers: LatencyTiers, tier: str, started: float) -> None:
+  """Метрики тира: время от начала пролога до отправленного ответа."""
+  elapsed = time.perf_counter() - started
+  latency_tiers.record(tier, elapsed)
+  logger.info("[TIMING] tier=%s answer elapsed=%.2fs", tier, elapsed)
+
+
+async def _save_answer(
+    answer_service: IAnswerService, session_id: str, question: Optional[str], bot_answer: str,
+) -> None:
+  """Пара вопрос/ответ в БД; стикер, фото без подписи — без текста вопроса, не пишем."""
+  if not (question or "").strip():
+    logger.info("Ответ на сообщение без текста session_id=%s в БД не сохраняется", session_id)
+    return
   await answer_service.save_answer(
       session_id=session_id,
-      question=message.text,
-      bot_answer=bot_answer
+      question=question,
+      bot_answer=bot_answer,
   )
+
+
+def _cancel_speculation(speculation: Optional[SpeculativeRetrieval]) -> None:
+  if speculation is not None:
+    speculation.cancel()
+
+
+async def _timed_step(stage: str, step: Awaitable[T]) -> T:
+  """await шага пролога с записью [TIMING] и гистограммы ``handler.{stage}_seconds``."""
+  t0 = time.perf_counter()
+  try:
+    return await step
+  finally:
+    elapsed = time.perf_counter() - t0
+    runtime_metrics.observe(f"handler.{stage}_seconds", elapsed)
+    logger.info("[TIMING] stage=%s elapsed=%.2fs", stage, elapsed)
+
+
+async def _enqueue_run(
+    message: Message, scheduler: FairRequestScheduler, user_id: int
+) -> Optional[SchedulerTicket]:
+  """Место в планировщике под прогон цепочки; None — лимит пользователя исчерпан (уже ответили)."""
+  try:
+    ticket = scheduler.acquire(user_id)
+  except UserQueueFullError:
+    logger.info("Планировщик: user_id=%s превысил лимит ожидающих запросов", user_id)
+    await message.answer(
+        "⏳ Я ещё отвечаю на ваши предыдущие вопросы. Дождитесь ответа и спросите снова."
+    )
+    return None
+  if ticket.position and scheduler.notify_queue_position:
+    try:
+      await message.answer(
+          f"⏳ Сейчас много вопросов, ваш в очереди: позиция {ticket.position}. "
+          "Отвечу, как только подойдёт очередь."
+      )
+    except BaseException:
+      # До async with ticket место никто не освободит: без abandon оно утечёт.
+      ticket.abandon()
+      raise
+  return ticket
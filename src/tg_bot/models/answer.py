@@ -1,5 +1,6 @@
 import datetime
-from sqlalchemy import BigInteger, String, TIMESTAMP, ForeignKey, Text
+from typing import Optional
+from sqlalchemy import BigInteger, Boolean, String, TIMESTAMP, ForeignKey, Text, false
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from src.tg_bot.db.base import Base
 import typing
@@ -18,5 +19,10 @@ class Answer(Base):
     created_at: Mapped[datetime.datetime] = mapped_column(
         TIMESTAMP, default=datetime.datetime.utcnow
     )
+    # Одобрено администратором для FAQ (main.py faq-approve); ссылка — источник в ответе FAQ.
+    faq_approved: Mapped[bool] = mapped_column(
+        Boolean, default=False, server_default=false(), nullable=False
+    )
+    faq_source_url: Mapped[Optional[str]] = mapped_column(String, nullable=True)
 
     session: Mapped["UserSession"] = relationship(back_populates="answers")
\ No newline at end of file
@@ -28,5 +28,10 @@ class UserSession(Base):
       Text, nullable=True, default=None
   )
 
+  # fast / balanced / thorough (bot.latency_tiers); None — тир по умолчанию.
+  latency_tier: Mapped[Optional[str]] = mapped_column(
+      String, nullable=True, default=None
+  )
+
   user: Mapped["User"] = relationship(back_populates="sessions")
   answers: Mapped[list["Answer"]] = relationship(back_populates="session")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 from sqlalchemy import update, desc
 from sqlalchemy.future import select
 from src.tg_bot.db import asession
@@ -16,9 +16,11 @@ class SessionRepository(ISessionRepository):
       result = await session.execute(stmt)
       return result.scalar_one_or_none()
 
-  async def create_session(self, user_id: int) -> UserSession:
+  async def create_session(self, user_id: int,
+                           latency_tier: Optional[str] = None) -> UserSession:
     async with asession.begin() as session:
-      new_session = UserSession(user_id=user_id, is_active=True)
+      new_session = UserSession(user_id=user_id, is_active=True,
+                                latency_tier=latency_tier)
       session.add(new_session)
       return new_session
 
@@ -46,6 +48,21 @@ class SessionRepository(ISessionRepository):
       )
       await session.execute(stmt)
 
+  async def get_latency_tier(self, session_id: str) -> Optional[str]:
+    async with asession() as session:
+      stmt = select(UserSession.latency_tier).where(UserSession.id == session_id)
+      result = await session.execute(stmt)
+      return result.scalar_one_or_none()
+
+  async def set_latency_tier(self, session_id: str, tier: Optional[str]) -> None:
+    async with asession.begin() as session:
+      stmt = (
+          update(UserSession)
+          .where(UserSession.id == session_id)
+          .values(latency_tier=tier)
+      )
+      await session.execute(stmt)
+
 class UserRepository(IUserRepository):
     async def get_or_create(self, user_id: int, defaults: dict) -> User:
         async with asession.begin() as session:
@@ -65,6 +82,17 @@ class UserRepository(IUserRepository):
             result = await session.execute(stmt)
             return result.scalars().all()
 
+    async def iter_user_ids(self, after_id: Optional[int] = None,
+        batch_size: int = 1000) -> AsyncIterator[int]:
+        """id пользователей по возрастанию через server-side cursor, без ORM-объектов."""
+        stmt = select(User.id).order_by(User.id).execution_options(yield_per=batch_size)
+        if after_id is not None:
+            stmt = stmt.where(User.id > after_id)
+        async with asession() as session:
+            result = await session.stream_scalars(stmt)
+            async for user_id in result:
+                yield user_id
+
 class AnswerRepository(IAnswerRepository):
   async def create(self, session_id: str, question: str,
       bot_answer: str) -> Answer:
@@ -81,4 +109,22 @@ class AnswerRepository(IAnswerRepository):
         desc(Answer.created_at)).limit(limit)
       result = await session.execute(stmt)
       answers = result.scalars().all()
-      return list(reversed(answers))
\ No newline at end of file
+      return list(reversed(answers))
+
+  async def set_faq_approved(self, answer_id: int, approved: bool,
+      source_url: Optional[str] = None) -> bool:
+    """Отметка для FAQ (faq-approve); False — ответа с таким id нет."""
+    async with asession.begin() as session:
+      stmt = (
+          update(Answer)
+          .where(Answer.id == answer_id)
+          .values(faq_approved=approved, faq_source_url=source_url if approved else None)
+      )
+      result = await session.execute(stmt)
+      return result.rowcount > 0
+
+  async def get_faq_approved(self) -> List[Answer]:
+    async with asession() as session:
+      stmt = select(Answer).where(Answer.faq_approved == True).order_by(Answer.id)
+      result = await session.execute(stmt)
+      return list(result.scalars().all())
@@ -1,5 +1,5 @@
 from abc import abstractmethod
-from typing import List, Optional, Protocol
+from typing import AsyncIterator, List, Optional, Protocol
 from src.tg_bot.models import User, Answer, UserSession
 
 class IUserRepository(Protocol):
@@ -7,6 +7,9 @@ class IUserRepository(Protocol):
     async def get_or_create(self, user_id: int, defaults: dict) -> User: ...
     @abstractmethod
     async def get_all_users(self) -> List[User]: ...
+    @abstractmethod
+    def iter_user_ids(self, after_id: Optional[int] = None,
+        batch_size: int = 1000) -> AsyncIterator[int]: ...
 
 
 class ISessionRepository(Protocol):
@@ -14,7 +17,8 @@ class ISessionRepository(Protocol):
   async def get_active_session(self, user_id: int) -> UserSession | None: ...
 
   @abstractmethod
-  async def create_session(self, user_id: int) -> UserSession: ...
+  async def create_session(self, user_id: int,
+                           latency_tier: Optional[str] = None) -> UserSession: ...
 
   @abstractmethod
   async def close_active_session(self, user_id: int) -> None: ...
@@ -25,6 +29,12 @@ class ISessionRepository(Protocol):
   @abstractmethod
   async def update_summary(self, session_id: str, summary: str) -> None: ...
 
+  @abstractmethod
+  async def get_latency_tier(self, session_id: str) -> Optional[str]: ...
+
+  @abstractmethod
+  async def set_latency_tier(self, session_id: str, tier: Optional[str]) -> None: ...
+
 class IAnswerRepository(Protocol):
   @abstractmethod
   async def create(self, session_id: str, question: str,
@@ -32,4 +42,11 @@ class IAnswerRepository(Protocol):
 
   @abstractmethod
   async def get_session_answers(self, session_id: str, limit: int = 5) -> List[
-    Answer]: ...
\ No newline at end of file
+    Answer]: ...
+
+  @abstractmethod
+  async def set_faq_approved(self, answer_id: int, approved: bool,
+      source_url: Optional[str] = None) -> bool: ...
+
+  @abstractmethod
+  async def get_faq_approved(self) -> List[Answer]: ...
@@ -0,0 +1,234 @@
+"""Write-behind для ответов: буфер в памяти и многострочный INSERT раз в N мс или M строк.
+
+``AnswerRepository.create`` открывает транзакцию на каждый ответ, и хендлер ждёт её
+после отправки сообщения. Здесь ``create`` только кладёт строку в буфер; фоновая задача
+пишет буфер одним ``INSERT ... VALUES (...), (...)``. ``get_session_answers`` читает
+через буфер: ещё не записанные строки сессии домешиваются к прочитанным из БД, чтобы
+история следующего вопроса их видела. ``close`` (dp.shutdown) дописывает остаток.
+
+Пачка, которую БД отвергла, пишется по одной строке: строки с ошибкой данных
+(IntegrityError / DataError — например, NULL в NOT NULL) выбрасываются со счётчиком
+``answers.write_behind_dropped``, остальные записываются. Ошибка соединения оставляет
+строки в буфере до следующего тика; буфер ограничен ``max_buffer_rows`` — сверх него
+новые ответы не принимаются (тот же счётчик), чтобы недоступная БД не съела память.
+"""
+import asyncio
+import datetime
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from src.tg_bot.db import asession
+from src.tg_bot.models import Answer
+from src.util.runtime_metrics import runtime_metrics
+from .interfaces import IAnswerRepository
+
+logger = logging.getLogger(__name__)
+
+# Ошибки самой строки: повтор не поможет, строка выбрасывается.
+_BAD_ROW_ERRORS = (IntegrityError, DataError)
+
+
+def _row_key(answer: Answer) -> Tuple[Any, str, str]:
+  return answer.created_at, answer.question, answer.bot_answer
+
+
+class WriteBehindAnswerRepository(IAnswerRepository):
+  def __init__(
+      self,
+      inner: IAnswerRepository,
+      *,
+      flush_interval_ms: int = 200,
+      max_batch_rows: int = 100,
+      max_buffer_rows: int = 10_000,
+  ):
+    self._inner = inner
+    self._interval = max(10, int(flush_interval_ms)) / 1000.0
+    self._max_batch = max(1, int(max_batch_rows))
+    self._max_buffer = max(self._max_batch, int(max_buffer_rows))
+    self._buffer: List[Answer] = []
+    self._pending_by_session: Dict[str, List[Answer]] = {}
+    self._wakeup: Optional[asyncio.Event] = None
+    self._flush_lock: Optional[asyncio.Lock] = None
+    self._flusher: Optional[asyncio.Task] = None
+    self._closed = False
+
+  async def create(self, session_id: str, question: str,
+      bot_answer: str) -> Answer:
+    """Ставит ответ в буфер; created_at фиксируется сейчас, а не в момент INSERT.
+
+    Буфер полон (БД давно недоступна) — ответ не сохраняется: счётчик и лог.
+    """
+    if self._closed:
+      return await self._inner.create(session_id, question, bot_answer)
+    answer = Answer(
+        session_id=session_id,
+        question=question,
+        bot_answer=bot_answer,
+        created_at=datetime.datetime.utcnow(),
+    )
+    if len(self._buffer) >= self._max_buffer:
+      runtime_metrics.incr("answers.write_behind_dropped")
+      logger.error(
+          "Write-behind: буфер полон (%s строк), ответ session_id=%s не сохранён",
+          len(self._buffer), session_id,
+      )
+      return answer
+    self._buffer.append(answer)
+    self._pending_by_session.setdefault(session_id, []).append(answer)
+    self._ensure_flusher()
+    if len(self._buffer) >= self._max_batch:
+      self._wakeup.set()
+    runtime_metrics.set_gauge("answers.write_behind_pending", len(self._buffer))
+    return answer
+
+  async def get_session_answers(self, session_id: str, limit: int = 5) -> List[
+    Answer]:
+    """Последние limit ответов сессии: БД + ещё не записанные строки буфера.
+
+    Снимок буфера берётся до чтения: строка, записанная во время чтения, либо уже
+    в выборке (дубль отсекается по created_at/тексту), либо ещё в снимке.
+    """
+    pending = list(self._pending_by_session.get(session_id, ()))
+    rows = await self._inner.get_session_answers(session_id, limit)
+    if not pending:
+      return rows
+    stored = {_row_key(row) for row in rows}
+    merged = list(rows) + [a for a in pending if _row_key(a) not in stored]
+    merged.sort(key=lambda a: a.created_at)
+    return merged[-limit:]
+
+  async def set_faq_approved(self, answer_id: int, approved: bool,
+      source_url: Optional[str] = None) -> bool:
+    return await self._inner.set_faq_approved(answer_id, approved, source_url)
+
+  async def get_faq_approved(self) -> List[Answer]:
+    return await self._inner.get_faq_approved()
+
+  async def flush(self) -> int:
+    """Пишет буфер пачками по max_batch_rows.
+
+    Отвергнутая пачка повторяется по строке: плохие строки выбрасываются, при ошибке
+    соединения остаток ждёт следующей попытки.
+    """
+    if self._flush_lock is None:
+      self._flush_lock = asyncio.Lock()
+    written = 0
+    async with self._flush_lock:
+      while self._buffer:
+        batch = self._buffer[: self._max_batch]
+        t0 = time.perf_counter()
+        try:
+          await self._insert(batch)
+        except Exception:
+          runtime_metrics.incr("answers.write_behind_failed")
+          logger.exception(
+              "Write-behind: INSERT %s ответов не удался, пишем по одной строке",
+              len(batch),
+          )
+          stored, retry_later = await self._insert_one_by_one(batch)
+          written += stored
+          if retry_later:
+            break
+          continue
+        self._forget(batch)
+        written += len(batch)
+        runtime_metrics.observe("answers.write_behind_flush_seconds", time.perf_counter() - t0)
+        runtime_metrics.incr("answers.write_behind_rows", len(batch))
+    runtime_metrics.set_gauge("answers.write_behind_pending", len(self._buffer))
+    return written
+
+  async def _insert(self, batch: List[Answer]) -> None:
+    rows = [
+        {
+            "session_id": a.session_id,
+            "question": a.question,
+            "bot_answer": a.bot_answer,
+            "created_at": a.created_at,
+        }
+        for a in batch
+    ]
+    async with asession.begin() as session:
+      await session.execute(insert(Answer).values(rows))
+
+  async def _insert_one_by_one(self, batch: List[Answer]) -> Tuple[int, bool]:
+    """(записано строк, остались ли строки до следующей попытки — ошибка не в данных)."""
+    written = 0
+    for answer in batch:
+      try:
+        await self._insert([answer])
+      except _BAD_ROW_ERRORS as exc:
+        runtime_metrics.incr("answers.write_behind_dropped")
+        logger.error(
+            "Write-behind: ответ session_id=%s отвергнут БД и выброшен: %s",
+            answer.session_id, exc,
+        )
+      except Exception:
+        logger.warning("Write-behind: БД недоступна, повтор на следующем тике", exc_info=True)
+        return written, True
+      else:
+        written += 1
+        runtime_metrics.incr("answers.write_behind_rows")
+      self._forget([answer])
+    return written, False
+
+  def _forget(self, rows: List[Answer]) -> None:
+    """Убирает записанные (или выброшенные) строки из буфера и индекса по сессиям."""
+    done = {id(a) for a in rows}
+    # Пока шёл INSERT, create мог дописать строки в конец — удаляем по идентичности.
+    self._buffer[:] = [a for a in self._buffer if id(a) not in done]
+    for a in rows:
+      session_rows = self._pending_by_session.get(a.session_id)
+      if session_rows is not None and a in session_rows:
+        session_rows.remove(a)
+        if not session_rows:
+          del self._pending_by_session[a.session_id]
+
+  def _ensure_flusher(self) -> None:
+    if self._flusher is not None and not self._flusher.done():
+      return
+    self._wakeup = asyncio.Event()
+    self._flusher = asyncio.create_task(self._run_flusher(), name="answers-write-behind")
+
+  async def _run_flusher(self) -> None:
+    while True:
+      try:
+        await asyncio.wait_for(self._wakeup.wait(), timeout=self._interval)
+      except asyncio.TimeoutError:
+        pass
+      self._wakeup.clear()
+      if self._buffer:
+        await self.flush()
+
+  async def close(self) -> None:
+    """dp.shutdown: останавливает фоновую задачу и дописывает буфер."""
+    self._closed = True
+    if self._flusher is not None:
+      self._flusher.cancel()
+      await asyncio.gather(self._flusher, return_exceptions=True)
+      self._flusher = None
+    written = await self.flush()
+    if self._buffer:
+      logger.error("Write-behind: при остановке не записано ответов: %s", len(self._buffer))
+    else:
+      logger.info("Write-behind: при остановке дописано ответов: %s", written)
+
+
+def create_write_behind_answer_repo(
+    config: Any, inner: IAnswerRepository,
+) -> Optional[WriteBehindAnswerRepository]:
+  """Обёртка по bot.write_behind; выключено — None (ответы пишутся синхронно)."""
+  cfg_dict = config if isinstance(config, dict) else {}
+  bot_cfg = cfg_dict.get("bot") or {}
+  block = bot_cfg.get("write_behind") if isinstance(bot_cfg, dict) else None
+  if not isinstance(block, dict) or not block.get("enabled", False):
+    return None
+  return WriteBehindAnswerRepository(
+      inner,
+      flush_interval_ms=int(block.get("flush_interval_ms", 200)),
+      max_batch_rows=int(block.get("max_batch_rows", 100)),
+      max_buffer_rows=int(block.get("max_buffer_rows", 10_000)),
+  )
@@ -1,22 +1,60 @@
+import argparse
+import asyncio
 import logging
+import multiprocessing
+import multiprocessing.connection
 import os
+import signal
 import sys
+import time
+from typing import Any, Optional
+
 import yaml
 from aiohttp import web
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiogram.webhook.aiohttp_server import setup_application
+from dependency_injector import providers
 
 from src.di_containers import Container
 from src.tg_bot.handlers import main_router
+from src.tg_bot.server.http_api import create_http_api
+from src.tg_bot.server.queued_handler import create_webhook_request_handler
+from src.tg_bot.server.runtime import (
+    apply_server_runtime,
+    create_bot_session,
+    fast_runtime_enabled,
+)
+from src.tg_bot.server.warmup import create_startup_warmup, warmup_config
 from src.tg_bot.services.interfaces import IUserService
+from src.tg_bot.services.latency_tiers import create_latency_tiers
+from src.util.runtime_metrics import runtime_metrics
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def on_startup(bot: Bot):
-    logger.info("Веб-сервер запускается, устанавливаем вебхук...")
+WEB_APP_HOST = "0.0.0.0"
+WEB_APP_PORT = 8080
+WEBHOOK_PATH = "/webhook"
+
+# Тяжёлые библиотеки, которые родитель импортирует до fork (страницы кода общие, copy-on-write).
+# Сами модели (bge-m3, реранкер, FastEmbed) грузятся уже в воркере: torch после fork
+# с уже поднятыми потоками может зависнуть.
+_PRELOAD_MODULES = (
+    "torch",
+    "sentence_transformers",
+    "fastembed",
+    "langchain_huggingface",
+    "langchain_qdrant",
+)
+
+async def on_shutdown(bot: Bot):
+    logger.info("Веб-сервер останавливается, удаляем вебхук...")
+    await bot.delete_webhook()
+    logger.info("Метрики процесса: %s", runtime_metrics.snapshot())
+
+async def _set_webhook(bot: Bot) -> None:
     webhook_url = os.getenv("TGSERVER__WEBHOOK_URL")
     if not webhook_url:
         logger.error("Переменная окружения TGSERVER__WEBHOOK_URL не установлена!")
@@ -24,11 +62,25 @@ async def on_startup(bot: Bot):
     await bot.set_webhook(webhook_url)
     logger.info(f"Вебхук успешно установлен на {webhook_url}")
 
-async def on_shutdown(bot: Bot):
-    logger.info("Веб-сервер останавливается, удаляем вебхук...")
-    await bot.delete_webhook()
+async def metrics_handler(request: web.Request) -> web.Response:
+    """GET /metrics — счётчики и тайминги процесса (очередь вебхука, TTFT и т.д.).
 
-def main():
+    При --workers N каждый воркер отвечает своими метриками (поле pid).
+    """
+    return web.json_response({"pid": os.getpid(), **runtime_metrics.snapshot()})
+
+async def healthz_handler(request: web.Request) -> web.Response:
+    """GET /healthz — процесс жив; прогрев по компонентам — для информации."""
+    return web.json_response({"status": "ok", "pid": os.getpid(), **request.app["warmup"].report()})
+
+async def readyz_handler(request: web.Request) -> web.Response:
+    """GET /readyz — 200 после успешного прогрева, иначе 503 с состоянием компонентов."""
+    warmup = request.app["warmup"]
+    return web.json_response(
+        {"pid": os.getpid(), **warmup.report()}, status=200 if warmup.ready else 503,
+    )
+
+def load_config() -> dict:
     try:
         with open('config/config.yaml', 'r', encoding='utf-8') as f:
             config_data = yaml.safe_load(f)
@@ -36,45 +88,300 @@ def main():
     except FileNotFoundError:
         logger.error("❌ Ошибка: Файл config/config.yaml не найден.")
         sys.exit(1)
+    return config_data
 
-    container = Container()
-    container.config.from_dict(config_data)
+def _server_config(config_data: dict) -> dict:
+    block = (config_data.get("bot") or {}).get("server")
+    return block if isinstance(block, dict) else {}
 
-    bot = Bot(
+def create_bot(config_data: dict) -> Bot:
+    return Bot(
         token=os.getenv("TGSERVER__TOKEN"),
+        session=create_bot_session(fast_runtime_enabled(config_data)),
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
+
+def build_app(
+    config_data: dict,
+    *,
+    manage_webhook: bool = True,
+    ready_event: Optional[Any] = None,
+) -> web.Application:
+    """Контейнер, Dispatcher и aiohttp-приложение одного процесса.
+
+    manage_webhook=True — прогрев идёт в фоне при уже открытом порту (/readyz отвечает),
+    вебхук ставится после него. manage_webhook=False — воркер под супервизором: прогрев
+    до открытия порта, затем ready_event; вебхук ставит и снимает родитель.
+    """
+    container = Container()
+    container.config.from_dict(config_data)
+
+    bot = create_bot(config_data)
     dp = Dispatcher()
 
 
+    write_behind_repo = container.bot_write_behind_answer_repo()
+    if write_behind_repo is not None:
+        # Все читатели истории (цепочки, предзагрузка) должны видеть ещё не записанные ответы.
+        container.bot_answer_repo.override(providers.Object(write_behind_repo))
+        dp.shutdown.register(write_behind_repo.close)
+        logger.info("Ответы пишутся через write-behind очередь (bot.write_behind)")
+
     logger.info("Инициализация RAG-компонентов...")
+    t0 = time.perf_counter()
+    final_retriever = container.final_retriever()
+    retriever_load_seconds = time.perf_counter() - t0
     dp["user_service"] = container.bot_user_service()
     dp["answer_service"] = container.bot_answer_service()
     dp["rag_chain"] = container.rag_chain()
     dp["chat_only_chain"] = container.chat_only_chain()
     dp["semantic_routing_service"] = container.semantic_routing_service()
     dp["session_service"] = container.bot_session_service()
+    dp["answer_streamer"] = container.answer_streamer()
+    dp["request_scheduler"] = container.request_scheduler()
+    dp["active_runs"] = container.active_runs()
+    dp["message_debouncer"] = container.message_debouncer()
+    dp["speculative_retrieval"] = container.speculative_retrieval()
+    dp["faq_fast_path"] = container.faq_fast_path()
+    dp["history_prefetcher"] = container.history_prefetcher()
+    dp["broadcast_service"] = container.broadcast_service()
+    dp["latency_tiers"] = create_latency_tiers(
+        config_data,
+        container,
+        rag_chain=dp["rag_chain"],
+        routing=dp["semantic_routing_service"],
+        retriever=final_retriever,
+    )
     logger.info("RAG-компоненты готовы.")
 
+    warmup = create_startup_warmup(
+        config_data,
+        routing=dp["semantic_routing_service"],
+        retriever=final_retriever,
+        latency_tiers=dp["latency_tiers"],
+    )
+    warmup.record("retriever_models", retriever_load_seconds)
+
     dp.include_router(main_router)
-    dp.startup.register(on_startup)
-    dp.shutdown.register(on_shutdown)
+    if manage_webhook:
+        dp.shutdown.register(on_shutdown)
 
     app = web.Application()
-    webhook_requests_handler = SimpleRequestHandler(
-        dispatcher=dp,
-        bot=bot,
-    )
+    app["warmup"] = warmup
+    webhook_requests_handler = create_webhook_request_handler(dp, bot, config_data)
 
-    webhook_path = "/webhook"
-    webhook_requests_handler.register(app, path=webhook_path)
+    webhook_requests_handler.register(app, path=WEBHOOK_PATH)
     setup_application(app, dp, bot=bot)
+    app.router.add_get("/metrics", metrics_handler)
+    app.router.add_get("/healthz", healthz_handler)
+    app.router.add_get("/readyz", readyz_handler)
+    http_api = create_http_api(
+        config_data,
+        latency_tiers=dp["latency_tiers"],
+        history_prefetcher=dp["history_prefetcher"],
+        request_scheduler=dp["request_scheduler"],
+    )
+    if http_api is not None:
+        http_api.register(app)
+        logger.info("HTTP API: /api/answer, /api/retrieve, /api/batch (bot.http_api)")
+
+    fail_open = bool(warmup_config(config_data).get("fail_open", True))
+    if manage_webhook:
+        _register_warmup_then_webhook(app, bot, fail_open)
+    else:
+        _register_blocking_warmup(app, ready_event, fail_open)
+
+    interval = float(_server_config(config_data).get("metrics_log_interval_seconds", 0) or 0)
+    if interval > 0:
+        _register_metrics_logger(app, interval)
+    return app
 
-    web_app_host = "0.0.0.0"
-    web_app_port = 8080
-    logger.info(f"Запуск веб-сервера на {web_app_host}:{web_app_port}")
+def _register_warmup_then_webhook(app: web.Application, bot: Bot, fail_open: bool) -> None:
+    """Один процесс: порт открыт сразу, прогрев в фоне, вебхук — после него."""
+
+    async def _warm_and_set_webhook() -> None:
+        ready = await app["warmup"].run()
+        if ready or fail_open:
+            logger.info("Прогрев закончен, устанавливаем вебхук...")
+            await _set_webhook(bot)
+        else:
+            logger.error("Прогрев не удался, вебхук не установлен (bot.warmup.fail_open=false)")
+
+    async def _start(app_: web.Application) -> None:
+        app_["warmup_task"] = asyncio.create_task(_warm_and_set_webhook())
+
+    async def _stop(app_: web.Application) -> None:
+        task = app_.get("warmup_task")
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    app.on_startup.append(_start)
+    app.on_cleanup.append(_stop)
+
+def _register_blocking_warmup(app: web.Application, ready_event: Optional[Any], fail_open: bool) -> None:
+    """Воркер: прогрев до открытия порта, чтобы SO_REUSEPORT не отдал апдейт холодному процессу."""
+
+    async def _warm(app_: web.Application) -> None:
+        ready = await app_["warmup"].run()
+        if ready_event is not None and (ready or fail_open):
+            ready_event.set()
+
+    app.on_startup.append(_warm)
+
+def _register_metrics_logger(app: web.Application, interval: float) -> None:
+    """Периодический лог метрик процесса: при N воркерах у каждого своя строка с pid."""
+
+    async def _loop() -> None:
+        while True:
+            await asyncio.sleep(interval)
+            logger.info("Метрики воркера pid=%s: %s", os.getpid(), runtime_metrics.snapshot())
+
+    async def _start(app_: web.Application) -> None:
+        app_["metrics_logger"] = asyncio.create_task(_loop())
+
+    async def _stop(app_: web.Application) -> None:
+        task = app_.get("metrics_logger")
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        logger.info("Метрики воркера pid=%s при остановке: %s", os.getpid(), runtime_metrics.snapshot())
+
+    app.on_startup.append(_start)
+    app.on_cleanup.append(_stop)
+
+def run_single(config_data: dict) -> None:
+    app = build_app(config_data)
+    logger.info(f"Запуск веб-сервера на {WEB_APP_HOST}:{WEB_APP_PORT}")
+    web.run_app(app, host=WEB_APP_HOST, port=WEB_APP_PORT)
+
+def _worker_main(config_data: dict, worker_idx: int, ready_event: Any) -> None:
+    """Тело воркера после fork: свой event loop, контейнер и модели; порт общий (SO_REUSEPORT)."""
+    # Обработчики сигналов супервизора унаследованы через fork — воркеру нужны свои.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    logger.info("Воркер #%s pid=%s: сборка приложения", worker_idx, os.getpid())
+    app = build_app(config_data, manage_webhook=False, ready_event=ready_event)
+    web.run_app(
+        app,
+        host=WEB_APP_HOST,
+        port=WEB_APP_PORT,
+        reuse_port=True,
+        print=None,
+    )
+
+def _preload_modules() -> None:
+    t0 = time.perf_counter()
+    loaded = []
+    for name in _PRELOAD_MODULES:
+        try:
+            __import__(name)
+            loaded.append(name)
+        except ImportError:
+            logger.debug("Предзагрузка: модуль %s не установлен", name)
+    logger.info(
+        "Предзагрузка до fork: %s за %.1fs", ", ".join(loaded) or "—", time.perf_counter() - t0
+    )
+
+async def _parent_webhook(config_data: dict, action: str) -> None:
+    bot = create_bot(config_data)
+    try:
+        if action == "set":
+            await _set_webhook(bot)
+        else:
+            await bot.delete_webhook()
+            logger.info("Вебхук удалён")
+    finally:
+        await bot.session.close()
+
+def run_workers(config_data: dict, workers: int) -> None:
+    """Супервизор: вебхук один раз в родителе, N fork-воркеров на одном порту.
+
+    Вебхук ставится, когда все воркеры прогрелись (bot.warmup). Упавший воркер
+    перезапускается; SIGTERM/SIGINT пересылается воркерам, после их выхода родитель
+    снимает вебхук. Состояние в памяти (дедуп update_id, debounce,
+    отмена прогонов, кеши, лимит планировщика) — своё у каждого воркера.
+    """
+    if sys.platform == "win32":
+        raise SystemExit("--workers > 1 требует fork и SO_REUSEPORT (Linux/macOS)")
+    # --workers из CLI — в конфиг воркеров: фабрики (bot.identity_cache) видят реальное число процессов.
+    config_data.setdefault("bot", {}).setdefault("server", {})["workers"] = workers
+    if _server_config(config_data).get("preload_modules", True):
+        _preload_modules()
+
+    ctx = multiprocessing.get_context("fork")
+    processes = {}
+    ready_events = {}
+    stopping = False
+    webhook_set = False
+
+    def _spawn(idx: int) -> None:
+        ready_events[idx] = ctx.Event()
+        proc = ctx.Process(
+            target=_worker_main, args=(config_data, idx, ready_events[idx]), name=f"bot-worker-{idx}",
+        )
+        proc.start()
+        processes[idx] = proc
+        logger.info("Воркер #%s запущен pid=%s", idx, proc.pid)
+
+    def _stop(signum, frame) -> None:
+        nonlocal stopping
+        _ = frame
+        if stopping:
+            return
+        stopping = True
+        logger.info("Сигнал %s: останавливаем %s воркеров", signum, len(processes))
+        for proc in processes.values():
+            if proc.is_alive():
+                proc.terminate()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    for idx in range(workers):
+        _spawn(idx)
+    logger.info(f"Запуск {workers} воркеров на {WEB_APP_HOST}:{WEB_APP_PORT} (reuse_port)")
+
+    while processes:
+        # Пока вебхук не поставлен, просыпаемся и для проверки готовности воркеров.
+        multiprocessing.connection.wait(
+            [p.sentinel for p in processes.values()], timeout=None if webhook_set else 0.5,
+        )
+        if not webhook_set and not stopping and all(e.is_set() for e in ready_events.values()):
+            logger.info("Все %s воркеров прогреты, устанавливаем вебхук...", len(processes))
+            asyncio.run(_parent_webhook(config_data, "set"))
+            webhook_set = True
+        for idx, proc in list(processes.items()):
+            if proc.is_alive():
+                continue
+            proc.join()
+            del processes[idx]
+            if not stopping:
+                logger.error(
+                    "Воркер #%s pid=%s завершился (код %s) — перезапуск", idx, proc.pid, proc.exitcode,
+                )
+                time.sleep(1)
+                _spawn(idx)
+
+    asyncio.run(_parent_webhook(config_data, "delete"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Webhook-сервер Telegram-бота")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="число процессов на общем порту (SO_REUSEPORT); по умолчанию bot.server.workers или 1",
+    )
+    args = parser.parse_args()
 
-    web.run_app(app, host=web_app_host, port=web_app_port)
+    config_data = load_config()
+    # До первого asyncio.run / run_app: политика цикла наследуется и воркерами после fork.
+    apply_server_runtime(config_data)
+    workers = args.workers or int(_server_config(config_data).get("workers", 1) or 1)
+    if workers > 1:
+        run_workers(config_data, workers)
+    else:
+        run_single(config_data)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
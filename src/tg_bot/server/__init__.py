@@ -0,0 +1 @@
+"""Серверная обвязка бота: aiohttp-приложение вокруг Dispatcher (webhook, служебные маршруты)."""
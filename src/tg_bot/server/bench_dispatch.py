@@ -0,0 +1,166 @@
+"""Микробенчмарк: пропускная способность разбора и диспетчеризации апдейтов через main_router.
+
+Синтетические апдейты (/start, /newchat, правки сообщений) проходят тот же путь, что и
+в вебхуке: ``json_loads`` тела → ``Update.model_validate`` → ``Dispatcher.feed_update``
+→ хендлер → ``message.answer``. Запросы к Bot API не уходят в сеть: сессия сериализует
+метод (build_form_data) и разбирает синтетический ответ через тот же json_loads. Сервисы
+пользователей и сессий — в памяти, чтобы мерить диспетчеризацию, а не Postgres.
+Режимы: default (stdlib asyncio + json) и fast (uvloop + orjson, см. runtime.py).
+"""
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import SendMessage, TelegramMethod
+from aiogram.types import Update
+
+from src.tg_bot.handlers import main_router
+from src.tg_bot.server.runtime import current_loop_name, install_uvloop, json_codecs
+
+_BENCH_TOKEN = "123456:bench-dispatch"
+_BENCH_CHAT_TYPE = "private"
+
+
+class _OfflineSession(AiohttpSession):
+  """AiohttpSession без сети: тот же build_form_data и check_response, ответ синтетический."""
+
+  def __init__(self, **kwargs: Any) -> None:
+    super().__init__(**kwargs)
+    self._message_id = 0
+
+  async def make_request(
+      self, bot: Bot, method: TelegramMethod[Any], timeout: Optional[int] = None
+  ) -> Any:
+    _ = timeout
+    self.build_form_data(bot=bot, method=method)
+    if isinstance(method, SendMessage):
+      self._message_id += 1
+      result: Any = {
+          "message_id": self._message_id,
+          "date": int(time.time()),
+          "chat": {"id": method.chat_id, "type": _BENCH_CHAT_TYPE},
+          "text": method.text,
+      }
+    else:
+      result = True
+    content = self.json_dumps({"ok": True, "result": result})
+    response = self.check_response(bot=bot, method=method, status_code=200, content=content)
+    return response.result
+
+
+class _MemoryUserService:
+  async def get_or_create_user(self, user_id: int, first_name: str, username: Optional[str]):
+    _ = user_id, first_name, username
+    return None
+
+  async def get_all_user_ids(self) -> List[int]:
+    return []
+
+
+class _MemorySessionService:
+  def __init__(self) -> None:
+    self._sessions: Dict[int, str] = {}
+    self._counter = 0
+
+  async def get_or_create_active_session(self, user_id: int) -> str:
+    sid = self._sessions.get(user_id)
+    if sid is None:
+      sid = await self.start_new_session(user_id)
+    return sid
+
+  async def start_new_session(self, user_id: int) -> str:
+    self._counter += 1
+    self._sessions[user_id] = f"bench-{self._counter}"
+    return self._sessions[user_id]
+
+
+def synthetic_updates(count: int, users: int = 500) -> List[bytes]:
+  """Тела webhook-запросов: /start и /newchat вперемешку, каждый четвёртый — правка сообщения."""
+  now = int(time.time())
+  bodies: List[bytes] = []
+  for i in range(count):
+    uid = 10_000 + i % max(1, users)
+    message = {
+        "message_id": i + 1,
+        "date": now,
+        "chat": {"id": uid, "type": _BENCH_CHAT_TYPE, "first_name": "Bench"},
+        "from": {"id": uid, "is_bot": False, "first_name": "Bench", "username": f"u{uid}"},
+        "text": "/start" if i % 2 == 0 else "/newchat",
+    }
+    kind = "edited_message" if i % 4 == 3 else "message"
+    if kind == "edited_message":
+      message["edit_date"] = now
+      message["text"] = "исправленный вопрос о факультете"
+    bodies.append(json.dumps({"update_id": i + 1, kind: message}).encode())
+  return bodies
+
+
+def _build_dispatcher() -> Dispatcher:
+  dp = Dispatcher()
+  dp["user_service"] = _MemoryUserService()
+  dp["session_service"] = _MemorySessionService()
+  dp.include_router(main_router)
+  return dp
+
+
+async def _dispatch_all(
+    dp: Dispatcher, bot: Bot, bodies: List[bytes], concurrency: int,
+) -> float:
+  loads = bot.session.json_loads
+  semaphore = asyncio.Semaphore(max(1, concurrency))
+
+  async def _one(body: bytes) -> None:
+    async with semaphore:
+      update = Update.model_validate(loads(body), context={"bot": bot})
+      await dp.feed_update(bot, update)
+
+  t0 = time.perf_counter()
+  await asyncio.gather(*(_one(body) for body in bodies))
+  return time.perf_counter() - t0
+
+
+def _run_mode(
+    dp: Dispatcher, fast: bool, bodies: List[bytes], *, concurrency: int, rounds: int,
+) -> Dict[str, Any]:
+  loads, dumps, json_name = json_codecs(fast)
+  previous_policy = asyncio.get_event_loop_policy()
+  # default — именно stdlib-цикл: aiogram при импорте мог уже поставить uvloop.
+  if not (fast and install_uvloop()):
+    asyncio.set_event_loop_policy(None)
+  loop_name = current_loop_name()
+
+  async def _bench() -> List[float]:
+    bot = Bot(token=_BENCH_TOKEN, session=_OfflineSession(json_loads=loads, json_dumps=dumps))
+    # Короткий прогон до замера: ленивые импорты и кеши pydantic.
+    await _dispatch_all(dp, bot, bodies[: min(len(bodies), 200)], concurrency)
+    return [await _dispatch_all(dp, bot, bodies, concurrency) for _ in range(max(1, rounds))]
+
+  try:
+    timings = asyncio.run(_bench())
+  finally:
+    asyncio.set_event_loop_policy(previous_policy)
+  best = min(timings)
+  return {
+      "mode": "fast" if fast else "default",
+      "loop": loop_name,
+      "json": json_name,
+      "updates": len(bodies),
+      "best_seconds": round(best, 4),
+      "updates_per_second": round(len(bodies) / best, 1) if best > 0 else None,
+      "us_per_update": round(best / len(bodies) * 1e6, 1) if bodies else None,
+  }
+
+
+def run_dispatch_benchmark(
+    updates: int = 5000, *, concurrency: int = 64, rounds: int = 3,
+) -> List[Dict[str, Any]]:
+  """Оба режима на одном наборе апдейтов; лучший из rounds прогонов каждого."""
+  bodies = synthetic_updates(updates)
+  dp = _build_dispatcher()
+  return [
+      _run_mode(dp, fast, bodies, concurrency=concurrency, rounds=rounds)
+      for fast in (False, True)
+  ]
@@ -0,0 +1,367 @@
+"""HTTP JSON API рядом с вебхуком: тот же прогретый RAG-стек без Telegram.
+
+``POST /api/answer`` — ответ RAG: SSE (``sources`` → ``token``… → ``done``) или один JSON
+при ``"stream": false``; ``POST /api/retrieve`` — top документов финального ретривера тира
+с оценкой реранкера; ``POST /api/batch`` — список вопросов с ограниченной параллельностью.
+
+Цепочки и ретриверы — те же экземпляры, что у бота (LatencyTiers: поле ``tier`` выбирает
+вариант, по умолчанию — тир по умолчанию), прогоны генерации и поиска идут через общий
+FairRequestScheduler (ключ ``api:<адрес клиента>``), так что API не вытесняет чаты.
+Без токена (переменная ``bot.http_api.token_env`` пуста) маршруты не регистрируются.
+Запрос — разовая сессия без истории: история подкладывается в предзагрузку пустой,
+в Postgres цепочка не ходит. Метрики — в общем runtime_metrics (``api.*``).
+"""
+import asyncio
+import hmac
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable
+
+from src.tg_bot.db.history import SessionHistoryPrefetcher
+from src.tg_bot.services.fair_scheduler import FairRequestScheduler, UserQueueFullError
+from src.tg_bot.services.latency_tiers import LatencyTiers, TierVariant
+from src.util.runtime_metrics import runtime_metrics
+
+logger = logging.getLogger(__name__)
+
+_SSE_HEADERS = {
+    "Content-Type": "text/event-stream; charset=utf-8",
+    "Cache-Control": "no-cache",
+    # nginx перед ботом иначе буферизует поток целиком.
+    "X-Accel-Buffering": "no",
+}
+
+
+class ApiRequestError(Exception):
+  """Некорректный запрос клиента; ``status`` — HTTP-код ответа."""
+
+  def __init__(self, message: str, status: int = 400) -> None:
+    super().__init__(message)
+    self.status = status
+
+
+def _dumps(payload: Any) -> str:
+  return json.dumps(payload, ensure_ascii=False)
+
+
+def _error(message: str, status: int) -> web.Response:
+  return web.json_response({"error": message}, status=status, dumps=_dumps)
+
+
+def document_payload(doc: Document, rank: int, *, with_text: bool) -> Dict[str, Any]:
+  """Документ для ответа API: источник, заголовок, chunk_id, оценка реранкера (или null)."""
+  md = doc.metadata or {}
+  payload: Dict[str, Any] = {
+      "rank": rank,
+      "source": md.get("source"),
+      "heading": md.get("heading") or md.get("H2"),
+      "chunk_id": md.get("chunk_id"),
+      "score": md.get("relevance_score"),
+  }
+  if with_text:
+    payload["text"] = doc.page_content
+  return payload
+
+
+class RagHttpApi:
+  """Хендлеры /api/*; ``register`` добавляет маршруты в aiohttp-приложение сервера."""
+
+  def __init__(
+      self,
+      *,
+      latency_tiers: LatencyTiers,
+      history_prefetcher: SessionHistoryPrefetcher,
+      request_scheduler: FairRequestScheduler,
+      token: str,
+      max_question_chars: int = 2000,
+      batch_max_questions: int = 50,
+      batch_concurrency: int = 4,
+  ) -> None:
+    self._tiers = latency_tiers
+    self._prefetcher = history_prefetcher
+    self._scheduler = request_scheduler
+    if not token:
+      raise ValueError("HTTP API без токена не поднимается")
+    self._token = token
+    self._max_question_chars = max(1, int(max_question_chars))
+    self._batch_max_questions = max(1, int(batch_max_questions))
+    self._batch_concurrency = max(1, int(batch_concurrency))
+
+  def register(self, app: web.Application, prefix: str = "/api") -> None:
+    app.router.add_post(f"{prefix}/answer", self.answer_handler)
+    app.router.add_post(f"{prefix}/retrieve", self.retrieve_handler)
+    app.router.add_post(f"{prefix}/batch", self.batch_handler)
+
+  # --- Хендлеры ---
+
+  async def answer_handler(self, request: web.Request) -> web.StreamResponse:
+    """POST /api/answer {"question", "tier"?, "stream"?: true}."""
+    runtime_metrics.incr("api.answer.requests")
+    try:
+      body = await self._read_body(request)
+      question = self._question(body.get("question"))
+      chain = self._variant(body.get("tier")).rag_chain
+    except ApiRequestError as exc:
+      return _error(str(exc), exc.status)
+    client = self._client_key(request)
+    if not body.get("stream", True):
+      return await self._answer_json(chain, question, client)
+    return await self._answer_sse(request, chain, question, client)
+
+  async def retrieve_handler(self, request: web.Request) -> web.Response:
+    """POST /api/retrieve {"question", "tier"?, "k"?} — документы финального ретривера тира."""
+    runtime_metrics.incr("api.retrieve.requests")
+    try:
+      body = await self._read_body(request)
+      question = self._question(body.get("question"))
+      retriever = self._variant(body.get("tier")).retriever
+      k = self._positive_int(body.get("k"), "k")
+    except ApiRequestError as exc:
+      return _error(str(exc), exc.status)
+    t0 = time.perf_counter()
+    try:
+      documents = await self._retrieve(retriever, question, k, self._client_key(request))
+    except UserQueueFullError:
+      runtime_metrics.incr("api.rejected_busy")
+      return _error("слишком много незавершённых запросов клиента", 429)
+    elapsed = time.perf_counter() - t0
+    runtime_metrics.observe("api.retrieve.seconds", elapsed)
+    return web.json_response(
+        {"documents": documents, "seconds": round(elapsed, 3)}, dumps=_dumps,
+    )
+
+  async def batch_handler(self, request: web.Request) -> web.Response:
+    """POST /api/batch {"questions": [...], "mode"?: "answer"|"retrieve", "tier"?, "k"?, "concurrency"?}."""
+    runtime_metrics.incr("api.batch.requests")
+    try:
+      body = await self._read_body(request)
+      questions = body.get("questions")
+      if not isinstance(questions, list) or not questions:
+        raise ApiRequestError("questions: нужен непустой список строк")
+      if len(questions) > self._batch_max_questions:
+        raise ApiRequestError(
+            f"questions: не больше {self._batch_max_questions} вопросов за запрос", 413,
+        )
+      questions = [self._question(q) for q in questions]
+      mode = str(body.get("mode", "answer"))
+      if mode not in ("answer", "retrieve"):
+        raise ApiRequestError("mode: answer или retrieve")
+      variant = self._variant(body.get("tier"))
+      chain = variant.rag_chain if mode == "answer" else None
+      k = self._positive_int(body.get("k"), "k")
+      concurrency = self._positive_int(body.get("concurrency"), "concurrency")
+    except ApiRequestError as exc:
+      return _error(str(exc), exc.status)
+
+    limit = min(concurrency or self._batch_concurrency, self._batch_concurrency)
+    if self._scheduler.enabled:
+      # Больше — и часть вопросов упрётся в лимит очереди клиента в планировщике.
+      limit = min(limit, self._scheduler.max_pending_per_user)
+    semaphore = asyncio.Semaphore(limit)
+    client = self._client_key(request)
+
+    async def _one(question: str) -> Dict[str, Any]:
+      async with semaphore:
+        t0 = time.perf_counter()
+        item: Dict[str, Any] = {"question": question}
+        try:
+          if chain is None:
+            item["documents"] = await self._retrieve(variant.retriever, question, k, client)
+          else:
+            item.update(await self._run_answer(chain, question, client))
+        except Exception as exc:
+          runtime_metrics.incr("api.errors")
+          logger.warning("HTTP API batch: ошибка на вопросе: %s", exc, exc_info=True)
+          item["error"] = str(exc) or type(exc).__name__
+        item["seconds"] = round(time.perf_counter() - t0, 3)
+        return item
+
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(_one(q) for q in questions))
+    elapsed = time.perf_counter() - t0
+    runtime_metrics.incr("api.batch.questions", len(questions))
+    runtime_metrics.observe("api.batch.seconds", elapsed)
+    logger.info(
+        "HTTP API batch: %s вопросов mode=%s параллельно=%s за %.2fs",
+        len(questions), mode, limit, elapsed,
+    )
+    return web.json_response(
+        {"results": results, "seconds": round(elapsed, 3)}, dumps=_dumps,
+    )
+
+  # --- Прогоны ---
+
+  async def _retrieve(
+      self, retriever: BaseRetriever, question: str, k: Optional[int], client: str,
+  ) -> List[Dict[str, Any]]:
+    # Поиск с реранкером грузит CPU не меньше генерации — под тем же планировщиком.
+    async with self._scheduler.acquire(client):
+      docs = await retriever.ainvoke(question)
+    if k is not None:
+      docs = docs[:k]
+    return [document_payload(doc, i, with_text=True) for i, doc in enumerate(docs, 1)]
+
+  def _chain_config(self) -> Dict[str, Any]:
+    session_id = f"api-{uuid.uuid4()}"
+    self._prefetcher.preload(session_id, [])
+    return {"configurable": {"session_id": session_id}}
+
+  async def _run_answer(self, chain: Runnable, question: str, client: str) -> Dict[str, Any]:
+    async with self._scheduler.acquire(client):
+      response = await chain.ainvoke({"input": question}, config=self._chain_config())
+    context = response.get("context") or []
+    return {
+        "answer": response.get("answer", ""),
+        "sources": [document_payload(doc, i, with_text=False) for i, doc in enumerate(context, 1)],
+    }
+
+  async def _answer_json(self, chain: Runnable, question: str, client: str) -> web.Response:
+    t0 = time.perf_counter()
+    try:
+      result = await self._run_answer(chain, question, client)
+    except UserQueueFullError:
+      runtime_metrics.incr("api.rejected_busy")
+      return _error("слишком много незавершённых запросов клиента", 429)
+    elapsed = time.perf_counter() - t0
+    runtime_metrics.observe("api.answer.seconds", elapsed)
+    return web.json_response({**result, "seconds": round(elapsed, 3)}, dumps=_dumps)
+
+  async def _answer_sse(
+      self, request: web.Request, chain: Runnable, question: str, client: str,
+  ) -> web.StreamResponse:
+    try:
+      ticket = self._scheduler.acquire(client)
+    except UserQueueFullError:
+      runtime_metrics.incr("api.rejected_busy")
+      return _error("слишком много незавершённых запросов клиента", 429)
+    response = web.StreamResponse(headers=_SSE_HEADERS)
+
+    async def _send(event: str, payload: Any) -> None:
+      await response.write(f"event: {event}\ndata: {_dumps(payload)}\n\n".encode("utf-8"))
+
+    t0 = time.perf_counter()
+    parts: List[str] = []
+    # Слот планировщика держится и на время ожидания в очереди: заголовки уходят, когда он выдан.
+    async with ticket:
+      try:
+        await response.prepare(request)
+        stream = chain.astream({"input": question}, config=self._chain_config())
+        try:
+          async for chunk in stream:
+            if not isinstance(chunk, dict):
+              continue
+            if chunk.get("context") is not None:
+              await _send("sources", [
+                  document_payload(doc, i, with_text=False)
+                  for i, doc in enumerate(chunk["context"], 1)
+              ])
+            token = chunk.get("answer")
+            if token:
+              if not parts:
+                runtime_metrics.observe(
+                    "api.answer.first_token_seconds", time.perf_counter() - t0,
+                )
+              parts.append(token)
+              await _send("token", {"text": token})
+        finally:
+          await stream.aclose()
+      except ConnectionResetError:
+        runtime_metrics.incr("api.answer.client_gone")
+        logger.info("HTTP API: клиент закрыл SSE-поток, генерация остановлена")
+        return response
+      except Exception as exc:
+        runtime_metrics.incr("api.errors")
+        logger.warning("HTTP API /answer: ошибка цепочки: %s", exc, exc_info=True)
+        if not response.prepared:
+          return _error(str(exc) or type(exc).__name__, 500)
+        await _send("error", {"error": str(exc) or type(exc).__name__})
+        await response.write_eof()
+        return response
+    elapsed = time.perf_counter() - t0
+    runtime_metrics.observe("api.answer.seconds", elapsed)
+    await _send("done", {"answer": "".join(parts), "seconds": round(elapsed, 3)})
+    await response.write_eof()
+    return response
+
+  # --- Разбор запроса ---
+
+  async def _read_body(self, request: web.Request) -> Dict[str, Any]:
+    header = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(header.encode(), f"Bearer {self._token}".encode()):
+      runtime_metrics.incr("api.rejected_auth")
+      raise ApiRequestError("нужен заголовок Authorization: Bearer <токен>", 401)
+    try:
+      body = await request.json()
+    except ValueError:
+      raise ApiRequestError("тело запроса — JSON-объект") from None
+    if not isinstance(body, dict):
+      raise ApiRequestError("тело запроса — JSON-объект")
+    return body
+
+  def _question(self, value: Any) -> str:
+    question = value.strip() if isinstance(value, str) else ""
+    if not question:
+      raise ApiRequestError("question: нужна непустая строка")
+    if len(question) > self._max_question_chars:
+      raise ApiRequestError(f"question: длиннее {self._max_question_chars} символов", 413)
+    return question
+
+  def _variant(self, tier: Any) -> TierVariant:
+    if tier is not None and tier not in self._tiers.names:
+      raise ApiRequestError(f"tier: один из {', '.join(self._tiers.names)}")
+    return self._tiers.variant(tier)
+
+  @staticmethod
+  def _positive_int(value: Any, name: str) -> Optional[int]:
+    if value is None:
+      return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+      raise ApiRequestError(f"{name}: целое число ≥ 1")
+    return value
+
+  @staticmethod
+  def _client_key(request: web.Request) -> str:
+    return f"api:{request.remote or 'unknown'}"
+
+
+def http_api_config(config: Any) -> Dict[str, Any]:
+  cfg_dict = config if isinstance(config, dict) else {}
+  bot_cfg = cfg_dict.get("bot") or {}
+  block = bot_cfg.get("http_api") if isinstance(bot_cfg, dict) else None
+  return block if isinstance(block, dict) else {}
+
+
+def create_http_api(
+    config: Any,
+    *,
+    latency_tiers: LatencyTiers,
+    history_prefetcher: SessionHistoryPrefetcher,
+    request_scheduler: FairRequestScheduler,
+) -> Optional[RagHttpApi]:
+  """API по секции bot.http_api; выключен или нет токена — None (маршруты /api/* не регистрируются)."""
+  block = http_api_config(config)
+  if not block.get("enabled", False):
+    return None
+  token_env = str(block.get("token_env", "HTTP_API_TOKEN"))
+  token = os.getenv(token_env)
+  if not token:
+    # Без авторизации /api/batch гонял бы LLM по чужим спискам на публичном порту вебхука.
+    logger.error("HTTP API: %s не задан — /api/* не поднимаются", token_env)
+    return None
+  return RagHttpApi(
+      latency_tiers=latency_tiers,
+      history_prefetcher=history_prefetcher,
+      request_scheduler=request_scheduler,
+      token=token,
+      max_question_chars=int(block.get("max_question_chars", 2000)),
+      batch_max_questions=int(block.get("batch_max_questions", 50)),
+      batch_concurrency=int(block.get("batch_concurrency", 4)),
+  )
@@ -0,0 +1,160 @@
+"""Webhook-хендлер с мгновенным 200, ограниченной очередью и дедупликацией update_id.
+
+Telegram повторно доставляет апдейт, если не дождался ответа на webhook-запрос;
+без дедупа это второй полный прогон RAG на то же сообщение. Здесь апдейт
+кладётся в asyncio.Queue (maxsize), его разбирают N воркеров через
+``dispatcher.feed_raw_update``; update_id помнится ``dedup_ttl_seconds``.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+
+from src.util.lru_ttl_cache import LruTtlCache
+from src.util.runtime_metrics import runtime_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueuedRequestHandler(SimpleRequestHandler):
+  """SimpleRequestHandler: ответ Telegram сразу, обработка — пулом воркеров из очереди.
+
+  Переполнение очереди → 503 (Telegram повторит доставку позже), дубликат update_id → 200
+  без обработки. Счётчики: ``webhook.dropped_duplicate``, ``webhook.dropped_overflow``,
+  gauge ``webhook.queue_depth``.
+  """
+
+  def __init__(
+      self,
+      dispatcher: Dispatcher,
+      bot: Bot,
+      *,
+      queue_size: int = 1000,
+      workers: int = 8,
+      dedup_ttl_seconds: float = 3600,
+      dedup_max_entries: int = 100_000,
+      drain_timeout_seconds: float = 30,
+      **data: Any,
+  ) -> None:
+    super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, **data)
+    self._queue: "asyncio.Queue[Tuple[Bot, Dict[str, Any]]]" = asyncio.Queue(
+        maxsize=max(1, int(queue_size))
+    )
+    self._workers_count = max(1, int(workers))
+    self._workers: List[asyncio.Task] = []
+    self._seen_updates: LruTtlCache[int, bool] = LruTtlCache(
+        maxsize=dedup_max_entries, ttl_seconds=dedup_ttl_seconds,
+    )
+    self._drain_timeout = float(drain_timeout_seconds)
+
+  def register(self, app: web.Application, /, path: str, **kwargs: Any) -> None:
+    app.on_startup.append(self._start_workers)
+    super().register(app, path=path, **kwargs)
+
+  async def _start_workers(self, app: web.Application) -> None:
+    _ = app
+    self._workers = [
+        asyncio.create_task(self._worker(i), name=f"webhook-worker-{i}")
+        for i in range(self._workers_count)
+    ]
+    logger.info(
+        "Webhook queue: воркеров=%s, maxsize=%s",
+        self._workers_count,
+        self._queue.maxsize,
+    )
+
+  async def _worker(self, idx: int) -> None:
+    while True:
+      bot, update = await self._queue.get()
+      runtime_metrics.set_gauge("webhook.queue_depth", self._queue.qsize())
+      try:
+        result = await self.dispatcher.feed_raw_update(bot=bot, update=update, **self.data)
+        if isinstance(result, TelegramMethod):
+          await self.dispatcher.silent_call_request(bot=bot, result=result)
+        runtime_metrics.incr("webhook.processed")
+      except Exception:
+        runtime_metrics.incr("webhook.failed")
+        logger.exception(
+            "Webhook worker=%s: ошибка обработки update_id=%s",
+            idx,
+            update.get("update_id"),
+        )
+      finally:
+        self._queue.task_done()
+
+  async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+    update = await request.json(loads=bot.session.json_loads)
+    update_id: Optional[int] = update.get("update_id") if isinstance(update, dict) else None
+    runtime_metrics.incr("webhook.received")
+
+    if update_id is not None and update_id in self._seen_updates:
+      runtime_metrics.incr("webhook.dropped_duplicate")
+      logger.info("Webhook: повторная доставка update_id=%s — пропуск", update_id)
+      return web.json_response({}, dumps=bot.session.json_dumps)
+
+    try:
+      self._queue.put_nowait((bot, update))
+    except asyncio.QueueFull:
+      runtime_metrics.incr("webhook.dropped_overflow")
+      logger.warning(
+          "Webhook: очередь заполнена (%s), update_id=%s отклонён — Telegram повторит",
+          self._queue.maxsize,
+          update_id,
+      )
+      return web.Response(status=503, text="queue is full")
+
+    if update_id is not None:
+      self._seen_updates.set(update_id, True)
+    runtime_metrics.set_gauge("webhook.queue_depth", self._queue.qsize())
+    return web.json_response({}, dumps=bot.session.json_dumps)
+
+  async def close(self) -> None:
+    """Дожидается разбора очереди (не дольше drain_timeout), гасит воркеров, закрывает сессию."""
+    if self._workers:
+      try:
+        await asyncio.wait_for(self._queue.join(), timeout=self._drain_timeout)
+      except asyncio.TimeoutError:
+        logger.warning(
+            "Webhook queue: за %.0fs не разобрано %s апдейтов — остановка",
+            self._drain_timeout,
+            self._queue.qsize(),
+        )
+      for task in self._workers:
+        task.cancel()
+      await asyncio.gather(*self._workers, return_exceptions=True)
+      self._workers = []
+    await super().close()
+
+
+def create_webhook_request_handler(
+    dispatcher: Dispatcher, bot: Bot, config: Any,
+) -> SimpleRequestHandler:
+  """Хендлер по bot.webhook.mode: inline | background | queue (по умолчанию background)."""
+  cfg_dict = config if isinstance(config, dict) else {}
+  bot_cfg = cfg_dict.get("bot") or {}
+  block = bot_cfg.get("webhook") if isinstance(bot_cfg, dict) else None
+  if not isinstance(block, dict):
+    block = {}
+  mode = str(block.get("mode", "background")).lower().strip()
+  logger.info("Webhook: режим обработки %s", mode)
+  if mode == "inline":
+    return SimpleRequestHandler(dispatcher=dispatcher, bot=bot, handle_in_background=False)
+  if mode == "background":
+    return SimpleRequestHandler(dispatcher=dispatcher, bot=bot, handle_in_background=True)
+  if mode == "queue":
+    return QueuedRequestHandler(
+        dispatcher=dispatcher,
+        bot=bot,
+        queue_size=int(block.get("queue_size", 1000)),
+        workers=int(block.get("workers", 8)),
+        dedup_ttl_seconds=float(block.get("dedup_ttl_seconds", 3600)),
+        dedup_max_entries=int(block.get("dedup_max_entries", 100_000)),
+        drain_timeout_seconds=float(block.get("drain_timeout_seconds", 30)),
+    )
+  raise ValueError(
+      f"bot.webhook.mode must be 'inline', 'background' or 'queue', got: {mode!r}"
+  )
@@ -0,0 +1,80 @@
+"""Опциональный быстрый рантайм сервера: uvloop и orjson с откатом на stdlib.
+
+Оба пакета уже приезжают транзитивно (uvicorn[standard] у chromadb, orjson у langsmith),
+но не обязательны: без них остаются стандартный asyncio-цикл и ``json``. Сам aiogram
+при импорте ставит политику uvloop, если пакет есть, — поэтому без флага политика
+явно возвращается к стандартной, а итоговый цикл определяется по действующей. orjson
+подключается через AiohttpSession бота — его же json_loads/json_dumps использует
+SimpleRequestHandler при разборе апдейта вебхука и ответе Telegram.
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from aiogram.client.session.aiohttp import AiohttpSession
+
+logger = logging.getLogger(__name__)
+
+JsonLoads = Callable[[Any], Any]
+JsonDumps = Callable[[Any], str]
+
+
+def fast_runtime_enabled(config: Any) -> bool:
+  cfg_dict = config if isinstance(config, dict) else {}
+  bot_cfg = cfg_dict.get("bot") or {}
+  block = bot_cfg.get("server") if isinstance(bot_cfg, dict) else None
+  return isinstance(block, dict) and bool(block.get("fast_runtime", False))
+
+
+def install_uvloop() -> bool:
+  """Ставит политику uvloop для следующих event loop процесса; False — пакета нет."""
+  try:
+    import uvloop
+  except ImportError:
+    logger.warning("uvloop не установлен — остаётся стандартный asyncio-цикл")
+    return False
+  asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+  return True
+
+
+def current_loop_name() -> str:
+  policy = asyncio.get_event_loop_policy()
+  return "uvloop" if type(policy).__module__.startswith("uvloop") else "asyncio"
+
+
+def _orjson_dumps(obj: Any) -> str:
+  import orjson
+
+  return orjson.dumps(obj).decode()
+
+
+def json_codecs(fast: bool) -> Tuple[JsonLoads, JsonDumps, str]:
+  """(loads, dumps, имя): orjson при fast и установленном пакете, иначе stdlib json."""
+  if fast:
+    try:
+      import orjson
+    except ImportError:
+      logger.warning("orjson не установлен — JSON апдейтов разбирает stdlib json")
+    else:
+      return orjson.loads, _orjson_dumps, "orjson"
+  return json.loads, json.dumps, "json"
+
+
+def create_bot_session(fast: bool) -> Optional[AiohttpSession]:
+  """Сессия бота с быстрым JSON; None — Bot создаст сессию по умолчанию."""
+  loads, dumps, name = json_codecs(fast)
+  if name == "json":
+    return None
+  return AiohttpSession(json_loads=loads, json_dumps=dumps)
+
+
+def apply_server_runtime(config: Any) -> Dict[str, str]:
+  """Ставит uvloop, если включён bot.server.fast_runtime, иначе stdlib-цикл; вызывать до создания цикла."""
+  fast = fast_runtime_enabled(config)
+  if not (fast and install_uvloop()):
+    # aiogram при импорте мог уже поставить uvloop — выключенный флаг значит stdlib asyncio.
+    asyncio.set_event_loop_policy(asyncio.DefaultEventLoopPolicy())
+  runtime = {"loop": current_loop_name(), "json": json_codecs(fast)[2]}
+  logger.info("Рантайм сервера: цикл %s, JSON %s", runtime["loop"], runtime["json"])
+  return runtime
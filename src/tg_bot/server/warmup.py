@@ -0,0 +1,279 @@
+"""Прогрев перед установкой вебхука и отчёт для /healthz и /readyz.
+
+На свежем контейнере первый вопрос платил за всё сразу: ленивую инициализацию
+эмбеддингов и реранкера, первый поиск в индексе и загрузку llama3.1 в память Ollama
+(до минуты). Здесь синтетический вопрос проходит роутинг и финальный ретривер
+(эмбеддинг, поиск, реранк), а каждая LLM из конфига бота делает короткую генерацию
+с теми же параметрами (num_ctx), что и в цепочках, — иначе Ollama перезагрузит модель
+на первом настоящем запросе. Тиры латентности со своими overrides (bot.latency_tiers)
+греются так же: их роутинг, ретривер (с HyDE у thorough) и LLM, которых нет у основной
+цепочки. server-startup ставит вебхук, только когда прогрев закончен.
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.retrievers import BaseRetriever
+
+from src.pipelines.rag.pipeline import get_llm_from_config
+from src.pipelines.routing.router import SemanticRoutingPort, routing_llm_configs
+from src.tg_bot.services.latency_tiers import LatencyTiers
+from src.util.runtime_metrics import runtime_metrics
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_QUERY = "Какие специальности есть на факультете?"
+_GENERATION_PROMPT = "Ответь одним словом: готов?"
+
+
+@dataclass
+class ComponentState:
+  status: str = "pending"  # pending | ready | failed | skipped
+  seconds: Optional[float] = None
+  detail: Optional[str] = None
+
+  def as_dict(self) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"status": self.status}
+    if self.seconds is not None:
+      out["seconds"] = round(self.seconds, 3)
+    if self.detail:
+      out["detail"] = self.detail
+    return out
+
+
+def _llm_candidates(cfg_dict: dict) -> List[Tuple[str, Any]]:
+  candidates: List[Tuple[str, Any]] = [
+      ("generation", (cfg_dict.get("providers") or {}).get(os.getenv("LLM_PROVIDER", "ollama"))),
+  ]
+  hyde = cfg_dict.get("hyde") or {}
+  if hyde.get("enabled", False):
+    candidates.append(("hyde", hyde.get("llm")))
+  memory = cfg_dict.get("memory") or {}
+  if memory.get("enabled", False):
+    candidates.append(("summary", memory.get("summary_llm")))
+  candidates.extend(routing_llm_configs(cfg_dict).items())
+  return candidates
+
+
+def bot_llm_configs(
+    config: Any, tier_configs: Optional[Dict[str, Any]] = None,
+) -> Dict[str, dict]:
+  """LLM, которые бот вызывает при ответе: имя компонента → блок провайдера.
+
+  Одинаковые модели (тип, имя, num_ctx) склеиваются в один компонент
+  ``llm:generation+summary`` — Ollama держит их как одну загруженную модель.
+  ``tier_configs`` — конфиги тиров латентности: их LLM добавляются как ``hyde@thorough``,
+  только если такой модели нет у основной цепочки.
+  """
+  cfg_dict = config if isinstance(config, dict) else {}
+  candidates = _llm_candidates(cfg_dict)
+  for tier, tier_cfg in (tier_configs or {}).items():
+    if isinstance(tier_cfg, dict):
+      candidates.extend((f"{label}@{tier}", block) for label, block in _llm_candidates(tier_cfg))
+
+  grouped: Dict[Tuple[Any, Any, Any], Tuple[List[str], dict]] = {}
+  for label, block in candidates:
+    if not isinstance(block, dict):
+      continue
+    key = (block.get("type"), block.get("model"), block.get("num_ctx"))
+    if key not in grouped:
+      grouped[key] = ([label], dict(block))
+    elif "@" not in label:
+      grouped[key][0].append(label)
+  return {"llm:" + "+".join(labels): block for labels, block in grouped.values()}
+
+
+def _short_generation_llm(provider_cfg: dict, max_tokens: int):
+  """LLM из того же блока конфига, но с ограничением длины ответа."""
+  llm = get_llm_from_config(provider_cfg)
+  for field in ("num_predict", "max_tokens"):
+    if field in type(llm).model_fields:
+      return llm.model_copy(update={field: max_tokens})
+  return llm
+
+
+class StartupWarmup:
+  """Состояние прогрева процесса: компоненты, их статус и время загрузки.
+
+  ``record`` отмечает то, что уже загрузилось при сборке контейнера (модели
+  ретривера); ``run`` прогоняет синтетический запрос. ``ready`` — прогрев закончен
+  и ни один компонент не упал.
+  """
+
+  def __init__(
+      self,
+      enabled: bool,
+      *,
+      routing: Optional[SemanticRoutingPort] = None,
+      retriever: Optional[BaseRetriever] = None,
+      llm_configs: Optional[Dict[str, dict]] = None,
+      tier_routing: Optional[Dict[str, SemanticRoutingPort]] = None,
+      tier_retrievers: Optional[Dict[str, BaseRetriever]] = None,
+      query: str = _DEFAULT_QUERY,
+      timeout_seconds: float = 300,
+      generation_tokens: int = 4,
+  ) -> None:
+    self._enabled = enabled
+    self._routing = routing
+    self._retriever = retriever
+    self._llm_configs = dict(llm_configs or {})
+    self._tier_routing = dict(tier_routing or {})
+    self._tier_retrievers = dict(tier_retrievers or {})
+    self._query = query
+    self._timeout = float(timeout_seconds)
+    self._generation_tokens = max(1, int(generation_tokens))
+    self._components: Dict[str, ComponentState] = {}
+    self._finished = False
+    self._started_at: Optional[float] = None
+    self._total_seconds: Optional[float] = None
+
+  @property
+  def finished(self) -> bool:
+    return self._finished
+
+  @property
+  def ready(self) -> bool:
+    return self._finished and all(c.status != "failed" for c in self._components.values())
+
+  def record(self, name: str, seconds: float, *, detail: Optional[str] = None) -> None:
+    """Отмечает компонент, загруженный вне run (например, при сборке контейнера)."""
+    self._components[name] = ComponentState("ready", seconds, detail)
+    runtime_metrics.set_gauge(f"warmup.{name}_seconds", seconds)
+
+  def report(self) -> Dict[str, Any]:
+    total = self._total_seconds
+    if total is None and self._started_at is not None:
+      total = time.perf_counter() - self._started_at
+    return {
+        "ready": self.ready,
+        "finished": self._finished,
+        "seconds": round(total, 3) if total is not None else None,
+        "components": {name: c.as_dict() for name, c in self._components.items()},
+    }
+
+  async def run(self) -> bool:
+    """Прогревает роутинг, ретривер и LLM; повторный вызов ничего не делает."""
+    if self._finished or self._started_at is not None:
+      return self.ready
+    self._started_at = time.perf_counter()
+    if not self._enabled:
+      logger.info("Прогрев выключен (bot.warmup.enabled=false)")
+    else:
+      steps = []
+      if self._routing is not None:
+        steps.append(("routing", self._routing_step(self._routing), None))
+      if self._retriever is not None:
+        steps.append(("retrieval", self._retrieval_step(self._retriever), None))
+      for tier, routing in self._tier_routing.items():
+        steps.append((f"routing:{tier}", self._routing_step(routing), None))
+      for tier, retriever in self._tier_retrievers.items():
+        steps.append((f"retrieval:{tier}", self._retrieval_step(retriever), None))
+      for name, block in self._llm_configs.items():
+        steps.append((name, self._llm_step(block), block.get("model")))
+      for name, _, detail in steps:
+        self._components[name] = ComponentState(detail=detail)
+      logger.info("Прогрев: %s", ", ".join(name for name, _, _ in steps) or "—")
+      # Ретривер (CPU/GPU процесса) и LLM (Ollama) греются параллельно;
+      # LLM — по очереди, Ollama всё равно грузит модели одну за другой.
+      local = [s for s in steps if not s[0].startswith("llm:")]
+      remote = [s for s in steps if s[0].startswith("llm:")]
+      await asyncio.gather(
+          *(self._step(name, factory) for name, factory, _ in local),
+          self._sequential(remote),
+      )
+    self._total_seconds = time.perf_counter() - self._started_at
+    self._finished = True
+    runtime_metrics.set_gauge("warmup.seconds", self._total_seconds)
+    runtime_metrics.set_gauge("warmup.ready", 1 if self.ready else 0)
+    log = logger.info if self.ready else logger.error
+    log(
+        "Прогрев завершён за %.1fs, ready=%s: %s",
+        self._total_seconds, self.ready, self.report()["components"],
+    )
+    return self.ready
+
+  async def _sequential(self, steps) -> None:
+    for name, factory, _ in steps:
+      await self._step(name, factory)
+
+  async def _step(self, name: str, factory: Callable[[], Awaitable[Any]]) -> None:
+    state = self._components.setdefault(name, ComponentState())
+    t0 = time.perf_counter()
+    try:
+      await asyncio.wait_for(factory(), timeout=self._timeout)
+    except asyncio.TimeoutError:
+      state.status = "failed"
+      state.detail = f"таймаут {self._timeout:g}s"
+    except Exception as exc:
+      state.status = "failed"
+      state.detail = f"{type(exc).__name__}: {exc}"
+    else:
+      state.status = "ready"
+    state.seconds = time.perf_counter() - t0
+    runtime_metrics.set_gauge(f"warmup.{name}_seconds", state.seconds)
+    if state.status == "failed":
+      logger.warning("Прогрев %s не удался за %.1fs: %s", name, state.seconds, state.detail)
+    else:
+      logger.info("Прогрев %s: %.1fs", name, state.seconds)
+
+  def _routing_step(self, routing: SemanticRoutingPort) -> Callable[[], Awaitable[Any]]:
+    return lambda: routing.route(self._query)
+
+  def _retrieval_step(self, retriever: BaseRetriever) -> Callable[[], Awaitable[Any]]:
+    async def _retrieve() -> None:
+      docs = await retriever.ainvoke(self._query)
+      logger.info("Прогрев retrieval: найдено документов %s", len(docs))
+    return _retrieve
+
+  def _llm_step(self, block: dict) -> Callable[[], Awaitable[Any]]:
+    async def _generate() -> None:
+      llm = _short_generation_llm(block, self._generation_tokens)
+      await llm.ainvoke(_GENERATION_PROMPT)
+    return _generate
+
+
+def warmup_config(config: Any) -> dict:
+  cfg_dict = config if isinstance(config, dict) else {}
+  bot_cfg = cfg_dict.get("bot") or {}
+  block = bot_cfg.get("warmup") if isinstance(bot_cfg, dict) else None
+  return block if isinstance(block, dict) else {}
+
+
+def create_startup_warmup(
+    config: Any,
+    *,
+    routing: Optional[SemanticRoutingPort] = None,
+    retriever: Optional[BaseRetriever] = None,
+    latency_tiers: Optional[LatencyTiers] = None,
+) -> StartupWarmup:
+  """Прогрев по bot.warmup; выключен — run сразу отмечает процесс готовым.
+
+  Тиры с собственными роутингом / ретривером (собраны из overrides) греются отдельными
+  компонентами ``routing:<тир>`` / ``retrieval:<тир>``; тиры без overrides делят основные.
+  """
+  block = warmup_config(config)
+  tier_routing: Dict[str, SemanticRoutingPort] = {}
+  tier_retrievers: Dict[str, BaseRetriever] = {}
+  tier_configs: Dict[str, Any] = {}
+  for variant in (latency_tiers.variants if latency_tiers is not None else []):
+    if variant.routing is not routing:
+      tier_routing[variant.name] = variant.routing
+    if variant.retriever is not retriever:
+      tier_retrievers[variant.name] = variant.retriever
+    if variant.config is not config:
+      tier_configs[variant.name] = variant.config
+  llm_configs = bot_llm_configs(config, tier_configs) if block.get("llm", True) else {}
+  return StartupWarmup(
+      bool(block.get("enabled", False)),
+      routing=routing,
+      retriever=retriever,
+      llm_configs=llm_configs,
+      tier_routing=tier_routing,
+      tier_retrievers=tier_retrievers,
+      query=str(block.get("query") or _DEFAULT_QUERY),
+      timeout_seconds=float(block.get("timeout_seconds", 300)),
+      generation_tokens=int(block.get("generation_tokens", 4)),
+  )
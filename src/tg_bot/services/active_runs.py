@@ -0,0 +1,114 @@
+"""Реестр прогонов цепочек по (user_id, session_id): новое сообщение отменяет устаревший прогон.
+
+Студент присылает исправленный вопрос, пока старый ещё генерируется, — старый ответ
+уже не нужен, а слот Ollama занят. Каждое сообщение берёт ``begin(key)`` (поколение
+ключа растёт, текущий прогон отменяется), цепочка запускается через ``run`` в
+отдельной задаче: отменяется она, а не воркер очереди вебхука.
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Coroutine, Dict, Hashable, Optional, TypeVar
+
+from src.util.run_cancellation import bind_run_cancel_event
+from src.util.runtime_metrics import runtime_metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class StaleRunCancelled(Exception):
+  """Прогон отменён более новым сообщением того же пользователя в той же сессии."""
+
+
+class _ActiveRun:
+  __slots__ = ("generation", "task", "cancel_event")
+
+  def __init__(self, generation: int) -> None:
+    self.generation = generation
+    self.task: Optional[asyncio.Task] = None
+    self.cancel_event: Optional[threading.Event] = None
+
+
+class ActiveRunRegistry:
+  """Один живой прогон на ключ; ``enabled=False`` — прогоны не отменяются."""
+
+  def __init__(self, enabled: bool = False) -> None:
+    self.enabled = enabled
+    self._generations: Dict[Hashable, int] = {}
+    self._runs: Dict[Hashable, _ActiveRun] = {}
+
+  def begin(self, key: Hashable) -> int:
+    """Новое сообщение по ключу: отменяет текущий прогон, возвращает номер поколения."""
+    if not self.enabled:
+      return 0
+    generation = self._generations.get(key, 0) + 1
+    self._generations[key] = generation
+    self._cancel(key, reason="новое сообщение")
+    return generation
+
+  async def run(self, key: Hashable, generation: int, coro: Coroutine[Any, Any, T]) -> T:
+    """Выполняет coro в отдельной задаче; StaleRunCancelled — если прогон устарел/отменён."""
+    if not self.enabled:
+      return await coro
+    if self._generations.get(key) != generation:
+      coro.close()
+      runtime_metrics.incr("runs.cancelled_stale")
+      raise StaleRunCancelled(f"{key}: поколение {generation} устарело до старта")
+
+    active = _ActiveRun(generation)
+
+    async def _bound() -> T:
+      # Событие живёт в контексте задачи: потоки HyDE/ретривера видят его копию.
+      active.cancel_event = bind_run_cancel_event()
+      return await coro
+
+    active.task = asyncio.create_task(_bound())
+    self._runs[key] = active
+    try:
+      await asyncio.wait({active.task})
+    except asyncio.CancelledError:
+      # Отменили сам хендлер (остановка сервера) — гасим и прогон.
+      self._cancel_run(active)
+      raise
+    finally:
+      if self._runs.get(key) is active:
+        del self._runs[key]
+      if self._generations.get(key) == generation and key not in self._runs:
+        self._generations.pop(key, None)
+
+    if active.task.cancelled():
+      coro.close()  # задачу могли отменить до первого шага — coro так и не стартовала
+      raise StaleRunCancelled(f"{key}: прогон поколения {generation} отменён")
+    return active.task.result()
+
+  def _cancel(self, key: Hashable, *, reason: str) -> None:
+    active = self._runs.pop(key, None)
+    if active is None:
+      return
+    runtime_metrics.incr("runs.cancelled_stale")
+    logger.info(
+        "Отмена устаревшего прогона key=%s поколение=%s: %s",
+        key,
+        active.generation,
+        reason,
+    )
+    self._cancel_run(active)
+
+  @staticmethod
+  def _cancel_run(active: _ActiveRun) -> None:
+    if active.cancel_event is not None:
+      active.cancel_event.set()
+    if active.task is not None and not active.task.done():
+      active.task.cancel()
+
+
+def create_active_run_registry(config) -> ActiveRunRegistry:
+  """Собирает реестр по корню config (секция bot.cancellation)."""
+  cfg_dict = config if isinstance(config, dict) else {}
+  bot_cfg = cfg_dict.get("bot") or {}
+  block = bot_cfg.get("cancellation") if isinstance(bot_cfg, dict) else None
+  if not isinstance(block, dict):
+    block = {}
+  return ActiveRunRegistry(enabled=bool(block.get("enabled", False)))
@@ -0,0 +1,238 @@
+"""Потоковая выдача ответа в Telegram: первое сообщение на первых токенах, дальше edit.
+
+Цепочки (rag_chain / chat_only_chain) отдают через ``astream`` частичные dict'ы;
+токены ответа приходят в ключе ``answer``. Промежуточные правки идут без parse_mode
+(незакрытые HTML-теги в середине генерации ломают разбор), финальная — с parse_mode
+бота по умолчанию, как и у обычного ``message.answer``. Ошибка цепочки посреди стрима
+не порождает второго сообщения: уже показанный текст заменяется запасным ответом
+или помечается как оборванный.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, List, Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import Message
+from langchain_core.runnables import Runnable
+
+from src.util.runtime_metrics import runtime_metrics
+
+logger = logging.getLogger(__name__)
+
+# Лимит Telegram на длину текста одного сообщения.
+TELEGRAM_MAX_MESSAGE_LEN = 4096
+
+_CANCELLED_NOTE = "⏹ Ответ прерван: пришёл новый вопрос."
+
+_FAILED_NOTE = "⚠️ Ответ оборвался из-за ошибки. Попробуйте спросить ещё раз."
+
+_EMPTY_ANSWER_FALLBACK = (
+    "Не удалось сформировать ответ. Попробуйте переформулировать вопрос."
+)
+
+
+def _split_for_telegram(text: str) -> List[str]:
+  """Режет текст на куски ≤ 4096 символов (по возможности — по переводу строки)."""
+  parts: List[str] = []
+  rest = text
+  while len(rest) > TELEGRAM_MAX_MESSAGE_LEN:
+    cut = rest.rfind("\n", 0, TELEGRAM_MAX_MESSAGE_LEN)
+    if cut <= 0:
+      cut = TELEGRAM_MAX_MESSAGE_LEN
+    parts.append(rest[:cut])
+    rest = rest[cut:].lstrip("\n")
+  parts.append(rest)
+  return parts
+
+
+def _is_not_modified(exc: TelegramBadRequest) -> bool:
+  return "message is not modified" in str(exc).lower()
+
+
+class TelegramAnswerStreamer:
+  """Стримит ``answer`` из LCEL-цепочки в чат с троттлингом edit_message_text.
+
+  ``enabled=False`` — хендлер работает по-старому (ainvoke → message.answer).
+  """
+
+  def __init__(
+      self,
+      enabled: bool = False,
+      *,
+      edit_interval_seconds: float = 1.5,
+      min_chars_delta: int = 40,
+      cursor: str = " ▌",
+  ) -> None:
+    self.enabled = enabled
+    self._edit_interval = max(0.3, float(edit_interval_seconds))
+    self._min_chars_delta = max(1, int(min_chars_delta))
+    self._cursor = cursor
+
+  async def stream_answer(
+      self,
+      message: Message,
+      chain: Runnable,
+      inputs: dict,
+      config: dict,
+      *,
+      label: str = "rag",
+      fallback_answer: Optional[str] = None,
+  ) -> str:
+    """Запускает ``chain.astream`` и ведёт сообщения в чате; возвращает полный ответ.
+
+    Шаги: (1) копим токены; (2) на первом непустом токене — ``message.answer``;
+    (3) не чаще edit_interval — правка последнего сообщения (или новое при > 4096);
+    (4) в конце — финальная правка с parse_mode по умолчанию.
+
+    Ошибка цепочки: ``fallback_answer`` задан — он встаёт на место показанного текста
+    (или уходит первым сообщением) и возвращается; иначе частичный текст помечается
+    и ошибка пробрасывается.
+    """
+    t0 = time.perf_counter()
+    chunks: List[str] = []
+    sent: List[Message] = []
+    shown: List[str] = []
+    last_edit_at = 0.0
+    shown_len = 0
+    first_token_at: Optional[float] = None
+
+    try:
+      async for chunk in chain.astream(inputs, config=config):
+        token = chunk.get("answer") if isinstance(chunk, dict) else None
+        if not token:
+          continue
+        chunks.append(str(token))
+        now = time.perf_counter()
+        if first_token_at is None:
+          first_token_at = now
+          runtime_metrics.observe(f"{label}.ttft_seconds", now - t0)
+          logger.info(
+              "[TIMING] stage=first_token chain=%s elapsed=%.2fs",
+              label,
+              now - t0,
+          )
+        text = "".join(chunks)
+        due = (now - last_edit_at) >= self._edit_interval
+        grown = (len(text) - shown_len) >= self._min_chars_delta
+        if sent and not (due and grown):
+          continue
+        if await self._render(
+            message, sent, shown, text.rstrip() + self._cursor, final=False,
+        ):
+          last_edit_at = time.perf_counter()
+          shown_len = len(text)
+    except asyncio.CancelledError:
+      # Прогон отменён новым сообщением: частичный текст помечаем, чтобы не выглядел ответом.
+      if sent:
+        partial = "".join(chunks).rstrip()
+        try:
+          await self._render(
+              message, sent, shown, f"{partial}\n\n{_CANCELLED_NOTE}", final=False,
+          )
+        except Exception:
+          logger.debug("Стриминг: не удалось пометить прерванный ответ", exc_info=True)
+      raise
+    except Exception as exc:
+      runtime_metrics.incr(f"{label}.stream_failed")
+      if fallback_answer is not None:
+        logger.warning("%s ошибка стрима: %s — шаблон из конфига", label, exc)
+        await self._render(message, sent, shown, fallback_answer, final=True)
+        return fallback_answer
+      if sent:
+        partial = "".join(chunks).rstrip()
+        try:
+          await self._render(message, sent, shown, f"{partial}\n\n{_FAILED_NOTE}", final=False)
+        except Exception:
+          logger.debug("Стриминг: не удалось пометить оборванный ответ", exc_info=True)
+      raise
+
+    answer = "".join(chunks).strip()
+    if not answer:
+      answer = _EMPTY_ANSWER_FALLBACK
+    await self._render(message, sent, shown, answer, final=True)
+    runtime_metrics.observe(f"{label}.stream_total_seconds", time.perf_counter() - t0)
+    logger.info(
+        "[TIMING] stage=stream_total chain=%s elapsed=%.2fs messages=%s",
+        label,
+        time.perf_counter() - t0,
+        len(sent),
+    )
+    return answer
+
+  async def _render(
+      self,
+      message: Message,
+      sent: List[Message],
+      shown: List[str],
+      text: str,
+      *,
+      final: bool,
+  ) -> bool:
+    """Приводит сообщения в чате к ``text``; False — Telegram попросил подождать."""
+    parts = _split_for_telegram(text)
+    try:
+      for idx, part in enumerate(parts):
+        if idx < len(sent):
+          if shown[idx] == part and not final:
+            continue
+          await self._edit(sent[idx], part, final=final)
+          shown[idx] = part
+        else:
+          sent.append(await self._send(message, part, final=final))
+          shown.append(part)
+      if final:
+        # Курсор мог вытолкнуть хвост в лишнее сообщение — убираем его.
+        while len(sent) > len(parts):
+          extra = sent.pop()
+          shown.pop()
+          await extra.delete()
+    except TelegramRetryAfter as exc:
+      if not final:
+        logger.info("Стриминг: flood control, пропускаем правку (retry_after=%s)", exc.retry_after)
+        runtime_metrics.incr("stream.edits_throttled")
+        return False
+      await asyncio.sleep(exc.retry_after)
+      return await self._render(message, sent, shown, text, final=final)
+    return True
+
+  @staticmethod
+  async def _send(message: Message, text: str, *, final: bool) -> Message:
+    if final:
+      try:
+        return await message.answer(text)
+      except TelegramBadRequest as exc:
+        logger.warning("Стриминг: финальный текст не прошёл parse_mode (%s), шлём plain", exc)
+    return await message.answer(text, parse_mode=None)
+
+  @staticmethod
+  async def _edit(sent_message: Message, text: str, *, final: bool) -> None:
+    runtime_metrics.incr("stream.edits")
+    if final:
+      try:
+        await sent_message.edit_text(text)
+        return
+      except TelegramBadRequest as exc:
+        if _is_not_modified(exc):
+          return
+        logger.warning("Стриминг: финальный текст не прошёл parse_mode (%s), правим plain", exc)
+    try:
+      await sent_message.edit_text(text, parse_mode=None)
+    except TelegramBadRequest as exc:
+      if not _is_not_modified(exc):
+        raise
+
+
+def create_answer_streamer(config: Any) -> TelegramAnswerStreamer:
+  """Собирает стример по корню config (секция bot.streaming)."""
+  cfg_dict = config if isinstance(config, dict) else {}
+  bot_cfg = cfg_dict.get("bot") or {}
+  block = bot_cfg.get("streaming") if isinstance(bot_cfg, dict) else None
+  if not isinstance(block, dict):
+    block = {}
+  return TelegramAnswerStreamer(
+      enabled=bool(block.get("enabled", False)),
+      edit_interval_seconds=float(block.get("edit_interval_seconds", 1.5)),
+      min_chars_delta=int(block.get("min_chars_delta", 40)),
+      cursor=str(block.get("cursor", " ▌")),
+  )
@@ -0,0 +1,383 @@
+"""Рассылка объявлений всем пользователям бота с лимитами Bot API и продолжением после сбоя.
+
+id пользователей читаются по возрастанию server-side курсором (``iter_user_ids``) в
+ограниченную очередь; N воркеров отправляют сообщения через общий token bucket
+(глобальный лимит бота). ``TelegramRetryAfter`` ставит на паузу всё ведро на
+``retry_after`` секунд, затем отправка повторяется. Прогресс — JSON-чекпоинт
+в ``checkpoint_dir``: ``cursor`` — наибольший id, до которого включительно все
+пользователи уже обработаны. После падения ``run(..., resume=True)`` продолжает с
+курсора; сообщения, отправленные после последней записи чекпоинта, уйдут повторно
+(не больше ``checkpoint_every`` штук).
+
+Рассылка одна на все процессы с общим ``checkpoint_dir`` (fork-воркеры server-startup,
+``main.py broadcast``): на время прогона держится flock на ``.broadcast.lock`` рядом
+с чекпоинтами.
+"""
+import asyncio
+import datetime
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Iterable, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramNotFound,
+    TelegramRetryAfter,
+    TelegramServerError,
+    TelegramUnauthorizedError,
+)
+
+from src.tg_bot.repositories.interfaces import IUserRepository
+from src.util.runtime_metrics import runtime_metrics
+from src.util.token_bucket import TokenBucket
+
+try:
+  import fcntl
+except ImportError:  # Windows: воркеров server-startup там нет, блокировка между процессами не нужна
+  fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_LOCK_FILE = ".broadcast.lock"
+
+
+class BroadcastAlreadyRunningError(Exception):
+  """Рассылка уже идёт в этом или другом процессе; текст — её id."""
+
+
+@dataclass
+class BroadcastStats:
+  sent: int = 0
+  blocked: int = 0
+  failed: int = 0
+  retried: int = 0
+  retry_after_waits: int = 0
+  retry_after_seconds: float = 0.0
+  elapsed_seconds: float = 0.0
+
+  @property
+  def processed(self) -> int:
+    return self.sent + self.blocked + self.failed
+
+  def summary(self) -> str:
+    rate = self.sent / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+    return (
+        f"отправлено {self.sent}, заблокировали бота {self.blocked}, ошибок {self.failed}, "
+        f"повторов {self.retried}, пауз retry_after {self.retry_after_waits} "
+        f"({self.retry_after_seconds:.0f}s); {self.elapsed_seconds:.1f}s, {rate:.1f} сообщ./с"
+    )
+
+
+@dataclass
+class BroadcastCheckpoint:
+  broadcast_id: str
+  text: str
+  cursor: Optional[int] = None
+  status: str = "running"  # running | done
+  created_at: str = ""
+  stats: BroadcastStats = field(default_factory=BroadcastStats)
+
+  def save(self, directory: str) -> None:
+    """Атомарная запись: tmp-файл и os.replace — чекпоинт не бьётся при падении."""
+    os.makedirs(directory, exist_ok=True)
+    path = checkpoint_path(directory, self.broadcast_id)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+      json.dump(asdict(self), f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+  @classmethod
+  def load(cls, directory: str, broadcast_id: str) -> "BroadcastCheckpoint":
+    with open(checkpoint_path(directory, broadcast_id), "r", encoding="utf-8") as f:
+      data = json.load(f)
+    stats = BroadcastStats(**(data.pop("stats", None) or {}))
+    return cls(stats=stats, **data)
+
+
+def checkpoint_path(directory: str, broadcast_id: str) -> str:
+  return os.path.join(directory, f"{broadcast_id}.json")
+
+
+def latest_unfinished_broadcast(directory: str) -> Optional[str]:
+  """id самой свежей рассылки со status=running или None."""
+  if not os.path.isdir(directory):
+    return None
+  candidates = []
+  for name in os.listdir(directory):
+    if not name.endswith(".json"):
+      continue
+    try:
+      cp = BroadcastCheckpoint.load(directory, name[: -len(".json")])
+    except (OSError, ValueError, TypeError):
+      logger.warning("Рассылка: не читается чекпоинт %s", name)
+      continue
+    if cp.status == "running":
+      candidates.append((cp.created_at, cp.broadcast_id))
+  return max(candidates)[1] if candidates else None
+
+
+class BroadcastService:
+  """Рассылка текста (HTML) всем пользователям; одна рассылка одновременно на все процессы."""
+
+  def __init__(
+      self,
+      user_repo: IUserRepository,
+      *,
+      checkpoint_dir: str = "data/broadcasts",
+      messages_per_second: float = 25,
+      workers: int = 8,
+      max_retries: int = 3,
+      checkpoint_every: int = 200,
+      fetch_batch_size: int = 1000,
+      admin_ids: Iterable[int] = (),
+  ) -> None:
+    self._repo = user_repo
+    self._checkpoint_dir = checkpoint_dir
+    self._rate = float(messages_per_second)
+    self._workers = max(1, int(workers))
+    self._max_retries = max(0, int(max_retries))
+    self._checkpoint_every = max(1, int(checkpoint_every))
+    self._fetch_batch_size = max(1, int(fetch_batch_size))
+    self._admin_ids = frozenset(int(uid) for uid in admin_ids)
+    self._running: Optional[str] = None
+    self._lock_fd: Optional[int] = None
+    self._background: Set[asyncio.Task] = set()
+
+  @property
+  def checkpoint_dir(self) -> str:
+    return self._checkpoint_dir
+
+  def is_admin(self, user_id: int) -> bool:
+    return user_id in self._admin_ids
+
+  def start_in_background(
+      self,
+      bot: Bot,
+      text: str,
+      on_done: Optional[Callable[[str, BroadcastStats], Awaitable[None]]] = None,
+  ) -> str:
+    """Запуск из хендлера: рассылка идёт отдельной задачей, id возвращается сразу."""
+    if self._running is not None:
+      raise BroadcastAlreadyRunningError(self._running)
+    broadcast_id = new_broadcast_id()
+    # Блокировка до create_task: админ сразу узнаёт о рассылке в другом воркере.
+    self._acquire_lock(broadcast_id)
+
+    async def _job() -> None:
+      try:
+        stats = await self.run(bot, text, broadcast_id=broadcast_id)
+      except Exception:
+        logger.exception("Рассылка %s упала; продолжить: main.py broadcast --resume %s",
+                         broadcast_id, broadcast_id)
+        return
+      finally:
+        self._release_lock()
+      if on_done is not None:
+        await on_done(broadcast_id, stats)
+
+    task = asyncio.create_task(_job(), name=f"broadcast-{broadcast_id}")
+    self._background.add(task)
+    task.add_done_callback(self._background.discard)
+    # Занимаем слот сразу, а не когда задача дойдёт до run.
+    self._running = broadcast_id
+    return broadcast_id
+
+  async def run(
+      self,
+      bot: Bot,
+      text: Optional[str] = None,
+      *,
+      broadcast_id: Optional[str] = None,
+      resume: bool = False,
+  ) -> BroadcastStats:
+    """Новая рассылка (text) или продолжение существующей (resume=True, broadcast_id).
+
+    TelegramUnauthorizedError (неверный токен) прерывает рассылку: чекпоинт сохраняется,
+    исключение уходит вызывающему.
+    """
+    if self._running is not None and self._running != broadcast_id:
+      raise BroadcastAlreadyRunningError(self._running)
+    broadcast_id = broadcast_id or new_broadcast_id()
+    if self._lock_fd is None:
+      self._acquire_lock(broadcast_id)
+    self._running = broadcast_id
+    try:
+      if resume:
+        checkpoint = BroadcastCheckpoint.load(self._checkpoint_dir, broadcast_id)
+        if checkpoint.status == "done":
+          logger.info("Рассылка %s уже завершена: %s", broadcast_id, checkpoint.stats.summary())
+          return checkpoint.stats
+        logger.info("Рассылка %s: продолжение после user_id=%s", broadcast_id, checkpoint.cursor)
+      else:
+        if not text or not text.strip():
+          raise ValueError("Пустой текст рассылки")
+        checkpoint = BroadcastCheckpoint(
+            broadcast_id=broadcast_id,
+            text=text,
+            created_at=datetime.datetime.utcnow().isoformat(timespec="seconds"),
+        )
+        checkpoint.save(self._checkpoint_dir)
+        logger.info("Рассылка %s: старт", broadcast_id)
+      await _BroadcastRun(self, bot, checkpoint).execute()
+    finally:
+      self._running = None
+      self._release_lock()
+    logger.info("Рассылка %s завершена: %s", checkpoint.broadcast_id, checkpoint.stats.summary())
+    return checkpoint.stats
+
+  def _acquire_lock(self, broadcast_id: str) -> None:
+    """flock на файл в checkpoint_dir; занят другим процессом — BroadcastAlreadyRunningError."""
+    if fcntl is None:
+      return
+    os.makedirs(self._checkpoint_dir, exist_ok=True)
+    fd = os.open(os.path.join(self._checkpoint_dir, _LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+      fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+      # Владелец блокировки записал в файл id своей рассылки.
+      running = os.read(fd, 64).decode("utf-8", "replace").strip() or "в другом процессе"
+      os.close(fd)
+      raise BroadcastAlreadyRunningError(running) from None
+    os.ftruncate(fd, 0)
+    os.write(fd, broadcast_id.encode("utf-8"))
+    self._lock_fd = fd
+
+  def _release_lock(self) -> None:
+    if self._lock_fd is None:
+      return
+    fd, self._lock_fd = self._lock_fd, None
+    os.ftruncate(fd, 0)
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+class _BroadcastRun:
+  """Состояние одного прогона: очередь id, воркеры, курсор и чекпоинты."""
+
+  def __init__(self, service: BroadcastService, bot: Bot, checkpoint: BroadcastCheckpoint) -> None:
+    self._svc = service
+    self._bot = bot
+    self._cp = checkpoint
+    self._stats = checkpoint.stats
+    self._bucket = TokenBucket(service._rate, capacity=service._rate)
+    self._dispatched: Deque[int] = deque()
+    self._done: Set[int] = set()
+    self._since_checkpoint = 0
+
+  async def execute(self) -> None:
+    queue: "asyncio.Queue[Optional[int]]" = asyncio.Queue(maxsize=self._svc._workers * 4)
+    elapsed_before = self._stats.elapsed_seconds
+    t0 = time.perf_counter()
+    tasks = [asyncio.create_task(self._produce(queue))]
+    tasks += [asyncio.create_task(self._worker(queue)) for _ in range(self._svc._workers)]
+    try:
+      # FIRST_EXCEPTION: упавший воркер не должен оставить producer висеть на полной очереди.
+      done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+      for task in done:
+        if task.exception() is not None:
+          raise task.exception()
+    except BaseException:
+      for task in tasks:
+        task.cancel()
+      await asyncio.gather(*tasks, return_exceptions=True)
+      self._stats.elapsed_seconds = elapsed_before + time.perf_counter() - t0
+      self._cp.save(self._svc._checkpoint_dir)
+      raise
+    self._stats.elapsed_seconds = elapsed_before + time.perf_counter() - t0
+    self._cp.status = "done"
+    self._cp.save(self._svc._checkpoint_dir)
+
+  async def _produce(self, queue: "asyncio.Queue[Optional[int]]") -> None:
+    async for user_id in self._svc._repo.iter_user_ids(
+        after_id=self._cp.cursor, batch_size=self._svc._fetch_batch_size,
+    ):
+      self._dispatched.append(user_id)
+      await queue.put(user_id)
+    for _ in range(self._svc._workers):
+      await queue.put(None)
+
+  async def _worker(self, queue: "asyncio.Queue[Optional[int]]") -> None:
+    while True:
+      user_id = await queue.get()
+      if user_id is None:
+        return
+      outcome = await self._deliver(user_id)
+      setattr(self._stats, outcome, getattr(self._stats, outcome) + 1)
+      runtime_metrics.incr(f"broadcast.{outcome}")
+      self._mark_done(user_id)
+
+  async def _deliver(self, user_id: int) -> str:
+    """Одна отправка с повторами; результат — имя поля BroadcastStats."""
+    for attempt in range(self._svc._max_retries + 1):
+      if attempt:
+        self._stats.retried += 1
+      await self._bucket.acquire()
+      try:
+        await self._bot.send_message(chat_id=user_id, text=self._cp.text)
+        return "sent"
+      except TelegramRetryAfter as exc:
+        self._stats.retry_after_waits += 1
+        self._stats.retry_after_seconds += exc.retry_after
+        runtime_metrics.incr("broadcast.retry_after")
+        logger.warning("Рассылка %s: retry_after=%ss", self._cp.broadcast_id, exc.retry_after)
+        self._bucket.pause(exc.retry_after)
+      except TelegramForbiddenError:
+        return "blocked"
+      except TelegramUnauthorizedError:
+        raise
+      except (TelegramBadRequest, TelegramNotFound) as exc:
+        logger.info("Рассылка %s: user_id=%s — %s", self._cp.broadcast_id, user_id, exc.message)
+        return "failed"
+      except (TelegramNetworkError, TelegramServerError) as exc:
+        logger.warning("Рассылка %s: user_id=%s, попытка %s — %s",
+                       self._cp.broadcast_id, user_id, attempt + 1, exc)
+        await asyncio.sleep(min(2 ** attempt, 30))
+      except TelegramAPIError as exc:
+        logger.warning("Рассылка %s: user_id=%s — %s", self._cp.broadcast_id, user_id, exc)
+        return "failed"
+    return "failed"
+
+  def _mark_done(self, user_id: int) -> None:
+    self._done.add(user_id)
+    # Курсор двигается только по непрерывному префиксу: id отдаются по возрастанию,
+    # а завершаются вразнобой.
+    while self._dispatched and self._dispatched[0] in self._done:
+      self._cp.cursor = self._dispatched.popleft()
+      self._done.discard(self._cp.cursor)
+    self._since_checkpoint += 1
+    if self._since_checkpoint >= self._svc._checkpoint_every:
+      self._since_checkpoint = 0
+      self._cp.save(self._svc._checkpoint_dir)
+      logger.info("Рассылка %s: обработано %s (%s)", self._cp.broadcast_id,
+                  self._stats.processed, self._stats.summary())
+
+
+def new_broadcast_id() -> str:
+  return datetime.datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+
+
+def create_broadcast_service(config: Any, user_repo: IUserRepository) -> BroadcastService:
+  cfg_dict = config if isinstance(config, dict) else {}
+  bot_cfg = cfg_dict.get("bot") or {}
+  block = bot_cfg.get("broadcast") if isinstance(bot_cfg, dict) else None
+  if not isinstance(block, dict):
+    block = {}
+  admin_ids: List[int] = [int(uid) for uid in block.get("admin_ids") or ()]
+  return BroadcastService(
+      user_repo,
+      checkpoint_dir=str(block.get("checkpoint_dir", "data/broadcasts")),
+      messages_per_second=float(block.get("messages_per_second", 25)),
+      workers=int(block.get("workers", 8)),
+      max_retries=int(block.get("max_retries", 3)),
+      checkpoint_every=int(block.get("checkpoint_every", 200)),
+      fetch_batch_size=int(block.get("fetch_batch_size", 1000)),
+      admin_ids=admin_ids,
+  )
@@ -0,0 +1,178 @@
+"""Планировщик прогонов RAG/chat-only: общий лимит параллельности и round-robin по пользователям.
+
+Один пользователь, засыпающий бота вопросами, не должен занимать все слоты Ollama:
+ожидающие запросы лежат в очереди своего user_id, а освободившийся слот отдаётся
+следующему пользователю по кругу. Незавершённых запросов на пользователя — не больше
+``max_pending_per_user``.
+"""
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional
+
+from src.util.runtime_metrics import runtime_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class UserQueueFullError(Exception):
+  """У пользователя уже max_pending_per_user незавершённых запросов."""
+
+
+class SchedulerTicket:
+  """Место в очереди; ``async with ticket`` ждёт слот и освобождает его на выходе.
+
+  ``position`` — номер в общей очереди на момент постановки (0 — слот выдан сразу).
+  """
+
+  def __init__(self, scheduler: Optional["FairRequestScheduler"], user_id: int) -> None:
+    self._scheduler = scheduler
+    self.user_id = user_id
+    self.position = 0
+    self._granted = asyncio.Event()
+    self._released = False
+
+  async def __aenter__(self) -> "SchedulerTicket":
+    if self._scheduler is None:
+      return self
+    try:
+      await self._granted.wait()
+    except asyncio.CancelledError:
+      self.abandon()
+      raise
+    return self
+
+  def abandon(self) -> None:
+    """Отказ от места до ``async with``: уйти из очереди или вернуть уже выданный слот."""
+    if self._scheduler is not None and not self._released:
+      self._scheduler._abandon(self)
+
+  async def __aexit__(self, *exc: Any) -> None:
+    if self._scheduler is not None and not self._released:
+      self._released = True
+      self._scheduler._release(self)
+
+
+class FairRequestScheduler:
+  """Глобальный лимит ``max_concurrent_runs`` + round-robin между user_id."""
+
+  def __init__(
+      self,
+      enabled: bool = False,
+      *,
+      max_concurrent_runs: int = 2,
+      max_pending_per_user: int = 3,
+      notify_queue_position: bool = True,
+  ) -> None:
+    self.enabled = enabled
+    self.notify_queue_position = notify_queue_position
+    self._max_running = max(1, int(max_concurrent_runs))
+    self._max_pending = max(1, int(max_pending_per_user))
+    self._running = 0
+    self._waiting: "OrderedDict[int, Deque[SchedulerTicket]]" = OrderedDict()
+    self._pending_per_user: Dict[int, int] = {}
+
+  @property
+  def max_pending_per_user(self) -> int:
+    return self._max_pending
+
+  def acquire(self, user_id: int) -> SchedulerTicket:
+    """Ставит запрос в очередь пользователя; при превышении лимита — UserQueueFullError."""
+    if not self.enabled:
+      return SchedulerTicket(None, user_id)
+    pending = self._pending_per_user.get(user_id, 0)
+    if pending >= self._max_pending:
+      runtime_metrics.incr("scheduler.rejected_user_limit")
+      raise UserQueueFullError(
+          f"user_id={user_id}: уже {pending} незавершённых запросов"
+      )
+    self._pending_per_user[user_id] = pending + 1
+    ticket = SchedulerTicket(self, user_id)
+    self._waiting.setdefault(user_id, deque()).append(ticket)
+    self._dispatch()
+    if not ticket._granted.is_set():
+      ticket.position = self._position_of(ticket)
+      runtime_metrics.incr("scheduler.queued")
+      logger.info(
+          "Планировщик: user_id=%s в очереди, позиция=%s (running=%s/%s)",
+          user_id,
+          ticket.position,
+          self._running,
+          self._max_running,
+      )
+    self._update_gauges()
+    return ticket
+
+  def _position_of(self, ticket: SchedulerTicket) -> int:
+    """Сколько запросов будет обслужено до ticket при круговом обходе (1-based)."""
+    own = self._waiting[ticket.user_id]
+    rounds = own.index(ticket) + 1
+    position = 0
+    passed_self = False
+    for uid, queue in self._waiting.items():
+      if uid == ticket.user_id:
+        passed_self = True
+        position += rounds
+        continue
+      # Пользователи раньше в круге успевают и в раунде ticket, позже — нет.
+      position += min(len(queue), rounds if not passed_self else rounds - 1)
+    return position
+
+  def _dispatch(self) -> None:
+    while self._running < self._max_running and self._waiting:
+      user_id, queue = next(iter(self._waiting.items()))
+      ticket = queue.popleft()
+      if queue:
+        self._waiting.move_to_end(user_id)
+      else:
+        del self._waiting[user_id]
+      self._running += 1
+      ticket._granted.set()
+
+  def _release(self, ticket: SchedulerTicket) -> None:
+    self._running -= 1
+    self._finish(ticket.user_id)
+    self._dispatch()
+    self._update_gauges()
+
+  def _abandon(self, ticket: SchedulerTicket) -> None:
+    """Задачу отменили в ожидании: убрать из очереди или вернуть уже выданный слот."""
+    ticket._released = True
+    if ticket._granted.is_set():
+      self._release(ticket)
+      return
+    queue = self._waiting.get(ticket.user_id)
+    if queue and ticket in queue:
+      queue.remove(ticket)
+      if not queue:
+        del self._waiting[ticket.user_id]
+    self._finish(ticket.user_id)
+    self._update_gauges()
+
+  def _finish(self, user_id: int) -> None:
+    left = self._pending_per_user.get(user_id, 1) - 1
+    if left > 0:
+      self._pending_per_user[user_id] = left
+    else:
+      self._pending_per_user.pop(user_id, None)
+
+  def _update_gauges(self) -> None:
+    runtime_metrics.set_gauge("scheduler.running", self._running)
+    runtime_metrics.set_gauge(
+        "scheduler.waiting", sum(len(q) for q in self._waiting.values())
+    )
+
+
+def create_request_scheduler(config: Any) -> FairRequestScheduler:
+  """Собирает планировщик по корню config (секция bot.concurrency)."""
+  cfg_dict = config if isinstance(config, dict) else {}
+  bot_cfg = cfg_dict.get("bot") or {}
+  block = bot_cfg.get("concurrency") if isinstance(bot_cfg, dict) else None
+  if not isinstance(block, dict):
+    block = {}
+  return FairRequestScheduler(
+      enabled=bool(block.get("enabled", False)),
+      max_concurrent_runs=int(block.get("max_concurrent_runs", 2)),
+      max_pending_per_user=int(block.get("max_pending_per_user", 3)),
+      notify_queue_position=bool(block.get("notify_queue_position", True)),
+  )
@@ -0,0 +1,277 @@
+"""Готовые ответы FAQ до RAG-цепочки: первый вопрос сессии, похожий на известный, — без поиска и LLM.
+
+Хранилище собирается офлайн (``python main.py faq-rebuild``, а также после ``index``):
+вопросы из qa-test-set.yaml с эталонными ответами и ссылкой на страницу блока плюс ответы
+бота из rag_bot_answers, одобренные администратором (``python main.py faq-approve``).
+Вопросы кодируются той же embedding_model, что у ретривера, в одну нормализованную
+матрицу — как запросы (embed_query): сравниваются вопрос с вопросом, и у моделей с
+префиксами query/passage обе стороны должны быть в одном пространстве. Файл
+``paths.faq_store`` (.npz) хранит матрицу, ответы и имя модели.
+
+В боте запрос — один encode и одно умножение матрицы на вектор. Если лучшая близость
+не ниже ``bot.faq.threshold`` и у сессии ещё нет истории (уточняющий вопрос без контекста
+сравнивать с FAQ нельзя), ответ уходит сразу со ссылкой на источник. Файл перечитывается
+при смене mtime — пересборка подхватывается без перезапуска.
+
+Метрики: ``faq.hit`` / ``faq.miss`` (доля попаданий), ``faq.skipped_history``,
+``faq.lookup_seconds``; размер хранилища — ``faq.entries``.
+"""
+import asyncio
+import html
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.util.runtime_metrics import runtime_metrics
+from src.util.yaml_parser import TestSetLoader
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAQ_STORE_PATH = "data/faq_store.npz"
+
+
+@dataclass(frozen=True)
+class FaqEntry:
+  question: str
+  answer: str
+  source_url: Optional[str] = None
+  # qa_test_set | approved:<id ответа в rag_bot_answers>
+  origin: str = "qa_test_set"
+
+
+@dataclass(frozen=True)
+class FaqMatch:
+  entry: FaqEntry
+  score: float
+
+
+def faq_store_path(config: dict) -> str:
+  paths = (config or {}).get("paths") or {}
+  return str(paths.get("faq_store") or DEFAULT_FAQ_STORE_PATH)
+
+
+def curated_faq_entries(qa_test_set_path: str) -> List[FaqEntry]:
+  """Одиночные вопросы qa-test-set.yaml (без сценариев: там вопросы зависят от диалога)."""
+  return [
+      FaqEntry(
+          question=str(pair["question"]).strip(),
+          answer=str(pair["answer"]).strip(),
+          source_url=pair.get("source_url"),
+      )
+      for pair in TestSetLoader(qa_test_set_path).get_qa_pairs()
+      if str(pair.get("question") or "").strip() and str(pair.get("answer") or "").strip()
+  ]
+
+
+def approved_faq_entries(answers: Sequence[Any]) -> List[FaqEntry]:
+  """Одобренные строки rag_bot_answers (Answer) → записи FAQ."""
+  return [
+      FaqEntry(
+          question=answer.question.strip(),
+          answer=answer.bot_answer.strip(),
+          source_url=answer.faq_source_url,
+          origin=f"approved:{answer.id}",
+      )
+      for answer in answers
+      if (answer.question or "").strip() and (answer.bot_answer or "").strip()
+  ]
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+  norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+  return matrix / np.maximum(norms, 1e-12)
+
+
+class FaqStore:
+  """Матрица эмбеддингов вопросов FAQ и ответы к ним."""
+
+  def __init__(self, entries: List[FaqEntry], matrix: np.ndarray, model_name: str) -> None:
+    if matrix.shape[0] != len(entries):
+      raise ValueError(f"матрица FAQ: {matrix.shape[0]} строк на {len(entries)} вопросов")
+    self.entries = entries
+    self.model_name = model_name
+    self._matrix = np.ascontiguousarray(_normalize_rows(matrix.astype(np.float32)))
+
+  def __len__(self) -> int:
+    return len(self.entries)
+
+  @classmethod
+  def build(cls, entries: Sequence[FaqEntry], embeddings: Any, model_name: str) -> "FaqStore":
+    """Дубли вопросов (без регистра) схлопываются: одобренный ответ важнее эталона из yaml."""
+    unique: Dict[str, FaqEntry] = {}
+    for entry in entries:
+      key = " ".join(entry.question.lower().split())
+      if key not in unique or entry.origin != "qa_test_set":
+        unique[key] = entry
+    ordered = list(unique.values())
+    matrix = np.asarray([embeddings.embed_query(e.question) for e in ordered], dtype=np.float32)
+    return cls(ordered, matrix.reshape(len(ordered), -1), model_name)
+
+  def best(self, vector: np.ndarray) -> Optional[FaqMatch]:
+    if not self.entries:
+      return None
+    sims = self._matrix @ vector
+    idx = int(np.argmax(sims))
+    return FaqMatch(self.entries[idx], float(sims[idx]))
+
+  def save(self, path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+    # np.savez сам дописывает .npz к имени без расширения — пишем через открытый файл.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+      np.savez(
+          f,
+          matrix=self._matrix,
+          entries=np.array(json.dumps([asdict(e) for e in self.entries], ensure_ascii=False)),
+          model_name=np.array(self.model_name),
+      )
+    os.replace(tmp_path, path)
+
+  @classmethod
+  def load(cls, path: str) -> "FaqStore":
+    with np.load(path, allow_pickle=False) as data:
+      entries = [FaqEntry(**raw) for raw in json.loads(str(data["entries"]))]
+      return cls(entries, data["matrix"], str(data["model_name"]))
+
+
+def build_faq_store(
+    config: dict, embeddings: Any, approved: Sequence[FaqEntry] = (),
+) -> Optional[str]:
+  """Собирает хранилище из qa_test_set и одобренных ответов и пишет его в paths.faq_store."""
+  paths = config.get("paths") or {}
+  entries = curated_faq_entries(str(paths.get("qa_test_set", "qa-test-set.yaml")))
+  entries.extend(approved)
+  if not entries:
+    logger.warning("FAQ: нет вопросов (qa_test_set пуст, одобренных ответов нет) — не записан")
+    return None
+  model_name = str((config.get("embedding_model") or {}).get("name", ""))
+  t0 = time.perf_counter()
+  store = FaqStore.build(entries, embeddings, model_name)
+  path = faq_store_path(config)
+  store.save(path)
+  logger.info(
+      "FAQ: %s вопросов (одобренных ответов: %s) закодировано за %.1fs → %s",
+      len(store), len(approved), time.perf_counter() - t0, path,
+  )
+  return path
+
+
+class FaqFastPath:
+  """Ответ из FAQ на первый вопрос сессии; выключено / нет файла / не похоже — None."""
+
+  def __init__(
+      self,
+      embeddings: Any,
+      store_path: str,
+      *,
+      model_name: str,
+      threshold: float = 0.92,
+      enabled: bool = True,
+      source_template: str = "Источник: {url}",
+  ) -> None:
+    self._embeddings = embeddings
+    self._path = store_path
+    self._model_name = model_name
+    self._threshold = float(threshold)
+    self.enabled = enabled and embeddings is not None
+    self._source_template = source_template
+    self._lock = threading.Lock()
+    self._store: Optional[FaqStore] = None
+    self._mtime: Optional[float] = None
+
+  def _current_store(self) -> Optional[FaqStore]:
+    try:
+      mtime = os.stat(self._path).st_mtime
+    except OSError:
+      return None
+    with self._lock:
+      if self._mtime != mtime:
+        self._mtime = mtime
+        self._store = None
+        try:
+          store = FaqStore.load(self._path)
+        except (OSError, ValueError, KeyError) as exc:
+          logger.warning("FAQ %s не прочитан: %s", self._path, exc)
+        else:
+          if store.model_name != self._model_name:
+            # Векторы другой модели несравнимы с запросом: ждём пересборки.
+            logger.warning(
+                "FAQ %s собран моделью %s, а embedding_model — %s: пересоберите (faq-rebuild)",
+                self._path, store.model_name, self._model_name,
+            )
+          else:
+            self._store = store
+            runtime_metrics.set_gauge("faq.entries", len(store))
+            logger.info("FAQ: %s вопросов из %s", len(store), self._path)
+      return self._store
+
+  def lookup(self, query: str) -> Optional[FaqMatch]:
+    """Ближайший вопрос FAQ не ниже порога (синхронно: encode держит CPU)."""
+    store = self._current_store()
+    if store is None or not len(store):
+      return None
+    vec = np.asarray(self._embeddings.embed_query(query), dtype=np.float32)
+    vec = vec / max(float(np.linalg.norm(vec)), 1e-12)
+    match = store.best(vec)
+    if match is None or match.score < self._threshold:
+      return None
+    return match
+
+  def format_answer(self, match: FaqMatch) -> str:
+    """Текст для ParseMode.HTML: ответ и ссылка экранируются (одобренный ответ бота может содержать <, &)."""
+    answer = html.escape(match.entry.answer)
+    if not match.entry.source_url:
+      return answer
+    return f"{answer}\n\n{self._source_template.format(url=html.escape(match.entry.source_url))}"
+
+  async def answer(self, query: str, *, has_history: bool) -> Optional[str]:
+    """Готовый ответ или None — тогда вопрос идёт в RAG-цепочку."""
+    if not self.enabled or not (query or "").strip():
+      return None
+    if has_history:
+      runtime_metrics.incr("faq.skipped_history")
+      return None
+    t0 = time.perf_counter()
+    match = await asyncio.to_thread(self.lookup, query)
+    elapsed = time.perf_counter() - t0
+    runtime_metrics.observe("faq.lookup_seconds", elapsed)
+    if match is None:
+      runtime_metrics.incr("faq.miss")
+      return None
+    runtime_metrics.incr("faq.hit")
+    logger.info(
+        "FAQ: ответ без RAG score=%.3f origin=%s вопрос=%r %.1fms",
+        match.score, match.entry.origin, match.entry.question, elapsed * 1000,
+    )
+    return self.format_answer(match)
+
+
+def create_faq_fast_path(config: Any) -> FaqFastPath:
+  """Собирает FAQ по корню config (bot.faq, paths.faq_store, embedding_model)."""
+  cfg_dict = config if isinstance(config, dict) else {}
+  bot_cfg = cfg_dict.get("bot") or {}
+  block = bot_cfg.get("faq") if isinstance(bot_cfg, dict) else None
+  if not isinstance(block, dict):
+    block = {}
+  emb_cfg = cfg_dict.get("embedding_model") or {}
+  enabled = bool(block.get("enabled", False))
+  embeddings = None
+  if enabled:
+    from src.util.hf_embeddings import shared_huggingface_embeddings
+
+    embeddings = shared_huggingface_embeddings(emb_cfg)
+  return FaqFastPath(
+      embeddings,
+      faq_store_path(cfg_dict),
+      model_name=str(emb_cfg.get("name", "")),
+      threshold=float(block.get("threshold", 0.92)),
+      enabled=enabled,
+  )
@@ -0,0 +1,87 @@
+"""Кеш известных пользователей и их активных сессий для пролога question_handler.
+
+Без кеша каждое сообщение делает SELECT (и иногда INSERT) пользователя и SELECT активной
+сессии ещё до роутинга. Здесь оба ответа живут в LruTtlCache процесса; /newchat
+(start_new_session) сразу записывает новую сессию. Тир латентности сессии (/fast,
+/thorough) кешируется так же — иначе он стал бы третьим SELECT на сообщение. TTL ограничивает устаревание,
+если сессию закрыли мимо этого процесса (eval).
+
+При bot.server.workers > 1 кеш не создаётся: /newchat и /fast, принятые другим воркером,
+здесь не видны, и сообщения пользователя до конца TTL уходили бы в закрытую сессию.
+"""
+import logging
+from typing import Any, Optional, Tuple
+
+from src.tg_bot.models import User
+from src.util.lru_ttl_cache import LruTtlCache
+from src.util.runtime_metrics import runtime_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class IdentityCache:
+  """user_id → User (detached, expire_on_commit=False) и user_id → id активной сессии."""
+
+  def __init__(self, *, max_entries: int = 50_000, ttl_seconds: Optional[float] = 600) -> None:
+    self._users: LruTtlCache[int, User] = LruTtlCache(
+        maxsize=max_entries, ttl_seconds=ttl_seconds,
+    )
+    self._sessions: LruTtlCache[int, str] = LruTtlCache(
+        maxsize=max_entries, ttl_seconds=ttl_seconds,
+    )
+    # session_id → тир; "" — в сессии тир не выбран (чтобы не путать с промахом).
+    self._tiers: LruTtlCache[str, str] = LruTtlCache(
+        maxsize=max_entries, ttl_seconds=ttl_seconds,
+    )
+
+  def get_user(self, user_id: int) -> Optional[User]:
+    user = self._users.get(user_id)
+    runtime_metrics.incr("identity_cache.user_hit" if user is not None else "identity_cache.user_miss")
+    return user
+
+  def put_user(self, user: User) -> None:
+    self._users.set(user.id, user)
+
+  def get_session_id(self, user_id: int) -> Optional[str]:
+    session_id = self._sessions.get(user_id)
+    runtime_metrics.incr(
+        "identity_cache.session_hit" if session_id is not None else "identity_cache.session_miss"
+    )
+    return session_id
+
+  def put_session_id(self, user_id: int, session_id: str) -> None:
+    self._sessions.set(user_id, session_id)
+
+  def invalidate_session(self, user_id: int) -> None:
+    self._sessions.pop(user_id)
+
+  def get_tier(self, session_id: str) -> Tuple[bool, Optional[str]]:
+    """(найдено в кеше, тир или None)."""
+    tier = self._tiers.get(session_id)
+    if tier is None:
+      return False, None
+    return True, tier or None
+
+  def put_tier(self, session_id: str, tier: Optional[str]) -> None:
+    self._tiers.set(session_id, tier or "")
+
+
+def create_identity_cache(config: Any) -> Optional[IdentityCache]:
+  """Кеш по корню config (секция bot.identity_cache); выключен — None (сервисы идут в БД)."""
+  cfg_dict = config if isinstance(config, dict) else {}
+  bot_cfg = cfg_dict.get("bot") or {}
+  block = bot_cfg.get("identity_cache") if isinstance(bot_cfg, dict) else None
+  if not isinstance(block, dict) or not block.get("enabled", False):
+    return None
+  server_cfg = bot_cfg.get("server") if isinstance(bot_cfg, dict) else None
+  workers = int((server_cfg or {}).get("workers", 1) or 1) if isinstance(server_cfg, dict) else 1
+  if workers > 1:
+    logger.warning(
+        "bot.identity_cache выключен: workers=%s, смену сессии в другом воркере кеш не увидит", workers,
+    )
+    return None
+  ttl = block.get("ttl_seconds", 600)
+  return IdentityCache(
+      max_entries=int(block.get("max_entries", 50_000)),
+      ttl_seconds=float(ttl) if ttl else None,
+  )
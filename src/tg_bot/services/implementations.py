@@ -1,38 +1,79 @@
-from typing import List
+from typing import List, Optional
 from src.tg_bot.repositories.interfaces import IUserRepository, IAnswerRepository, ISessionRepository
+from .identity_cache import IdentityCache
 from .interfaces import IUserService, IAnswerService, ISessionService
 from src.tg_bot.models import User
 
 class UserService(IUserService):
-    def __init__(self, user_repo: IUserRepository):
+    def __init__(self, user_repo: IUserRepository, cache: Optional[IdentityCache] = None):
         self._repo = user_repo
+        self._cache = cache
 
     async def get_or_create_user(self, user_id: int, first_name: str, username: str | None) -> User:
+        if self._cache is not None:
+            cached = self._cache.get_user(user_id)
+            if cached is not None:
+                return cached
         defaults = {"first_name": first_name, "username": username}
-        return await self._repo.get_or_create(user_id, defaults)
+        user = await self._repo.get_or_create(user_id, defaults)
+        if self._cache is not None:
+            self._cache.put_user(user)
+        return user
 
     async def get_all_user_ids(self) -> List[int]:
-        users = await self._repo.get_all_users()
-        return [user.id for user in users]
+        return [user_id async for user_id in self._repo.iter_user_ids()]
 
 
 class SessionService(ISessionService):
-  def __init__(self, session_repo: ISessionRepository):
+  def __init__(self, session_repo: ISessionRepository, cache: Optional[IdentityCache] = None):
     self._repo = session_repo
+    self._cache = cache
 
   async def get_or_create_active_session(self, user_id: int) -> str:
     """Возвращает ID активной сессии. Если ее нет - создает новую."""
+    if self._cache is not None:
+      cached = self._cache.get_session_id(user_id)
+      if cached is not None:
+        return cached
     session = await self._repo.get_active_session(user_id)
     if not session:
       session = await self._repo.create_session(user_id)
+    if self._cache is not None:
+      self._cache.put_session_id(user_id, session.id)
     return session.id
 
   async def start_new_session(self, user_id: int) -> str:
-    """Закрывает старую сессию и начинает новую (для команды /newchat)."""
+    """Закрывает старую сессию и начинает новую (для команды /newchat); тир переносится."""
+    if self._cache is not None:
+      self._cache.invalidate_session(user_id)
+    old_session = await self._repo.get_active_session(user_id)
+    tier = old_session.latency_tier if old_session else None
     await self._repo.close_active_session(user_id)
-    new_session = await self._repo.create_session(user_id)
+    new_session = await self._repo.create_session(user_id, latency_tier=tier)
+    if self._cache is not None:
+      self._cache.put_session_id(user_id, new_session.id)
+      self._cache.put_tier(new_session.id, tier)
     return new_session.id
 
+  async def get_latency_tier(self, session_id: str) -> Optional[str]:
+    """Тир сессии (/fast, /thorough...); None — не выбирался."""
+    if self._cache is not None:
+      found, tier = self._cache.get_tier(session_id)
+      if found:
+        return tier
+    tier = await self._repo.get_latency_tier(session_id)
+    if self._cache is not None:
+      self._cache.put_tier(session_id, tier)
+    return tier
+
+  async def set_latency_tier(self, user_id: int, tier: str) -> str:
+    """Запоминает тир в активной сессии пользователя; возвращает её ID."""
+    session_id = await self.get_or_create_active_session(user_id)
+    await self._repo.set_latency_tier(session_id, tier)
+    if self._cache is not None:
+      self._cache.put_tier(session_id, tier)
+    return session_id
+
 
 class AnswerService(IAnswerService):
   def __init__(self, answer_repo: IAnswerRepository):
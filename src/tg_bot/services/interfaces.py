@@ -1,5 +1,5 @@
 from abc import abstractmethod
-from typing import Protocol, List
+from typing import Protocol, List, Optional
 from src.tg_bot.models import User, UserSession
 
 class IUserService(Protocol):
@@ -16,6 +16,12 @@ class ISessionService(Protocol):
   @abstractmethod
   async def start_new_session(self, user_id: int) -> str: ...
 
+  @abstractmethod
+  async def get_latency_tier(self, session_id: str) -> Optional[str]: ...
+
+  @abstractmethod
+  async def set_latency_tier(self, user_id: int, tier: str) -> str: ...
+
 
 class IAnswerService(Protocol):
   @abstractmethod
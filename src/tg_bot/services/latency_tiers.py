@@ -0,0 +1,149 @@
+"""Тиры латентности чата: fast / balanced / thorough (bot.latency_tiers).
+
+Тир — заранее собранный вариант RAG-цепочки и роутинга: отдельный DI-контейнер
+из config.yaml + overrides тира (deep_merge, как сценарии eval). Эмбеддинги,
+cross-encoder и BM25 варианты делят через src.util.model_registry; репозитории,
+identity-кеш, предзагрузка истории и кеш генерации — общие с основным контейнером бота.
+Пользователь выбирает тир командами /fast, /balanced, /thorough; выбор хранится
+в сессии и переживает /newchat.
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from dependency_injector import providers
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable
+
+from src.pipelines.routing import SemanticRoutingPort
+from src.util.config_merge import deep_merge
+from src.util.runtime_metrics import runtime_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIER = "balanced"
+
+# Провайдеры основного контейнера, экземпляры которых тиры используют как есть:
+# история сессии одна (write-behind буфер, предзагрузка), кеш identity — тоже. Кеш генерации
+# один на процесс: свой у тира открыл бы второе соединение с тем же SQLite-файлом, а ключ
+# и так различает модель и контекст, поэтому совпавший ответ годится любому тиру.
+_SHARED_PROVIDERS = (
+    "bot_answer_repo",
+    "bot_session_repo",
+    "bot_identity_cache",
+    "history_prefetcher",
+    "generation_cache",
+)
+
+
+@dataclass(frozen=True)
+class TierVariant:
+  name: str
+  description: str
+  rag_chain: Runnable
+  routing: SemanticRoutingPort
+  # Финальный ретривер rag_chain (спекулятивный поиск идёт через него же).
+  retriever: BaseRetriever
+  # Конфиг, из которого собран вариант (с overrides тира); по нему прогрев находит LLM тира.
+  config: Dict[str, Any] = field(default_factory=dict)
+
+
+class LatencyTiers:
+  """Варианты цепочки по имени тира; неизвестный или пустой тир — тир по умолчанию."""
+
+  def __init__(
+      self, variants: Dict[str, TierVariant], default: str, *, enabled: bool = True,
+  ) -> None:
+    if default not in variants:
+      raise ValueError(f"bot.latency_tiers.default={default!r} нет среди тиров {sorted(variants)}")
+    self._variants = variants
+    self._default = default
+    self._enabled = enabled
+
+  @property
+  def enabled(self) -> bool:
+    return self._enabled
+
+  @property
+  def default(self) -> str:
+    return self._default
+
+  @property
+  def names(self) -> List[str]:
+    return list(self._variants)
+
+  @property
+  def variants(self) -> List[TierVariant]:
+    return list(self._variants.values())
+
+  def resolve(self, tier: Optional[str]) -> str:
+    if self._enabled and tier in self._variants:
+      return tier
+    return self._default
+
+  def variant(self, tier: Optional[str]) -> TierVariant:
+    return self._variants[self.resolve(tier)]
+
+  def record(self, tier: str, seconds: float) -> None:
+    """Счётчик ``tier.{tier}.requests`` и гистограмма ``tier.{tier}.answer_seconds``."""
+    runtime_metrics.incr(f"tier.{tier}.requests")
+    runtime_metrics.observe(f"tier.{tier}.answer_seconds", seconds)
+
+
+def latency_tiers_config(config: Any) -> Dict[str, Any]:
+  cfg_dict = config if isinstance(config, dict) else {}
+  bot_cfg = cfg_dict.get("bot") or {}
+  block = bot_cfg.get("latency_tiers") if isinstance(bot_cfg, dict) else None
+  return block if isinstance(block, dict) else {}
+
+
+def _tier_container(container: Any, config: dict) -> Any:
+  tier_container = container.declarative_parent()
+  tier_container.config.from_dict(config)
+  for name in _SHARED_PROVIDERS:
+    getattr(tier_container, name).override(providers.Object(getattr(container, name)()))
+  return tier_container
+
+
+def create_latency_tiers(
+    config: Any,
+    container: Any,
+    *,
+    rag_chain: Runnable,
+    routing: SemanticRoutingPort,
+    retriever: BaseRetriever,
+) -> LatencyTiers:
+  """Тиры по bot.latency_tiers; тир без overrides — готовые rag_chain/routing/retriever бота.
+
+  ``container`` — основной контейнер после подмены bot_answer_repo (write-behind):
+  тиры берут из него общие экземпляры.
+  """
+  cfg_dict = config if isinstance(config, dict) else {}
+  block = latency_tiers_config(cfg_dict)
+  default = str(block.get("default", DEFAULT_TIER))
+  if not block.get("enabled", False):
+    base = TierVariant(default, "", rag_chain, routing, retriever, cfg_dict)
+    return LatencyTiers({default: base}, default, enabled=False)
+
+  variants: Dict[str, TierVariant] = {}
+  for name, tier_cfg in (block.get("tiers") or {}).items():
+    tier_cfg = tier_cfg if isinstance(tier_cfg, dict) else {}
+    description = str(tier_cfg.get("description", ""))
+    overrides = tier_cfg.get("overrides")
+    if not overrides:
+      variants[name] = TierVariant(name, description, rag_chain, routing, retriever, cfg_dict)
+      continue
+    logger.info("Тир %s: сборка варианта цепочки (overrides: %s)", name, sorted(overrides))
+    tier_cfg_dict = deep_merge(cfg_dict, overrides)
+    tier_container = _tier_container(container, tier_cfg_dict)
+    variants[name] = TierVariant(
+        name,
+        description,
+        tier_container.rag_chain(),
+        tier_container.semantic_routing_service(),
+        tier_container.final_retriever(),
+        tier_cfg_dict,
+    )
+  tiers = LatencyTiers(variants, default)
+  logger.info("Тиры латентности: %s, по умолчанию %s", ", ".join(tiers.names), default)
+  return tiers
@@ -0,0 +1,92 @@
+"""Склейка серии быстрых сообщений одного чата в один вопрос.
+
+Пользователи Telegram часто дробят вопрос на 2–3 сообщения подряд, и каждое запускает
+роутинг, переформулировку, поиск и генерацию. Хендлер каждого сообщения ждёт
+``window_seconds``; если за это время в чат пришло ещё сообщение, текущий вызов
+уходит (None), а ответ готовит последний — по склеенному тексту. ``max_wait_seconds``
+ограничивает задержку первого сообщения при непрерывном потоке.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+from src.util.runtime_metrics import runtime_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Burst:
+  __slots__ = ("parts", "generation", "started_at")
+
+  def __init__(self, started_at: float) -> None:
+    self.parts: List[str] = []
+    self.generation = 0
+    self.started_at = started_at
+
+
+class MessageDebouncer:
+  """Скользящее окно на чат; ``enabled=False`` — текст возвращается сразу как есть."""
+
+  def __init__(
+      self,
+      enabled: bool = False,
+      *,
+      window_seconds: float = 1.5,
+      max_wait_seconds: float = 6.0,
+      separator: str = "\n",
+  ) -> None:
+    self.enabled = enabled
+    self._window = max(0.0, float(window_seconds))
+    self._max_wait = max(self._window, float(max_wait_seconds))
+    self._separator = separator
+    self._bursts: Dict[Hashable, _Burst] = {}
+
+  async def collect(self, chat_key: Hashable, text: str) -> Optional[str]:
+    """Добавляет text в серию чата; склеенный текст — только последнему вызову серии.
+
+    Пустые части (стикеры, фото без подписи) в склейку не попадают; если вся серия
+    пустая, возвращается пустая строка.
+    """
+    if not self.enabled or self._window <= 0:
+      return text
+    now = time.monotonic()
+    burst = self._bursts.get(chat_key)
+    if burst is None:
+      burst = _Burst(now)
+      self._bursts[chat_key] = burst
+    if text.strip():
+      burst.parts.append(text.strip())
+    burst.generation += 1
+    my_generation = burst.generation
+
+    delay = min(self._window, max(0.0, burst.started_at + self._max_wait - now))
+    await asyncio.sleep(delay)
+
+    if self._bursts.get(chat_key) is not burst or burst.generation != my_generation:
+      runtime_metrics.incr("debounce.merged_messages")
+      return None
+    del self._bursts[chat_key]
+    if burst.generation > 1:
+      runtime_metrics.incr("debounce.bursts")
+      logger.info(
+          "Debounce: chat=%s склеено сообщений=%s за %.2fs",
+          chat_key,
+          burst.generation,
+          time.monotonic() - burst.started_at,
+      )
+    return self._separator.join(burst.parts)
+
+
+def create_message_debouncer(config: Any) -> MessageDebouncer:
+  """Собирает debouncer по корню config (секция bot.debounce)."""
+  cfg_dict = config if isinstance(config, dict) else {}
+  bot_cfg = cfg_dict.get("bot") or {}
+  block = bot_cfg.get("debounce") if isinstance(bot_cfg, dict) else None
+  if not isinstance(block, dict):
+    block = {}
+  return MessageDebouncer(
+      enabled=bool(block.get("enabled", False)),
+      window_seconds=float(block.get("window_seconds", 1.5)),
+      max_wait_seconds=float(block.get("max_wait_seconds", 6.0)),
+  )
@@ -0,0 +1,109 @@
+"""Спекулятивный поиск: ретривер запускается по сырому тексту параллельно с роутингом.
+
+Большая часть сообщений уходит в rag, а роутинг (эмбеддинги или LLM) и поиск
+(эмбеддинг запроса, гибридный поиск, реранкинг) до этого шли последовательно.
+Хендлер стартует ``SpeculativeRetrieval`` сразу после выбора тира и передаёт его
+в RAG-цепочку ключом ``prefetched_context``; цепочка берёт готовые документы, только
+если искала бы по тому же тексту (пустая история и нет standalone-вопроса роутера,
+иначе — вопрос совпадает). При smalltalk / direct_link и при переформулировке поиск
+отменяется.
+
+Метрики: ``speculative.started`` / ``.used`` / ``.wasted``; ``speculative.saved_seconds`` —
+сколько поиска уже было сделано к моменту, когда он понадобился цепочке (на столько
+ответ пришёл раньше), ``speculative.wasted_seconds`` — сколько работы выброшено;
+суммы за время жизни процесса — счётчики ``*_seconds_total``.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from src.util.runtime_metrics import runtime_metrics
+from src.util.text_processing import normalize_question
+
+logger = logging.getLogger(__name__)
+
+
+class SpeculativeRetrieval:
+  """Один спекулятивный прогон ретривера; результат забирается не больше одного раза."""
+
+  def __init__(self, retriever: BaseRetriever, query: str) -> None:
+    self._query = query
+    self._key = normalize_question(query)
+    self._started_at = time.perf_counter()
+    self._finished_at: Optional[float] = None
+    self._settled = False
+    self._task: "asyncio.Task[List[Document]]" = asyncio.create_task(retriever.ainvoke(query))
+    self._task.add_done_callback(self._on_done)
+    runtime_metrics.incr("speculative.started")
+
+  def _on_done(self, task: "asyncio.Task[Any]") -> None:
+    self._finished_at = time.perf_counter()
+    if not task.cancelled() and task.exception() is not None:
+      # Ошибку увидит take(); если результат не понадобится — только в лог.
+      logger.warning("Спекулятивный поиск упал: %s", task.exception())
+
+  def _spent_seconds(self) -> float:
+    end = self._finished_at if self._finished_at is not None else time.perf_counter()
+    return end - self._started_at
+
+  def matches(self, query: str) -> bool:
+    """Искала бы цепочка по тому же тексту (с точностью до регистра и пробелов)."""
+    return not self._settled and normalize_question(query or "") == self._key
+
+  async def take(self) -> List[Document]:
+    """Документы спекулятивного поиска; досчитывает его, если он ещё идёт."""
+    if self._settled:
+      raise RuntimeError("спекулятивный поиск уже забран или отменён")
+    self._settled = True
+    saved = self._spent_seconds()
+    runtime_metrics.incr("speculative.used")
+    runtime_metrics.observe("speculative.saved_seconds", saved)
+    runtime_metrics.incr("speculative.saved_seconds_total", saved)
+    logger.info(
+        "[TIMING] stage=speculative_retrieval saved=%.2fs done=%s", saved, self._task.done(),
+    )
+    return await self._task
+
+  def cancel(self) -> None:
+    """Поиск не пригодился: отменить (если ещё идёт) и учесть как выброшенную работу."""
+    if self._settled:
+      return
+    self._settled = True
+    self._task.cancel()
+    wasted = self._spent_seconds()
+    runtime_metrics.incr("speculative.wasted")
+    runtime_metrics.observe("speculative.wasted_seconds", wasted)
+    runtime_metrics.incr("speculative.wasted_seconds_total", wasted)
+    logger.info("[TIMING] stage=speculative_retrieval wasted=%.2fs", wasted)
+
+
+class SpeculativeRetrievalStarter:
+  """Решает, запускать ли спекулятивный поиск для сообщения (bot.speculative_retrieval)."""
+
+  def __init__(self, enabled: bool = False, *, min_chars: int = 0) -> None:
+    self.enabled = enabled
+    self._min_chars = max(0, int(min_chars))
+
+  def start(self, retriever: BaseRetriever, query: str) -> Optional[SpeculativeRetrieval]:
+    """None — выключено или сообщение слишком короткое (почти всегда smalltalk)."""
+    text = (query or "").strip()
+    if not self.enabled or not text or len(text) < self._min_chars:
+      return None
+    return SpeculativeRetrieval(retriever, text)
+
+
+def create_speculative_retrieval(config: Any) -> SpeculativeRetrievalStarter:
+  """Собирает стартер по корню config (секция bot.speculative_retrieval)."""
+  cfg_dict = config if isinstance(config, dict) else {}
+  bot_cfg = cfg_dict.get("bot") or {}
+  block = bot_cfg.get("speculative_retrieval") if isinstance(bot_cfg, dict) else None
+  if not isinstance(block, dict):
+    block = {}
+  return SpeculativeRetrievalStarter(
+      enabled=bool(block.get("enabled", False)),
+      min_chars=int(block.get("min_chars", 0)),
+  )
@@ -0,0 +1,22 @@
+"""Слияние YAML-конфигов: базовый config.yaml + переопределения (сценарии eval, тиры бота)."""
+from __future__ import annotations
+
+import copy
+from typing import Any
+
+
+def deep_merge(base: dict, override: Any) -> dict:
+  """Рекурсивное слияние dict; если override не dict — возвращает base."""
+  result = copy.deepcopy(base)
+  if override is None or not isinstance(override, dict):
+    return result
+
+  def _merge_into(dst: dict, src: dict) -> None:
+    for k, v in src.items():
+      if k in dst and isinstance(dst[k], dict) and isinstance(v, dict):
+        _merge_into(dst[k], v)
+      else:
+        dst[k] = copy.deepcopy(v)
+
+  _merge_into(result, override)
+  return result
@@ -0,0 +1,134 @@
+"""Точный кеш генерации: ключ (вопрос, chunk_id контекста, версии) → готовый ответ LLM.
+
+Память — LruTtlCache; опционально SQLite (один файл, stdlib sqlite3), чтобы ответы
+переживали перезапуск бота. Запись в SQLite протухает по тому же TTL (проверка при чтении,
+старые строки чистятся при записи).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional, Sequence
+
+from src.util.lru_ttl_cache import LruTtlCache
+
+logger = logging.getLogger(__name__)
+
+# Чистка протухших строк SQLite — раз в столько записей.
+_PRUNE_EVERY = 200
+
+
+def generation_cache_key(
+    question: str,
+    chunk_ids: Sequence[str],
+    *,
+    prompt_version: str,
+    model: str,
+    index_version: str,
+) -> str:
+  """sha256 от вопроса, упорядоченных chunk_id, версии промпта, модели и версии индекса."""
+  payload = json.dumps(
+      [question, list(chunk_ids), prompt_version, model, index_version],
+      ensure_ascii=False,
+      separators=(",", ":"),
+  )
+  return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+  """Ответы по ключу generation_cache_key: память, затем (если задан путь) SQLite."""
+
+  def __init__(
+      self,
+      *,
+      max_entries: int = 5000,
+      ttl_seconds: Optional[float] = None,
+      sqlite_path: Optional[str] = None,
+  ) -> None:
+    self._ttl = float(ttl_seconds) if ttl_seconds else None
+    self._memory: LruTtlCache[str, str] = LruTtlCache(max_entries, self._ttl)
+    self._lock = threading.Lock()
+    self._conn: Optional[sqlite3.Connection] = None
+    self._writes = 0
+    if sqlite_path:
+      directory = os.path.dirname(sqlite_path)
+      if directory:
+        os.makedirs(directory, exist_ok=True)
+      self._conn = sqlite3.connect(sqlite_path, check_same_thread=False, isolation_level=None)
+      self._conn.execute("PRAGMA journal_mode=WAL")
+      self._conn.execute(
+          "CREATE TABLE IF NOT EXISTS generation_cache ("
+          "key TEXT PRIMARY KEY, answer TEXT NOT NULL, created_at REAL NOT NULL)"
+      )
+      logger.info("Кеш генерации: SQLite %s", sqlite_path)
+
+  @property
+  def persistent(self) -> bool:
+    return self._conn is not None
+
+  def get_memory(self, key: str) -> Optional[str]:
+    return self._memory.get(key)
+
+  def get_persisted(self, key: str) -> Optional[str]:
+    """Ответ из SQLite (блокирующий вызов); найденный поднимается в память."""
+    if self._conn is None:
+      return None
+    with self._lock:
+      row = self._conn.execute(
+          "SELECT answer, created_at FROM generation_cache WHERE key = ?", (key,)
+      ).fetchone()
+    if row is None or (self._ttl and row[1] + self._ttl <= time.time()):
+      return None
+    self._memory.set(key, row[0])
+    return row[0]
+
+  def set_memory(self, key: str, answer: str) -> None:
+    self._memory.set(key, answer)
+
+  def persist(self, key: str, answer: str) -> None:
+    """Запись в SQLite (блокирующий вызов); ошибки диска только в лог."""
+    if self._conn is None:
+      return
+    now = time.time()
+    try:
+      with self._lock:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO generation_cache (key, answer, created_at) VALUES (?, ?, ?)",
+            (key, answer, now),
+        )
+        self._writes += 1
+        if self._ttl and self._writes % _PRUNE_EVERY == 0:
+          self._conn.execute(
+              "DELETE FROM generation_cache WHERE created_at <= ?", (now - self._ttl,)
+          )
+    except sqlite3.Error as exc:
+      logger.warning("Кеш генерации: запись в SQLite не удалась: %s", exc)
+
+  def close(self) -> None:
+    if self._conn is not None:
+      with self._lock:
+        self._conn.close()
+      self._conn = None
+
+
+def create_generation_cache(config: Any) -> Optional[GenerationCache]:
+  """Кеш по корню config (rag_pipeline.generation_cache); выключен — None.
+
+  Один экземпляр на процесс бота (Singleton контейнера, тиры латентности получают его же):
+  второе соединение с тем же SQLite-файлом дублировало бы память и писало бы наперегонки.
+  """
+  cfg_dict = config if isinstance(config, dict) else {}
+  block = (cfg_dict.get("rag_pipeline") or {}).get("generation_cache")
+  if not isinstance(block, dict) or not block.get("enabled", False):
+    return None
+  ttl = block.get("ttl_seconds", 86400)
+  return GenerationCache(
+      max_entries=int(block.get("max_entries", 5000)),
+      ttl_seconds=float(ttl) if ttl else None,
+      sqlite_path=block.get("sqlite_path") or None,
+  )
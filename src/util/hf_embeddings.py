@@ -1,7 +1,12 @@
 """Параметры HuggingFace / sentence-transformers для LangChain HuggingFaceEmbeddings."""
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from src.util.model_registry import shared_model
+
+if TYPE_CHECKING:
+  from langchain_huggingface import HuggingFaceEmbeddings
 
 
 def huggingface_embedding_model_kwargs(
@@ -12,3 +17,26 @@ def huggingface_embedding_model_kwargs(
   if embedding_cfg.get("local_files_only", False):
     out["local_files_only"] = True
   return out
+
+
+def shared_huggingface_embeddings(
+    embedding_cfg: Dict[str, Any],
+    model_name: Optional[str] = None,
+) -> "HuggingFaceEmbeddings":
+  """Нормализованные эмбеддинги embedding_model (или model_name) — один экземпляр на процесс.
+
+  Ретриверы всех цепочек и роутер по примерам получают одну и ту же загруженную модель.
+  """
+  from langchain_huggingface import HuggingFaceEmbeddings
+
+  name = model_name or embedding_cfg["name"]
+  model_kwargs = huggingface_embedding_model_kwargs(embedding_cfg)
+  return shared_model(
+      "hf_embeddings",
+      (name, model_kwargs["device"]),
+      lambda: HuggingFaceEmbeddings(
+          model_name=name,
+          model_kwargs=model_kwargs,
+          encode_kwargs={'normalize_embeddings': True}
+      ),
+  )
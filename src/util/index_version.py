@@ -0,0 +1,56 @@
+"""Версия индекса: метка, которую run_indexing пишет после успешной записи в хранилище.
+
+Кеши и single-flight добавляют её в ключ, чтобы после переиндексации не отдавать
+ответы по старому индексу. Чтение дешёвое: файл перечитывается только при смене mtime.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+
+DEFAULT_INDEX_VERSION_PATH = "data/index_version.txt"
+UNKNOWN_INDEX_VERSION = "unknown"
+
+_lock = threading.Lock()
+_cache: Dict[str, Tuple[float, str]] = {}
+
+
+def index_version_path(config: dict) -> str:
+  paths = (config or {}).get("paths") or {}
+  return str(paths.get("index_version") or DEFAULT_INDEX_VERSION_PATH)
+
+
+def read_index_version(path: str) -> str:
+  """Текущая версия индекса; нет файла — ``unknown`` (индексация ещё не писала метку)."""
+  try:
+    mtime = os.stat(path).st_mtime
+  except OSError:
+    return UNKNOWN_INDEX_VERSION
+  with _lock:
+    cached = _cache.get(path)
+    if cached is not None and cached[0] == mtime:
+      return cached[1]
+  try:
+    with open(path, "r", encoding="utf-8") as f:
+      version = f.read().strip() or UNKNOWN_INDEX_VERSION
+  except OSError:
+    return UNKNOWN_INDEX_VERSION
+  with _lock:
+    _cache[path] = (mtime, version)
+  return version
+
+
+def write_index_version(path: str) -> str:
+  """Пишет новую метку (UTC-время + случайный суффикс) и возвращает её."""
+  version = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:8]}"
+  directory = os.path.dirname(path)
+  if directory:
+    os.makedirs(directory, exist_ok=True)
+  tmp_path = f"{path}.tmp"
+  with open(tmp_path, "w", encoding="utf-8") as f:
+    f.write(version + "\n")
+  os.replace(tmp_path, path)
+  return version
@@ -0,0 +1,87 @@
+"""Ограниченный LRU-кеш с TTL записей (in-memory, один процесс).
+
+Используется там, где нужен «запомнить на время»: дедуп update_id вебхука,
+кеши пользователей/сессий и решений роутинга.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class LruTtlCache(Generic[K, V]):
+  """LRU на OrderedDict; запись протухает через ``ttl_seconds`` (None — без TTL).
+
+  При переполнении ``maxsize`` вытесняется давно не использованная запись.
+  """
+
+  def __init__(
+      self,
+      maxsize: int = 1024,
+      ttl_seconds: Optional[float] = None,
+      *,
+      clock: Callable[[], float] = time.monotonic,
+  ) -> None:
+    self._maxsize = max(1, int(maxsize))
+    self._ttl = float(ttl_seconds) if ttl_seconds else None
+    self._clock = clock
+    self._lock = threading.Lock()
+    self._data: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+
+  def __len__(self) -> int:
+    return len(self._data)
+
+  def __contains__(self, key: K) -> bool:
+    return self.get(key, _MISSING) is not _MISSING
+
+  def get(self, key: K, default=None):
+    """Значение по ключу или ``default``; попадание продлевает позицию в LRU."""
+    with self._lock:
+      item = self._data.get(key)
+      if item is None:
+        return default
+      expires_at, value = item
+      if expires_at <= self._clock():
+        del self._data[key]
+        return default
+      self._data.move_to_end(key)
+      return value
+
+  def set(self, key: K, value: V) -> None:
+    with self._lock:
+      expires_at = self._clock() + self._ttl if self._ttl else float("inf")
+      self._data[key] = (expires_at, value)
+      self._data.move_to_end(key)
+      while len(self._data) > self._maxsize:
+        self._data.popitem(last=False)
+
+  def add_if_absent(self, key: K, value: V) -> bool:
+    """Атомарно: True — ключа не было (записан), False — уже есть живая запись."""
+    with self._lock:
+      item = self._data.get(key)
+      now = self._clock()
+      if item is not None and item[0] > now:
+        return False
+      self._data[key] = (now + self._ttl if self._ttl else float("inf"), value)
+      self._data.move_to_end(key)
+      while len(self._data) > self._maxsize:
+        self._data.popitem(last=False)
+      return True
+
+  def pop(self, key: K, default=None):
+    with self._lock:
+      item = self._data.pop(key, None)
+    if item is None or item[0] <= self._clock():
+      return default
+    return item[1]
+
+  def clear(self) -> None:
+    with self._lock:
+      self._data.clear()
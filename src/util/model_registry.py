@@ -0,0 +1,31 @@
+"""Общие тяжёлые модели процесса: один экземпляр на ключ (имя модели, устройство).
+
+Варианты цепочек (латентные тиры бота, сценарии eval) собираются отдельными
+контейнерами из слитого конфига; без реестра каждый заново грузил бы bge-m3,
+FastEmbed BM25 и cross-encoder. Объекты после загрузки только читаются
+(encode / predict), поэтому делить их между цепочками безопасно.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_models: Dict[Tuple[str, Hashable], Any] = {}
+
+
+def shared_model(kind: str, key: Hashable, factory: Callable[[], T]) -> T:
+  """Модель kind/key: первая загрузка — factory(), дальше тот же объект."""
+  with _lock:
+    model = _models.get((kind, key))
+    if model is None:
+      model = factory()
+      _models[(kind, key)] = model
+    else:
+      logger.info("Модель %s %s: повторно используется загруженная", kind, key)
+    return model
@@ -0,0 +1,44 @@
+"""Кооперативная отмена прогона для кода в потоках (HyDE, sync-ретриверы в executor).
+
+``task.cancel()`` обрывает await'ы в event loop, но не поток из ``to_thread`` /
+``run_in_executor``. Прогон привязывает ``threading.Event`` к ``ContextVar``
+(контекст копируется в поток), поток проверяет его между шагами через
+``raise_if_run_cancelled``.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from contextvars import ContextVar
+from typing import Optional
+
+_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar(
+    "run_cancel_event",
+    default=None,
+)
+
+
+class RunCancelledError(asyncio.CancelledError):
+  """Прогон отменён (пришло новое сообщение пользователя).
+
+  Наследник CancelledError (BaseException): fallback'и вида ``except Exception``
+  в ретриверах её не перехватывают.
+  """
+
+
+def bind_run_cancel_event() -> threading.Event:
+  """Создаёт событие отмены для текущего контекста (вызывать внутри задачи прогона)."""
+  event = threading.Event()
+  _cancel_event.set(event)
+  return event
+
+
+def run_cancelled() -> bool:
+  event = _cancel_event.get()
+  return event is not None and event.is_set()
+
+
+def raise_if_run_cancelled() -> None:
+  """RunCancelledError, если текущий прогон отменён; вне прогона — no-op."""
+  if run_cancelled():
+    raise RunCancelledError()
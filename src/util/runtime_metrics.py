@@ -0,0 +1,80 @@
+"""Счётчики, gauge и тайминги процесса бота (in-memory, без внешних зависимостей).
+
+Один реестр на процесс: хендлеры и сервисы пишут сюда, server-startup отдаёт
+``snapshot()`` в логи. Для тайминга храним скользящее окно последних N замеров —
+этого достаточно для p50/p95 без гистограмм.
+"""
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Any, Deque, Dict
+
+
+class RuntimeMetrics:
+  """Потокобезопасный реестр: HyDE и retrieval пишут из пулов потоков."""
+
+  def __init__(self, max_samples: int = 2048) -> None:
+    self._max_samples = max(1, int(max_samples))
+    self._lock = threading.Lock()
+    self._counters: Dict[str, float] = {}
+    self._gauges: Dict[str, float] = {}
+    self._timings: Dict[str, Deque[float]] = {}
+
+  def incr(self, name: str, value: float = 1) -> None:
+    with self._lock:
+      self._counters[name] = self._counters.get(name, 0) + value
+
+  def set_gauge(self, name: str, value: float) -> None:
+    with self._lock:
+      self._gauges[name] = value
+
+  def observe(self, name: str, seconds: float) -> None:
+    """Добавляет замер длительности (секунды) в окно ``name``."""
+    with self._lock:
+      samples = self._timings.get(name)
+      if samples is None:
+        samples = deque(maxlen=self._max_samples)
+        self._timings[name] = samples
+      samples.append(float(seconds))
+
+  def counter(self, name: str) -> float:
+    with self._lock:
+      return self._counters.get(name, 0)
+
+  def percentile(self, name: str, q: float) -> float | None:
+    """Перцентиль q∈[0, 100] по окну замеров; None, если замеров нет."""
+    with self._lock:
+      samples = sorted(self._timings.get(name) or ())
+    return _percentile_sorted(samples, q)
+
+  def snapshot(self) -> Dict[str, Any]:
+    """Копия состояния: counters, gauges и сводка по таймингам (count/p50/p95/p99/max)."""
+    with self._lock:
+      counters = dict(self._counters)
+      gauges = dict(self._gauges)
+      timings = {k: sorted(v) for k, v in self._timings.items()}
+    summary: Dict[str, Dict[str, float]] = {}
+    for name, samples in timings.items():
+      if not samples:
+        continue
+      summary[name] = {
+          "count": len(samples),
+          "p50": round(_percentile_sorted(samples, 50), 4),
+          "p95": round(_percentile_sorted(samples, 95), 4),
+          "p99": round(_percentile_sorted(samples, 99), 4),
+          "max": round(samples[-1], 4),
+      }
+    return {"counters": counters, "gauges": gauges, "timings": summary}
+
+
+def _percentile_sorted(samples: list[float], q: float) -> float | None:
+  """Nearest-rank перцентиль по уже отсортированному списку."""
+  if not samples:
+    return None
+  q = min(100.0, max(0.0, float(q)))
+  idx = int(round(q / 100.0 * (len(samples) - 1)))
+  return samples[idx]
+
+
+runtime_metrics = RuntimeMetrics()
@@ -0,0 +1,96 @@
+"""Семантический кеш ответов: вектор вопроса → ответ, для перефразированных повторов.
+
+Матрица эмбеддингов вопросов выделяется сразу на ``max_entries`` строк; поиск — одно
+умножение на вектор запроса по живым строкам. Вытеснение — протухшие по TTL строки,
+затем давно не использованная (LRU). Записи помечены версией индекса: при её смене
+(переиндексация) кеш очищается целиком — ответы по старому индексу не отдаются.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class SemanticCacheEntry:
+  question: str
+  answer: str
+  chunk_ids: Tuple[str, ...]
+  # Документы контекста как есть: потребители цепочки (HTTP API, eval) берут из них источники.
+  context: Tuple[Any, ...] = ()
+
+
+@dataclass(frozen=True)
+class SemanticCacheHit:
+  entry: SemanticCacheEntry
+  score: float
+
+
+class SemanticAnswerCache:
+  """Потокобезопасный кеш на матрице; ``lookup`` / ``add`` принимают нормированный вектор."""
+
+  def __init__(
+      self,
+      dim: int,
+      *,
+      max_entries: int = 1000,
+      ttl_seconds: Optional[float] = None,
+      threshold: float = 0.95,
+      clock: Callable[[], float] = time.monotonic,
+  ) -> None:
+    self._max = max(1, int(max_entries))
+    self._ttl = float(ttl_seconds) if ttl_seconds else None
+    self._threshold = float(threshold)
+    self._clock = clock
+    self._lock = threading.Lock()
+    self._matrix = np.zeros((self._max, int(dim)), dtype=np.float32)
+    self._entries: List[Optional[SemanticCacheEntry]] = [None] * self._max
+    self._expires_at = np.full(self._max, -np.inf)
+    self._last_used = np.full(self._max, -np.inf)
+    self._version: Optional[str] = None
+
+  def __len__(self) -> int:
+    with self._lock:
+      return int(np.count_nonzero(self._expires_at > self._clock()))
+
+  def _sync_version(self, index_version: str) -> bool:
+    """Под локом: другая версия индекса — очистить. True — кеш был очищен."""
+    if self._version == index_version:
+      return False
+    dropped = self._version is not None and bool(np.any(self._expires_at > -np.inf))
+    self._version = index_version
+    self._entries = [None] * self._max
+    self._expires_at[:] = -np.inf
+    self._last_used[:] = -np.inf
+    return dropped
+
+  def lookup(self, vector: np.ndarray, index_version: str) -> Tuple[Optional[SemanticCacheHit], bool]:
+    """(попадание или None, был ли кеш очищен из-за смены версии индекса)."""
+    with self._lock:
+      invalidated = self._sync_version(index_version)
+      now = self._clock()
+      alive = self._expires_at > now
+      if not alive.any():
+        return None, invalidated
+      sims = np.where(alive, self._matrix @ vector, -np.inf)
+      slot = int(np.argmax(sims))
+      score = float(sims[slot])
+      if score < self._threshold:
+        return None, invalidated
+      self._last_used[slot] = now
+      return SemanticCacheHit(self._entries[slot], score), invalidated
+
+  def add(self, vector: np.ndarray, entry: SemanticCacheEntry, index_version: str) -> None:
+    with self._lock:
+      self._sync_version(index_version)
+      now = self._clock()
+      dead = np.flatnonzero(self._expires_at <= now)
+      slot = int(dead[0]) if dead.size else int(np.argmin(self._last_used))
+      self._matrix[slot] = vector
+      self._entries[slot] = entry
+      self._expires_at[slot] = now + self._ttl if self._ttl else np.inf
+      self._last_used[slot] = now
@@ -0,0 +1,104 @@
+"""Single-flight для async-стримов: одинаковые одновременные запросы делят один прогон.
+
+Первый вызов по ключу запускает producer в отдельной задаче; остальные подписываются
+на тот же список чанков (опоздавшие получают уже выданные чанки с начала). После
+завершения ключ освобождается — это не кеш, повторный вопрос позже идёт заново.
+Producer отменяется, только когда ушли все подписчики.
+"""
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Dict, Generic, Hashable, List, Optional, TypeVar
+
+from src.util.run_cancellation import bind_run_cancel_event
+from src.util.runtime_metrics import runtime_metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Flight(Generic[T]):
+  __slots__ = ("chunks", "done", "error", "changed", "subscribers", "task", "cancel_event")
+
+  def __init__(self) -> None:
+    self.chunks: List[T] = []
+    self.done = False
+    self.error: Optional[BaseException] = None
+    self.changed = asyncio.Event()
+    self.subscribers = 0
+    self.task: Optional[asyncio.Task] = None
+    self.cancel_event = None
+
+  def notify(self) -> None:
+    self.changed.set()
+    self.changed = asyncio.Event()
+
+
+class SingleFlight(Generic[T]):
+  """Реестр прогонов «в полёте»; ``name`` — префикс счётчиков в runtime_metrics."""
+
+  def __init__(self, name: str = "single_flight") -> None:
+    self._name = name
+    self._flights: Dict[Hashable, _Flight[T]] = {}
+
+  async def stream(
+      self, key: Hashable, factory: Callable[[], AsyncIterator[T]]
+  ) -> AsyncIterator[T]:
+    """Чанки общего прогона по key; factory вызывается, только если прогона ещё нет."""
+    flight = self._flights.get(key)
+    if flight is None:
+      flight = _Flight()
+      self._flights[key] = flight
+      flight.task = asyncio.create_task(self._produce(key, flight, factory))
+      runtime_metrics.incr(f"{self._name}.leaders")
+    else:
+      runtime_metrics.incr(f"{self._name}.coalesced")
+      logger.info("Single-flight: запрос присоединён к идущему прогону (%s)", self._name)
+
+    flight.subscribers += 1
+    idx = 0
+    try:
+      while True:
+        while idx < len(flight.chunks):
+          yield flight.chunks[idx]
+          idx += 1
+        if flight.done:
+          if flight.error is not None:
+            raise flight.error
+          return
+        await flight.changed.wait()
+    finally:
+      flight.subscribers -= 1
+      if flight.subscribers == 0 and not flight.done:
+        self._abort(key, flight)
+
+  async def _produce(
+      self, key: Hashable, flight: _Flight[T], factory: Callable[[], AsyncIterator[T]]
+  ) -> None:
+    # Своё событие отмены: задача унаследовала контекст первого подписчика, а его
+    # отмена не должна останавливать прогон для остальных.
+    flight.cancel_event = bind_run_cancel_event()
+    try:
+      async for chunk in factory():
+        flight.chunks.append(chunk)
+        flight.notify()
+    except asyncio.CancelledError:
+      flight.error = asyncio.CancelledError()
+      raise
+    except Exception as exc:
+      flight.error = exc
+    finally:
+      flight.done = True
+      if self._flights.get(key) is flight:
+        del self._flights[key]
+      flight.notify()
+
+  def _abort(self, key: Hashable, flight: _Flight[T]) -> None:
+    """Подписчиков не осталось — прогон больше никому не нужен."""
+    if self._flights.get(key) is flight:
+      del self._flights[key]
+    if flight.cancel_event is not None:
+      flight.cancel_event.set()
+    if flight.task is not None and not flight.task.done():
+      flight.task.cancel()
+    runtime_metrics.incr(f"{self._name}.aborted")
@@ -18,4 +18,31 @@ def tokenize_for_bm25(text: str) -> List[str]:
   words = re.findall(r'\b\w+\b', text.lower())
 
   # Применяем стемминг и отбрасываем слишком короткие слова (предлоги)
-  return [_stemmer.stem(w) for w in words if len(w) > 2]
\ No newline at end of file
+  return [_stemmer.stem(w) for w in words if len(w) > 2]
+
+_QUESTION_TRAILING = " \t\n?!.…"
+
+
+def normalize_question(text: str) -> str:
+  """
+  Ключ «того же вопроса» для кешей и single-flight: нижний регистр, ё→е,
+  схлопнутые пробелы, без завершающих ?!. — «Проходной балл?» == «проходной  балл».
+  """
+  if not text:
+    return ""
+  lowered = text.lower().replace("ё", "е")
+  return " ".join(lowered.split()).strip(_QUESTION_TRAILING)
+
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_short_message(text: str) -> str:
+  """
+  Ключ кеша решений роутинга: casefold, ё→е, без пунктуации, схлопнутые пробелы —
+  «Спасибо!!!», «спасибо» и « СПАСИБО. » дают один ключ.
+  """
+  if not text:
+    return ""
+  folded = text.casefold().replace("ё", "е")
+  return " ".join(_NON_WORD.sub(" ", folded).split())
@@ -0,0 +1,58 @@
+"""Асинхронный token bucket: не больше ``rate`` операций в секунду со всплеском до ``capacity``.
+
+Используется рассылкой для глобального лимита Bot API (≈30 сообщений/с на бота).
+``pause`` останавливает выдачу целиком — так отрабатывается
+``retry_after`` от Telegram.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Callable
+
+
+class TokenBucket:
+  """Ведро на одного владельца event loop; ``acquire`` ждёт токен по очереди вызовов."""
+
+  def __init__(
+      self,
+      rate: float,
+      capacity: float = 1,
+      *,
+      clock: Callable[[], float] = time.monotonic,
+  ) -> None:
+    if rate <= 0:
+      raise ValueError(f"rate must be > 0, got: {rate!r}")
+    self._rate = float(rate)
+    self._capacity = max(1.0, float(capacity))
+    self._clock = clock
+    self._tokens = self._capacity
+    self._updated = clock()
+    self._paused_until = 0.0
+    self._lock = asyncio.Lock()
+
+  @property
+  def rate(self) -> float:
+    return self._rate
+
+  def pause(self, seconds: float) -> None:
+    """Не выдавать токены ``seconds`` секунд (после паузы ведро пустое)."""
+    until = self._clock() + max(0.0, float(seconds))
+    if until > self._paused_until:
+      self._paused_until = until
+      self._tokens = 0.0
+      self._updated = until
+
+  async def acquire(self) -> None:
+    async with self._lock:
+      while True:
+        now = self._clock()
+        if now < self._paused_until:
+          await asyncio.sleep(self._paused_until - now)
+          continue
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        if self._tokens >= 1:
+          self._tokens -= 1
+          return
+        await asyncio.sleep((1 - self._tokens) / self._rate)
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.tg_bot.services.active_runs import (
+    ActiveRunRegistry,
+    StaleRunCancelled,
+    create_active_run_registry,
+)
+from src.util.run_cancellation import RunCancelledError, raise_if_run_cancelled, run_cancelled
+
+
+def test_disabled_registry_runs_coroutine_without_cancelling():
+  registry = ActiveRunRegistry(enabled=False)
+
+  async def scenario():
+    first = registry.begin(("u", "s"))
+    second = registry.begin(("u", "s"))
+    return first, second, await registry.run(("u", "s"), first, asyncio.sleep(0, result="ok"))
+
+  assert asyncio.run(scenario()) == (0, 0, "ok")
+
+
+def test_new_message_cancels_running_run():
+  registry = ActiveRunRegistry(enabled=True)
+  key = ("u", "s")
+
+  async def scenario():
+    first_started = asyncio.Event()
+    first_gen = registry.begin(key)
+
+    async def slow():
+      first_started.set()
+      await asyncio.sleep(10)
+      return "старый ответ"
+
+    first = asyncio.create_task(registry.run(key, first_gen, slow()))
+    await first_started.wait()
+    second_gen = registry.begin(key)
+    second = await registry.run(key, second_gen, asyncio.sleep(0, result="новый ответ"))
+    with pytest.raises(StaleRunCancelled):
+      await first
+    return second
+
+  t0 = time.monotonic()
+  assert asyncio.run(scenario()) == "новый ответ"
+  assert time.monotonic() - t0 < 5
+
+
+def test_stale_generation_is_rejected_before_start():
+  registry = ActiveRunRegistry(enabled=True)
+  key = ("u", "s")
+  ran = []
+
+  async def body():
+    ran.append(True)
+
+  async def scenario():
+    old = registry.begin(key)
+    registry.begin(key)
+    with pytest.raises(StaleRunCancelled):
+      await registry.run(key, old, body())
+
+  asyncio.run(scenario())
+  assert ran == []
+
+
+def test_different_sessions_do_not_cancel_each_other():
+  registry = ActiveRunRegistry(enabled=True)
+
+  async def scenario():
+    gen_a = registry.begin(("u", "a"))
+    task_a = asyncio.create_task(registry.run(("u", "a"), gen_a, asyncio.sleep(0.05, result="a")))
+    await asyncio.sleep(0)
+    gen_b = registry.begin(("u", "b"))
+    result_b = await registry.run(("u", "b"), gen_b, asyncio.sleep(0, result="b"))
+    return await task_a, result_b
+
+  assert asyncio.run(scenario()) == ("a", "b")
+
+
+def test_cancel_event_reaches_worker_threads():
+  registry = ActiveRunRegistry(enabled=True)
+  key = ("u", "s")
+  started = threading.Event()
+  seen = {}
+
+  def blocking_step():
+    # Поток ретривера/HyDE: task.cancel() его не останавливает, событие отмены — да.
+    started.set()
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+      try:
+        raise_if_run_cancelled()
+      except RunCancelledError:
+        seen["cancelled"] = True
+        return
+      time.sleep(0.01)
+
+  async def scenario():
+    gen = registry.begin(key)
+    worker = None
+
+    async def body():
+      nonlocal worker
+      worker = asyncio.ensure_future(asyncio.to_thread(blocking_step))
+      await asyncio.shield(worker)
+
+    task = asyncio.create_task(registry.run(key, gen, body()))
+    await asyncio.to_thread(started.wait, 5)
+    registry.begin(key)
+    with pytest.raises(StaleRunCancelled):
+      await task
+    await worker
+
+  asyncio.run(scenario())
+  assert seen.get("cancelled") is True
+
+
+def test_outside_run_cancellation_is_noop():
+  assert run_cancelled() is False
+  raise_if_run_cancelled()
+
+
+def test_factory_reads_bot_cancellation_section():
+  assert create_active_run_registry({}).enabled is False
+  assert create_active_run_registry({"bot": {"cancellation": {"enabled": True}}}).enabled is True
@@ -0,0 +1,244 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("langchain_core")
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter  # noqa: E402
+from aiogram.methods import EditMessageText  # noqa: E402
+
+from src.tg_bot.services import answer_streamer as streamer_module  # noqa: E402
+from src.tg_bot.services.answer_streamer import (  # noqa: E402
+    TELEGRAM_MAX_MESSAGE_LEN,
+    TelegramAnswerStreamer,
+    _CANCELLED_NOTE,
+    _EMPTY_ANSWER_FALLBACK,
+    _FAILED_NOTE,
+    _split_for_telegram,
+)
+
+_UNSET = "<default parse_mode>"
+
+
+class FakeClock:
+  def __init__(self) -> None:
+    self.now = 100.0
+
+  def __call__(self) -> float:
+    return self.now
+
+
+class FakeSentMessage:
+  def __init__(self, chat: "FakeChat", text: str, parse_mode: str) -> None:
+    self.chat = chat
+    self.text = text
+    self.parse_mode = parse_mode
+    self.deleted = False
+
+  async def edit_text(self, text: str, parse_mode: str = _UNSET) -> None:
+    self.chat.calls.append(("edit", text, parse_mode))
+    if self.chat.edit_errors:
+      raise self.chat.edit_errors.pop(0)
+    self.text = text
+    self.parse_mode = parse_mode
+
+  async def delete(self) -> None:
+    self.chat.calls.append(("delete", self.text, None))
+    self.deleted = True
+
+
+class FakeChat:
+  """Входящее сообщение: ``answer`` шлёт новое, правки и удаления пишутся в ``calls``."""
+
+  def __init__(self) -> None:
+    self.calls = []
+    self.sent = []
+    self.edit_errors = []
+
+  async def answer(self, text: str, parse_mode: str = _UNSET) -> FakeSentMessage:
+    self.calls.append(("send", text, parse_mode))
+    sent = FakeSentMessage(self, text, parse_mode)
+    self.sent.append(sent)
+    return sent
+
+  def visible(self):
+    return [m.text for m in self.sent if not m.deleted]
+
+
+class FakeChain:
+  """astream отдаёт шаги (секунды до токена, токен); исключение в шагах — бросается."""
+
+  def __init__(self, clock: FakeClock, steps) -> None:
+    self._clock = clock
+    self._steps = steps
+
+  async def astream(self, inputs, config=None):
+    for step in self._steps:
+      if isinstance(step, BaseException):
+        raise step
+      delay, token = step
+      self._clock.now += delay
+      yield {"answer": token}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+  clock = FakeClock()
+  monkeypatch.setattr(streamer_module, "time", SimpleNamespace(perf_counter=clock))
+  return clock
+
+
+def _stream(streamer, chat, chain, **kwargs):
+  return asyncio.run(streamer.stream_answer(chat, chain, {"input": "q"}, {}, **kwargs))
+
+
+def _retry_after() -> TelegramRetryAfter:
+  return TelegramRetryAfter(EditMessageText(text="x"), "Flood control exceeded", 0)
+
+
+def test_first_token_sends_plain_message_final_edit_uses_default_parse_mode(clock):
+  chat = FakeChat()
+  streamer = TelegramAnswerStreamer(True, cursor=" ▌")
+  answer = _stream(streamer, chat, FakeChain(clock, [(0.1, "Привет"), (0.1, ", мир")]))
+
+  assert answer == "Привет, мир"
+  assert chat.calls[0] == ("send", "Привет ▌", None)
+  assert chat.calls[-1] == ("edit", "Привет, мир", _UNSET)
+  assert chat.visible() == ["Привет, мир"]
+
+
+def test_edits_are_throttled_by_interval_and_growth(clock):
+  chat = FakeChat()
+  streamer = TelegramAnswerStreamer(True, edit_interval_seconds=1.0, min_chars_delta=5, cursor="")
+  steps = [
+      (0.0, "a"),       # первое сообщение
+      (0.2, "bbbbbb"),  # вырос, но интервал не прошёл
+      (1.0, "c"),       # интервал и прирост — правка
+      (2.0, "d"),       # интервал прошёл, но прирост < 5 символов с последней правки
+      (0.0, "eeee"),    # прирост набрался — правка
+  ]
+  _stream(streamer, chat, FakeChain(clock, steps))
+
+  edits = [text for kind, text, _ in chat.calls if kind == "edit"]
+  # Последняя правка — финальная, с parse_mode по умолчанию.
+  assert edits == ["abbbbbbc", "abbbbbbcdeeee", "abbbbbbcdeeee"]
+
+
+def test_long_answer_is_split_into_several_messages(clock):
+  chat = FakeChat()
+  streamer = TelegramAnswerStreamer(True, cursor="")
+  first = "x" * 3000
+  second = "y" * 3000
+  answer = _stream(streamer, chat, FakeChain(clock, [(0.0, first + "\n"), (2.0, second)]))
+
+  assert answer == first + "\n" + second
+  visible = chat.visible()
+  assert visible == [first, second]
+  assert all(len(part) <= TELEGRAM_MAX_MESSAGE_LEN for part in visible)
+
+
+def test_split_without_newlines_cuts_at_limit():
+  parts = _split_for_telegram("z" * (TELEGRAM_MAX_MESSAGE_LEN + 10))
+  assert [len(p) for p in parts] == [TELEGRAM_MAX_MESSAGE_LEN, 10]
+
+
+def test_cursor_overflow_message_is_deleted_on_final_render(clock):
+  chat = FakeChat()
+  streamer = TelegramAnswerStreamer(True, cursor="\n▌▌")
+  body = "w" * TELEGRAM_MAX_MESSAGE_LEN
+  _stream(streamer, chat, FakeChain(clock, [(0.0, body)]))
+
+  assert len(chat.sent) == 2
+  assert chat.visible() == [body]
+  assert chat.calls[-1][0] == "delete"
+
+
+def test_retry_after_skips_intermediate_edit(clock):
+  chat = FakeChat()
+  streamer = TelegramAnswerStreamer(True, edit_interval_seconds=1.0, min_chars_delta=1, cursor="")
+  chat.edit_errors.append(_retry_after())
+  steps = [(0.0, "a"), (2.0, "b"), (2.0, "c")]
+  answer = _stream(streamer, chat, FakeChain(clock, steps))
+
+  edits = [text for kind, text, _ in chat.calls if kind == "edit"]
+  # Правка "ab" упёрлась во flood control и пропущена; следующая прошла, финальная — тоже.
+  assert edits == ["ab", "abc", "abc"]
+  assert answer == "abc"
+  assert chat.visible() == ["abc"]
+
+
+def test_retry_after_on_final_render_waits_and_retries(clock):
+  chat = FakeChat()
+  streamer = TelegramAnswerStreamer(True, cursor=" ▌")
+
+  class _FloodOnFinal(FakeChain):
+    async def astream(self, inputs, config=None):
+      async for chunk in super().astream(inputs, config):
+        yield chunk
+      chat.edit_errors.append(_retry_after())
+
+  answer = _stream(streamer, chat, _FloodOnFinal(clock, [(0.0, "ответ")]))
+
+  assert answer == "ответ"
+  assert chat.calls[-2:] == [("edit", "ответ", _UNSET), ("edit", "ответ", _UNSET)]
+  assert chat.visible() == ["ответ"]
+
+
+def test_final_parse_error_falls_back_to_plain_text(clock):
+  chat = FakeChat()
+  streamer = TelegramAnswerStreamer(True, cursor="")
+  chat.edit_errors.append(TelegramBadRequest(EditMessageText(text="x"), "can't parse entities"))
+  _stream(streamer, chat, FakeChain(clock, [(0.0, "<b>ответ")]))
+
+  assert chat.calls[-2:] == [("edit", "<b>ответ", _UNSET), ("edit", "<b>ответ", None)]
+
+
+def test_failure_with_fallback_replaces_partial_text_in_place(clock):
+  chat = FakeChat()
+  streamer = TelegramAnswerStreamer(True, cursor="")
+  chain = FakeChain(clock, [(0.0, "начало ответа"), RuntimeError("llm down")])
+  answer = _stream(streamer, chat, chain, label="chat_only", fallback_answer="Шаблон")
+
+  assert answer == "Шаблон"
+  assert len(chat.sent) == 1
+  assert chat.visible() == ["Шаблон"]
+
+
+def test_failure_before_first_token_sends_fallback(clock):
+  chat = FakeChat()
+  streamer = TelegramAnswerStreamer(True)
+  answer = _stream(
+      streamer, chat, FakeChain(clock, [RuntimeError("llm down")]), fallback_answer="Шаблон",
+  )
+  assert answer == "Шаблон"
+  assert chat.calls == [("send", "Шаблон", _UNSET)]
+
+
+def test_failure_without_fallback_marks_partial_and_reraises(clock):
+  chat = FakeChat()
+  streamer = TelegramAnswerStreamer(True, cursor="")
+  chain = FakeChain(clock, [(0.0, "начало"), RuntimeError("llm down")])
+  with pytest.raises(RuntimeError):
+    _stream(streamer, chat, chain)
+
+  assert chat.visible() == [f"начало\n\n{_FAILED_NOTE}"]
+
+
+def test_cancellation_marks_partial_and_propagates(clock):
+  chat = FakeChat()
+  streamer = TelegramAnswerStreamer(True, cursor="")
+  chain = FakeChain(clock, [(0.0, "начало"), asyncio.CancelledError()])
+  with pytest.raises(asyncio.CancelledError):
+    _stream(streamer, chat, chain)
+
+  assert chat.visible() == [f"начало\n\n{_CANCELLED_NOTE}"]
+
+
+def test_empty_stream_sends_placeholder(clock):
+  chat = FakeChat()
+  streamer = TelegramAnswerStreamer(True)
+  answer = _stream(streamer, chat, FakeChain(clock, [(0.0, "   ")]))
+  assert answer == _EMPTY_ANSWER_FALLBACK
+  assert chat.visible() == [_EMPTY_ANSWER_FALLBACK]
@@ -0,0 +1,77 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("sqlalchemy")
+# Репозиторий пользователей тянет настройки БД; тестам соединение не нужно.
+for _name, _value in (("DB__NAME", "test"), ("DB__USER", "test"), ("DB__PASS", "test"),
+                      ("TGSERVER__TOKEN", "0:test")):
+  os.environ.setdefault(_name, _value)
+
+from src.tg_bot.services.broadcast import (  # noqa: E402
+    BroadcastAlreadyRunningError,
+    BroadcastCheckpoint,
+    BroadcastService,
+    _BroadcastRun,
+    checkpoint_path,
+)
+
+
+def _run(tmp_path, checkpoint_every=1000):
+  service = BroadcastService(None, checkpoint_dir=str(tmp_path), checkpoint_every=checkpoint_every)
+  checkpoint = BroadcastCheckpoint(broadcast_id="b1", text="hello")
+  return _BroadcastRun(service, bot=None, checkpoint=checkpoint), checkpoint
+
+
+def test_cursor_moves_only_over_contiguous_prefix(tmp_path):
+  run, checkpoint = _run(tmp_path)
+  run._dispatched.extend([10, 20, 30, 40])
+
+  run._mark_done(20)
+  assert checkpoint.cursor is None
+  run._mark_done(10)
+  assert checkpoint.cursor == 20
+  run._mark_done(40)
+  assert checkpoint.cursor == 20
+  run._mark_done(30)
+  assert checkpoint.cursor == 40
+  assert not run._dispatched
+  assert not run._done
+
+
+def test_checkpoint_written_every_n_processed(tmp_path):
+  run, checkpoint = _run(tmp_path, checkpoint_every=2)
+  run._dispatched.extend([1, 2, 3])
+  path = checkpoint_path(str(tmp_path), "b1")
+
+  run._mark_done(1)
+  assert not (tmp_path / "b1.json").exists()
+  run._mark_done(3)
+  with open(path, encoding="utf-8") as f:
+    assert json.load(f)["cursor"] == 1
+  run._mark_done(2)
+  assert checkpoint.cursor == 3
+  assert BroadcastCheckpoint.load(str(tmp_path), "b1").cursor == 1  # до следующей записи
+
+
+def test_checkpoint_roundtrip(tmp_path):
+  checkpoint = BroadcastCheckpoint(broadcast_id="b2", text="hi", cursor=5, created_at="2026-01-01")
+  checkpoint.stats.sent = 3
+  checkpoint.save(str(tmp_path))
+  loaded = BroadcastCheckpoint.load(str(tmp_path), "b2")
+  assert loaded == checkpoint
+
+
+def test_second_service_on_same_dir_is_rejected(tmp_path):
+  first = BroadcastService(None, checkpoint_dir=str(tmp_path))
+  second = BroadcastService(None, checkpoint_dir=str(tmp_path))
+  first._acquire_lock("20260101-000000")
+  try:
+    with pytest.raises(BroadcastAlreadyRunningError, match="20260101-000000"):
+      second._acquire_lock("20260101-000001")
+  finally:
+    first._release_lock()
+  second._acquire_lock("20260101-000001")
+  second._release_lock()
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document  # noqa: E402
+
+from src.pipelines.routing.direct_link_index import (  # noqa: E402
+    DirectLink,
+    DirectLinkIndex,
+    DirectLinkSemanticRouting,
+)
+from src.pipelines.routing.router import RoutingDecision  # noqa: E402
+
+_DOCS = [
+    Document("…", metadata={
+        "source": "https://fpmi.bsu.by/ru/raspisanie",
+        "title": "Расписание занятий | ФПМИ БГУ",
+        "H1": "Расписание",
+    }),
+    Document("…", metadata={
+        "source": "https://fpmi.bsu.by/ru/raspisanie",
+        "title": "Расписание занятий | ФПМИ БГУ",
+        "H2": "Расписание сессии",
+    }),
+    Document("…", metadata={"source": "https://fpmi.bsu.by/ru/news", "title": "Новости | ФПМИ БГУ"}),
+    Document("…", metadata={
+        "source": "https://fpmi.bsu.by/ru/abiturient",
+        "title": "No Title",
+        "H1": "Приёмная кампания",
+        "H2": "Правила приёма",
+    }),
+    Document("…", metadata={"source": "local/file.html", "title": "Не страница сайта"}),
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+  return DirectLinkIndex.from_documents(_DOCS)
+
+
+def test_pages_collected_by_url(index):
+  assert len(index) == 3
+
+
+def test_search_ranks_matching_title_first(index):
+  links = index.search("где посмотреть расписание занятий?", top_k=3)
+  assert links[0].url == "https://fpmi.bsu.by/ru/raspisanie"
+  assert links[0].title == "Расписание занятий"  # хвост «| ФПМИ БГУ» отрезан
+  assert all(link.url != "https://fpmi.bsu.by/ru/news" for link in links)
+
+
+def test_search_matches_word_forms(index):
+  links = index.search("новостей", top_k=1)
+  assert [link.url for link in links] == ["https://fpmi.bsu.by/ru/news"]
+
+
+def test_title_falls_back_to_heading(index):
+  links = index.search("правила приема", top_k=1)
+  assert links == [DirectLink("https://fpmi.bsu.by/ru/abiturient", "Приёмная кампания", links[0].score)]
+
+
+def test_stop_words_and_min_score_filter(index):
+  assert index.search("дай ссылку на сайт, пожалуйста") == []
+  assert index.search("расписание", min_score=1e6) == []
+
+
+def test_top_k_limits_results(index):
+  assert len(index.search("расписание новости приема", top_k=2)) == 2
+
+
+def test_save_load_roundtrip(index, tmp_path):
+  path = str(tmp_path / "links.json")
+  index.save(path)
+  loaded = DirectLinkIndex.load(path)
+  query = "расписание сессии"
+  assert loaded.search(query) == index.search(query)
+
+
+class _FixedRouting:
+  needs_history = False
+
+  def __init__(self, decision):
+    self.decision = decision
+
+  async def route(self, query, history=None):
+    return self.decision
+
+
+def test_route_answers_direct_link_with_escaped_links(index, tmp_path):
+  page = Document("…", metadata={"source": "https://example.org/a?x=1&y=2", "title": "Q&A <FAQ>"})
+  path = str(tmp_path / "links.json")
+  DirectLinkIndex.from_documents([page, *_DOCS]).save(path)
+  inner = _FixedRouting(RoutingDecision(use_rag=False, answer="заготовка", non_rag_label="direct_link"))
+  routing = DirectLinkSemanticRouting(inner, path, min_score=0.0, header="Ссылки:")
+
+  decision = asyncio.run(routing.route("faq"))
+  assert decision.non_rag_label == "direct_link"
+  assert decision.answer == "Ссылки:\n• Q&amp;A &lt;FAQ&gt; — https://example.org/a?x=1&amp;y=2"
+
+
+def test_route_keeps_other_decisions_and_misses(index, tmp_path):
+  path = str(tmp_path / "links.json")
+  index.save(path)
+  rag = RoutingDecision(use_rag=True, answer=None)
+  assert asyncio.run(DirectLinkSemanticRouting(_FixedRouting(rag), path).route("расписание")) is rag
+  fallback = RoutingDecision(use_rag=False, answer="заготовка", non_rag_label="direct_link")
+  routing = DirectLinkSemanticRouting(_FixedRouting(fallback), path)
+  assert asyncio.run(routing.route("что-то совсем другое")) is fallback
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from src.tg_bot.services.fair_scheduler import FairRequestScheduler, UserQueueFullError
+
+
+def test_disabled_scheduler_never_queues():
+  async def scenario():
+    scheduler = FairRequestScheduler(enabled=False, max_concurrent_runs=1, max_pending_per_user=1)
+    tickets = [scheduler.acquire(1) for _ in range(5)]
+    assert all(t.position == 0 for t in tickets)
+    async with tickets[0]:
+      async with tickets[1]:
+        pass
+
+  asyncio.run(scenario())
+
+
+def test_round_robin_between_users():
+  async def scenario():
+    scheduler = FairRequestScheduler(enabled=True, max_concurrent_runs=1, max_pending_per_user=5)
+    first = scheduler.acquire(1)
+    assert first.position == 0
+    b = scheduler.acquire(1)
+    c = scheduler.acquire(1)
+    d = scheduler.acquire(2)
+    # Позиция — на момент постановки: c встал в очередь раньше, чем появился d.
+    assert (b.position, c.position, d.position) == (1, 2, 2)
+
+    order = []
+
+    async def run(name, ticket):
+      async with ticket:
+        order.append(name)
+
+    tasks = [asyncio.create_task(run(n, t)) for n, t in (("b", b), ("c", c), ("d", d))]
+    await asyncio.sleep(0)
+    assert order == []
+    async with first:
+      pass
+    await asyncio.gather(*tasks)
+    # Второй запрос пользователя 1 ждёт, пока пользователь 2 получит свой слот.
+    assert order == ["b", "d", "c"]
+
+  asyncio.run(scenario())
+
+
+def test_per_user_pending_limit():
+  async def scenario():
+    scheduler = FairRequestScheduler(enabled=True, max_concurrent_runs=1, max_pending_per_user=2)
+    first = scheduler.acquire(7)
+    scheduler.acquire(7)
+    with pytest.raises(UserQueueFullError):
+      scheduler.acquire(7)
+    # Чужой лимит не задет.
+    scheduler.acquire(8)
+    async with first:
+      pass
+    # Завершённый запрос освобождает место в лимите пользователя.
+    scheduler.acquire(7)
+
+  asyncio.run(scenario())
+
+
+def test_abandon_waiting_ticket_leaves_queue():
+  async def scenario():
+    scheduler = FairRequestScheduler(enabled=True, max_concurrent_runs=1, max_pending_per_user=1)
+    running = scheduler.acquire(1)
+    waiting = scheduler.acquire(2)
+    waiting.abandon()
+    waiting.abandon()  # повторный вызов ничего не ломает
+    async with running:
+      pass
+    # Слот свободен, лимит пользователя 2 восстановлен.
+    again = scheduler.acquire(2)
+    assert again.position == 0
+
+  asyncio.run(scenario())
+
+
+def test_abandon_granted_ticket_returns_slot():
+  async def scenario():
+    scheduler = FairRequestScheduler(enabled=True, max_concurrent_runs=1, max_pending_per_user=1)
+    granted = scheduler.acquire(1)
+    queued = scheduler.acquire(2)
+    assert queued.position == 1
+    granted.abandon()
+    await asyncio.wait_for(queued.__aenter__(), timeout=1)
+    await queued.__aexit__(None, None, None)
+
+  asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_leak_slot():
+  async def scenario():
+    scheduler = FairRequestScheduler(enabled=True, max_concurrent_runs=1, max_pending_per_user=1)
+    running = scheduler.acquire(1)
+    waiting = scheduler.acquire(2)
+
+    async def wait_for_slot():
+      async with waiting:
+        pytest.fail("отменённый запрос не должен получить слот")
+
+    task = asyncio.create_task(wait_for_slot())
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+      await task
+    async with running:
+      pass
+    assert scheduler.acquire(3).position == 0
+
+  asyncio.run(scenario())
@@ -0,0 +1,128 @@
+import asyncio
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("yaml")
+
+from src.tg_bot.services.faq_store import FaqEntry, FaqFastPath, FaqStore  # noqa: E402
+
+_VECTORS = {
+    "Когда сессия?": [1.0, 0.0, 0.0],
+    "когда сессия": [0.99, 0.1, 0.0],
+    "Где деканат?": [0.0, 1.0, 0.0],
+    "где деканат находится": [0.1, 0.97, 0.0],
+    "Как поступить?": [0.0, 0.0, 1.0],
+    "когда  СЕССИЯ?": [1.0, 0.0, 0.0],
+    "погода": [0.6, 0.0, 0.8],
+}
+
+
+class FakeEmbeddings:
+  def __init__(self) -> None:
+    self.calls = []
+
+  def embed_query(self, text):
+    self.calls.append(text)
+    return _VECTORS[text]
+
+
+def _entries():
+  return [
+      FaqEntry("Когда сессия?", "В январе.", "https://fpmi.bsu.by/session"),
+      FaqEntry("Где деканат?", "Корпус 2 & ауд. <5>.", None, origin="approved:7"),
+  ]
+
+
+def _save_store(path, entries=None, model_name="model-a"):
+  store = FaqStore.build(entries or _entries(), FakeEmbeddings(), model_name)
+  store.save(str(path))
+  return store
+
+
+def _fast_path(path, **kwargs):
+  kwargs.setdefault("model_name", "model-a")
+  return FaqFastPath(FakeEmbeddings(), str(path), **kwargs)
+
+
+def test_build_collapses_duplicates_preferring_approved():
+  entries = [
+      FaqEntry("Когда сессия?", "эталон"),
+      FaqEntry("когда  СЕССИЯ?", "одобренный", origin="approved:1"),
+  ]
+  store = FaqStore.build(entries, FakeEmbeddings(), "model-a")
+  assert len(store) == 1
+  assert store.entries[0].answer == "одобренный"
+
+
+def test_save_and_load_roundtrip(tmp_path):
+  path = tmp_path / "faq.npz"
+  _save_store(path)
+  loaded = FaqStore.load(str(path))
+  assert loaded.model_name == "model-a"
+  assert loaded.entries == _entries()
+  match = loaded.best(np.asarray([1.0, 0.0, 0.0], dtype=np.float32))
+  assert match.entry.question == "Когда сессия?"
+  assert match.score == pytest.approx(1.0)
+
+
+def test_hit_above_threshold_returns_answer_with_source(tmp_path):
+  path = tmp_path / "faq.npz"
+  _save_store(path)
+  fast_path = _fast_path(path, threshold=0.9)
+  answer = asyncio.run(fast_path.answer("когда сессия", has_history=False))
+  assert answer == "В январе.\n\nИсточник: https://fpmi.bsu.by/session"
+
+
+def test_answer_is_html_escaped(tmp_path):
+  path = tmp_path / "faq.npz"
+  _save_store(path)
+  fast_path = _fast_path(path, threshold=0.9)
+  answer = asyncio.run(fast_path.answer("где деканат находится", has_history=False))
+  assert answer == "Корпус 2 &amp; ауд. &lt;5&gt;."
+
+
+def test_below_threshold_misses(tmp_path):
+  path = tmp_path / "faq.npz"
+  _save_store(path)
+  fast_path = _fast_path(path, threshold=0.9)
+  assert asyncio.run(fast_path.answer("погода", has_history=False)) is None
+
+
+def test_follow_up_question_with_history_is_not_looked_up(tmp_path):
+  path = tmp_path / "faq.npz"
+  _save_store(path)
+  fast_path = _fast_path(path, threshold=0.9)
+  assert asyncio.run(fast_path.answer("когда сессия", has_history=True)) is None
+  assert fast_path._embeddings.calls == []
+
+
+def test_disabled_or_missing_store_returns_none(tmp_path):
+  path = tmp_path / "faq.npz"
+  assert asyncio.run(_fast_path(path).answer("когда сессия", has_history=False)) is None
+  _save_store(path)
+  disabled = _fast_path(path, enabled=False)
+  assert asyncio.run(disabled.answer("когда сессия", has_history=False)) is None
+  assert asyncio.run(_fast_path(path).answer("  ", has_history=False)) is None
+
+
+def test_store_of_another_model_is_ignored(tmp_path):
+  path = tmp_path / "faq.npz"
+  _save_store(path, model_name="model-b")
+  fast_path = _fast_path(path, threshold=0.5)
+  assert fast_path.lookup("когда сессия") is None
+
+
+def test_rebuilt_store_is_picked_up_without_restart(tmp_path):
+  path = tmp_path / "faq.npz"
+  _save_store(path)
+  fast_path = _fast_path(path, threshold=0.9)
+  assert fast_path.lookup("Как поступить?") is None
+
+  _save_store(path, entries=[FaqEntry("Как поступить?", "Через ЦТ.")])
+  stat = os.stat(path)
+  os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+  match = fast_path.lookup("Как поступить?")
+  assert match is not None
+  assert match.entry.answer == "Через ЦТ."
@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+from src.util.generation_cache import GenerationCache, create_generation_cache, generation_cache_key
+
+_BASE = dict(prompt_version="p1", model="llama3.1", index_version="v1")
+
+
+def test_key_is_deterministic():
+  assert generation_cache_key("вопрос", ["c1", "c2"], **_BASE) == generation_cache_key(
+      "вопрос", ("c1", "c2"), **_BASE
+  )
+
+
+@pytest.mark.parametrize(
+    "question, chunk_ids, overrides",
+    [
+        ("другой вопрос", ["c1", "c2"], {}),
+        ("вопрос", ["c2", "c1"], {}),
+        ("вопрос", ["c1"], {}),
+        ("вопрос", ["c1", "c2"], {"prompt_version": "p2"}),
+        ("вопрос", ["c1", "c2"], {"model": "qwen2.5"}),
+        ("вопрос", ["c1", "c2"], {"index_version": "v2"}),
+    ],
+)
+def test_key_changes_with_every_component(question, chunk_ids, overrides):
+  reference = generation_cache_key("вопрос", ["c1", "c2"], **_BASE)
+  assert generation_cache_key(question, chunk_ids, **{**_BASE, **overrides}) != reference
+
+
+def test_key_does_not_confuse_field_boundaries():
+  assert generation_cache_key("a", ["b", "c"], **_BASE) != generation_cache_key("a", ["b,c"], **_BASE)
+
+
+def test_memory_cache():
+  cache = GenerationCache(max_entries=10)
+  assert cache.get_memory("k") is None
+  cache.set_memory("k", "ответ")
+  assert cache.get_memory("k") == "ответ"
+  assert not cache.persistent
+  assert cache.get_persisted("k") is None
+
+
+def test_sqlite_survives_restart(tmp_path):
+  path = str(tmp_path / "cache" / "gen.sqlite3")
+  first = GenerationCache(sqlite_path=path)
+  first.set_memory("k", "ответ")
+  first.persist("k", "ответ")
+  first.close()
+
+  second = GenerationCache(sqlite_path=path)
+  try:
+    assert second.get_memory("k") is None
+    assert second.get_persisted("k") == "ответ"
+    assert second.get_memory("k") == "ответ"  # найденный ответ поднят в память
+  finally:
+    second.close()
+
+
+def test_sqlite_entry_expires(tmp_path):
+  cache = GenerationCache(ttl_seconds=0.05, sqlite_path=str(tmp_path / "gen.sqlite3"))
+  try:
+    cache.persist("k", "ответ")
+    time.sleep(0.1)
+    assert cache.get_persisted("k") is None
+  finally:
+    cache.close()
+
+
+def test_factory_respects_enabled_flag(tmp_path):
+  assert create_generation_cache({}) is None
+  assert create_generation_cache({"rag_pipeline": {"generation_cache": {"enabled": False}}}) is None
+  cache = create_generation_cache({
+      "rag_pipeline": {"generation_cache": {
+          "enabled": True, "sqlite_path": str(tmp_path / "gen.sqlite3"), "ttl_seconds": 0,
+      }},
+  })
+  try:
+    assert cache is not None and cache.persistent
+  finally:
+    cache.close()
@@ -0,0 +1,149 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("dependency_injector")
+pytest.importorskip("langchain_core")
+pytest.importorskip("sqlalchemy")
+# Интерфейсы репозиториев тянут настройки БД; тестам соединение не нужно.
+for _name, _value in (("DB__NAME", "test"), ("DB__USER", "test"), ("DB__PASS", "test"),
+                      ("TGSERVER__TOKEN", "0:test")):
+  os.environ.setdefault(_name, _value)
+
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestClient, TestServer  # noqa: E402
+from langchain_core.documents import Document  # noqa: E402
+
+from src.tg_bot.db.history import SessionHistoryPrefetcher  # noqa: E402
+from src.tg_bot.server.http_api import RagHttpApi, create_http_api  # noqa: E402
+from src.tg_bot.services.fair_scheduler import FairRequestScheduler  # noqa: E402
+from src.tg_bot.services.latency_tiers import LatencyTiers, TierVariant  # noqa: E402
+
+_TOKEN = "s3cret"
+_AUTH = {"Authorization": f"Bearer {_TOKEN}"}
+
+
+class FakeRetriever:
+  def __init__(self, name: str) -> None:
+    self.name = name
+    self.queries = []
+
+  async def ainvoke(self, question):
+    self.queries.append(question)
+    return [Document(page_content=f"{self.name}: {question}", metadata={"chunk_id": self.name})]
+
+
+class FakeChain:
+  def __init__(self) -> None:
+    self.calls = 0
+
+  async def ainvoke(self, inputs, config=None):
+    self.calls += 1
+    return {"answer": f"ответ на {inputs['input']}", "context": []}
+
+
+def _tiers():
+  variants = {
+      name: TierVariant(name, "", FakeChain(), None, FakeRetriever(name))
+      for name in ("balanced", "thorough")
+  }
+  return LatencyTiers(variants, "balanced")
+
+
+def _api(tiers):
+  return RagHttpApi(
+      latency_tiers=tiers,
+      history_prefetcher=SessionHistoryPrefetcher(None),
+      request_scheduler=FairRequestScheduler(enabled=False),
+      token=_TOKEN,
+  )
+
+
+def _call(tiers, method_path, *, json=None, headers=None):
+  """(status, JSON-тело) одного запроса к приложению с зарегистрированным API."""
+  async def scenario():
+    app = web.Application()
+    _api(tiers).register(app)
+    async with TestClient(TestServer(app)) as client:
+      resp = await client.post(method_path, json=json, headers=headers or {})
+      return resp.status, await resp.json()
+
+  return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("path", ["/api/answer", "/api/retrieve", "/api/batch"])
+@pytest.mark.parametrize(
+    "headers",
+    [{}, {"Authorization": "Bearer wrong"}, {"Authorization": _TOKEN}, {"Authorization": "Bearer "}],
+)
+def test_requests_without_valid_token_are_rejected(path, headers):
+  tiers = _tiers()
+  status, body = _call(tiers, path, json={"question": "вопрос", "questions": ["вопрос"]}, headers=headers)
+  assert status == 401
+  assert "Authorization" in body["error"]
+  assert all(v.rag_chain.calls == 0 for v in tiers.variants)
+  assert all(v.retriever.queries == [] for v in tiers.variants)
+
+
+def test_valid_token_answers():
+  tiers = _tiers()
+  status, body = _call(
+      tiers, "/api/answer", json={"question": "вопрос", "stream": False}, headers=_AUTH,
+  )
+  assert status == 200
+  assert body["answer"] == "ответ на вопрос"
+
+
+def test_retrieve_uses_retriever_of_requested_tier():
+  tiers = _tiers()
+  status, body = _call(
+      tiers, "/api/retrieve", json={"question": "вопрос", "tier": "thorough"}, headers=_AUTH,
+  )
+  assert status == 200
+  assert [d["chunk_id"] for d in body["documents"]] == ["thorough"]
+  assert tiers.variant("balanced").retriever.queries == []
+
+
+def test_batch_retrieve_uses_default_tier_and_rejects_unknown_tier():
+  tiers = _tiers()
+  status, body = _call(
+      tiers, "/api/batch", json={"questions": ["a", "b"], "mode": "retrieve"}, headers=_AUTH,
+  )
+  assert status == 200
+  assert [r["documents"][0]["chunk_id"] for r in body["results"]] == ["balanced", "balanced"]
+
+  status, body = _call(
+      tiers, "/api/batch", json={"questions": ["a"], "mode": "retrieve", "tier": "nope"},
+      headers=_AUTH,
+  )
+  assert status == 400
+  assert "tier" in body["error"]
+
+
+def test_api_refuses_empty_token():
+  with pytest.raises(ValueError):
+    RagHttpApi(
+        latency_tiers=_tiers(),
+        history_prefetcher=SessionHistoryPrefetcher(None),
+        request_scheduler=FairRequestScheduler(enabled=False),
+        token="",
+    )
+
+
+def test_factory_requires_enabled_flag_and_token(monkeypatch):
+  kwargs = dict(
+      latency_tiers=_tiers(),
+      history_prefetcher=SessionHistoryPrefetcher(None),
+      request_scheduler=FairRequestScheduler(enabled=False),
+  )
+  monkeypatch.delenv("TEST_HTTP_API_TOKEN", raising=False)
+  config = {"bot": {"http_api": {"enabled": True, "token_env": "TEST_HTTP_API_TOKEN"}}}
+
+  assert create_http_api({"bot": {"http_api": {"enabled": False}}}, **kwargs) is None
+  assert create_http_api(config, **kwargs) is None
+  monkeypatch.setenv("TEST_HTTP_API_TOKEN", "")
+  assert create_http_api(config, **kwargs) is None
+  monkeypatch.setenv("TEST_HTTP_API_TOKEN", _TOKEN)
+  assert isinstance(create_http_api(config, **kwargs), RagHttpApi)
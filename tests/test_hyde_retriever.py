@@ -0,0 +1,73 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+
+from src.retrievers.hyde_retriever import HyDEQueryEmbeddings  # noqa: E402
+from src.util.run_cancellation import RunCancelledError, bind_run_cancel_event  # noqa: E402
+
+
+class FakeEmbeddings:
+  def embed_query(self, text):
+    return [1.0, 0.0] if text.startswith("гипотеза") else [0.0, 1.0]
+
+  def embed_documents(self, texts):
+    return [self.embed_query(t) for t in texts]
+
+
+class FakeLLM:
+  """ainvoke ждёт ``delay`` секунд; отмену задачи (оборванный запрос) запоминает."""
+
+  def __init__(self, delay=0.0, answer="гипотеза") -> None:
+    self.delay = delay
+    self.answer = answer
+    self.aborted = threading.Event()
+
+  async def ainvoke(self, prompt):
+    try:
+      await asyncio.sleep(self.delay)
+    except asyncio.CancelledError:
+      self.aborted.set()
+      raise
+    return self.answer
+
+
+def test_hypothesis_embedding_is_used():
+  hyde = HyDEQueryEmbeddings(FakeEmbeddings(), FakeLLM())
+  assert hyde.embed_query("вопрос") == [1.0, 0.0]
+
+
+def test_empty_hypothesis_falls_back_to_question():
+  hyde = HyDEQueryEmbeddings(FakeEmbeddings(), FakeLLM(answer="  "))
+  assert hyde.embed_query("вопрос") == [0.0, 1.0]
+
+
+def test_timeout_aborts_llm_request_and_falls_back():
+  llm = FakeLLM(delay=10)
+  hyde = HyDEQueryEmbeddings(FakeEmbeddings(), llm, timeout_seconds=0.1)
+  t0 = time.monotonic()
+  assert hyde.embed_query("вопрос") == [0.0, 1.0]
+  assert time.monotonic() - t0 < 5
+  assert llm.aborted.wait(2)
+
+
+def test_run_cancellation_aborts_llm_request():
+  llm = FakeLLM(delay=10)
+  hyde = HyDEQueryEmbeddings(FakeEmbeddings(), llm, timeout_seconds=30)
+
+  def _cancelled_run():
+    # Своя копия контекста: событие отмены не утекает в остальные тесты.
+    cancel_event = bind_run_cancel_event()
+    threading.Timer(0.1, cancel_event.set).start()
+    hyde.embed_query("вопрос")
+
+  t0 = time.monotonic()
+  with pytest.raises(RunCancelledError):
+    contextvars.copy_context().run(_cancelled_run)
+  assert time.monotonic() - t0 < 5
+  assert llm.aborted.wait(2)
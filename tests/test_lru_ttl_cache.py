@@ -0,0 +1,75 @@
+from src.util.lru_ttl_cache import LruTtlCache
+
+
+class FakeClock:
+  def __init__(self) -> None:
+    self.now = 0.0
+
+  def __call__(self) -> float:
+    return self.now
+
+
+def test_get_missing_returns_default():
+  cache = LruTtlCache(maxsize=2)
+  assert cache.get("a") is None
+  assert cache.get("a", 0) == 0
+  assert "a" not in cache
+
+
+def test_evicts_least_recently_used():
+  cache = LruTtlCache(maxsize=2)
+  cache.set("a", 1)
+  cache.set("b", 2)
+  assert cache.get("a") == 1  # a становится свежее b
+  cache.set("c", 3)
+  assert "b" not in cache
+  assert cache.get("a") == 1
+  assert cache.get("c") == 3
+  assert len(cache) == 2
+
+
+def test_entry_expires_after_ttl():
+  clock = FakeClock()
+  cache = LruTtlCache(maxsize=10, ttl_seconds=5, clock=clock)
+  cache.set("a", 1)
+  clock.now = 4.9
+  assert cache.get("a") == 1
+  clock.now = 5.0
+  assert cache.get("a") is None
+  assert len(cache) == 0
+
+
+def test_zero_ttl_means_no_expiry():
+  clock = FakeClock()
+  cache = LruTtlCache(maxsize=10, ttl_seconds=0, clock=clock)
+  cache.set("a", 1)
+  clock.now = 1e9
+  assert cache.get("a") == 1
+
+
+def test_add_if_absent_respects_live_entry_and_replaces_expired():
+  clock = FakeClock()
+  cache = LruTtlCache(maxsize=10, ttl_seconds=10, clock=clock)
+  assert cache.add_if_absent(42, True) is True
+  assert cache.add_if_absent(42, True) is False
+  clock.now = 10.0
+  assert cache.add_if_absent(42, True) is True
+
+
+def test_add_if_absent_evicts_over_maxsize():
+  cache = LruTtlCache(maxsize=2)
+  for key in (1, 2, 3):
+    assert cache.add_if_absent(key, True)
+  assert 1 not in cache
+  assert len(cache) == 2
+
+
+def test_pop_ignores_expired_entry():
+  clock = FakeClock()
+  cache = LruTtlCache(maxsize=10, ttl_seconds=1, clock=clock)
+  cache.set("a", 1)
+  cache.set("b", 2)
+  assert cache.pop("a") == 1
+  assert "a" not in cache
+  clock.now = 2.0
+  assert cache.pop("b", "gone") == "gone"
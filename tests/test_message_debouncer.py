@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+from src.tg_bot.services.message_debouncer import MessageDebouncer, create_message_debouncer
+
+
+async def _send_burst(debouncer, chat_key, texts, gap):
+  tasks = []
+  for text in texts:
+    tasks.append(asyncio.create_task(debouncer.collect(chat_key, text)))
+    await asyncio.sleep(gap)
+  return await asyncio.gather(*tasks)
+
+
+def test_disabled_returns_text_immediately():
+  debouncer = MessageDebouncer(enabled=False, window_seconds=10)
+  t0 = time.monotonic()
+  assert asyncio.run(debouncer.collect(1, "вопрос")) == "вопрос"
+  assert time.monotonic() - t0 < 1
+
+
+def test_single_message_passes_after_window():
+  debouncer = MessageDebouncer(enabled=True, window_seconds=0.05)
+  assert asyncio.run(debouncer.collect(1, " вопрос ")) == "вопрос"
+
+
+def test_burst_is_merged_into_last_call():
+  debouncer = MessageDebouncer(enabled=True, window_seconds=0.2, max_wait_seconds=5)
+  results = asyncio.run(_send_burst(debouncer, 1, ["когда", "", "сессия?"], gap=0.02))
+  # Пустая часть (стикер) в склейку не попадает; ответ готовит только последний вызов.
+  assert results == [None, None, "когда\nсессия?"]
+
+
+def test_chats_are_debounced_independently():
+  debouncer = MessageDebouncer(enabled=True, window_seconds=0.1)
+
+  async def scenario():
+    return await asyncio.gather(
+        _send_burst(debouncer, "a", ["a1", "a2"], gap=0.01),
+        _send_burst(debouncer, "b", ["b1"], gap=0.01),
+    )
+
+  chat_a, chat_b = asyncio.run(scenario())
+  assert chat_a == [None, "a1\na2"]
+  assert chat_b == ["b1"]
+
+
+def test_messages_after_window_start_new_burst():
+  debouncer = MessageDebouncer(enabled=True, window_seconds=0.05)
+  results = asyncio.run(_send_burst(debouncer, 1, ["первый", "второй"], gap=0.15))
+  assert results == ["первый", "второй"]
+
+
+def test_max_wait_caps_delay_of_continuous_stream():
+  debouncer = MessageDebouncer(enabled=True, window_seconds=0.2, max_wait_seconds=0.2)
+
+  async def scenario():
+    t0 = time.monotonic()
+    results = await _send_burst(debouncer, 1, ["раз", "два"], gap=0.1)
+    return results, time.monotonic() - t0
+
+  results, elapsed = asyncio.run(scenario())
+  assert results == [None, "раз\nдва"]
+  # Второе сообщение ждёт не полное окно, а остаток max_wait от начала серии.
+  assert elapsed < 0.28
+
+
+def test_all_empty_burst_returns_empty_string():
+  debouncer = MessageDebouncer(enabled=True, window_seconds=0.05)
+  results = asyncio.run(_send_burst(debouncer, 1, ["", "  "], gap=0.01))
+  assert results == [None, ""]
+
+
+def test_factory_reads_bot_debounce_section():
+  assert create_message_debouncer({}).enabled is False
+  debouncer = create_message_debouncer({"bot": {"debounce": {"enabled": True, "window_seconds": 0.5}}})
+  assert debouncer.enabled is True
+  assert debouncer._window == 0.5
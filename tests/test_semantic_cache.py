@@ -0,0 +1,116 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.util.semantic_cache import SemanticAnswerCache, SemanticCacheEntry
+
+
+class FakeClock:
+  def __init__(self) -> None:
+    self.now = 0.0
+
+  def __call__(self) -> float:
+    return self.now
+
+
+def _unit(*values: float) -> np.ndarray:
+  vec = np.asarray(values, dtype=np.float32)
+  return vec / np.linalg.norm(vec)
+
+
+def _entry(answer: str) -> SemanticCacheEntry:
+  return SemanticCacheEntry(question=f"q-{answer}", answer=answer, chunk_ids=("c1",))
+
+
+def test_hit_above_threshold_miss_below():
+  cache = SemanticAnswerCache(3, threshold=0.95)
+  cache.add(_unit(1, 0, 0), _entry("a"), "v1")
+
+  hit, invalidated = cache.lookup(_unit(1, 0.1, 0), "v1")
+  assert not invalidated
+  assert hit is not None
+  assert hit.entry.answer == "a"
+  assert hit.score >= 0.95
+
+  miss, _ = cache.lookup(_unit(1, 1, 0), "v1")
+  assert miss is None
+
+
+def test_empty_cache_misses():
+  cache = SemanticAnswerCache(3)
+  assert cache.lookup(_unit(1, 0, 0), "v1") == (None, False)
+  assert len(cache) == 0
+
+
+def test_best_match_wins():
+  cache = SemanticAnswerCache(3, threshold=0.5)
+  cache.add(_unit(1, 0, 0), _entry("a"), "v1")
+  cache.add(_unit(1, 1, 0), _entry("b"), "v1")
+  hit, _ = cache.lookup(_unit(1, 0.9, 0), "v1")
+  assert hit.entry.answer == "b"
+
+
+def test_ttl_expiry():
+  clock = FakeClock()
+  cache = SemanticAnswerCache(3, ttl_seconds=10, clock=clock)
+  cache.add(_unit(1, 0, 0), _entry("a"), "v1")
+  clock.now = 9.9
+  assert cache.lookup(_unit(1, 0, 0), "v1")[0] is not None
+  clock.now = 10.0
+  assert cache.lookup(_unit(1, 0, 0), "v1")[0] is None
+  assert len(cache) == 0
+
+
+def test_expired_slot_is_reused_before_lru():
+  clock = FakeClock()
+  cache = SemanticAnswerCache(3, max_entries=2, ttl_seconds=10, clock=clock)
+  cache.add(_unit(1, 0, 0), _entry("a"), "v1")
+  clock.now = 5
+  cache.add(_unit(0, 1, 0), _entry("b"), "v1")
+  clock.now = 12  # a протух, b ещё жив
+  cache.add(_unit(0, 0, 1), _entry("c"), "v1")
+  assert cache.lookup(_unit(0, 1, 0), "v1")[0].entry.answer == "b"
+  assert cache.lookup(_unit(0, 0, 1), "v1")[0].entry.answer == "c"
+
+
+def test_evicts_least_recently_used():
+  clock = FakeClock()
+  cache = SemanticAnswerCache(3, max_entries=2, clock=clock)
+  cache.add(_unit(1, 0, 0), _entry("a"), "v1")
+  clock.now = 1
+  cache.add(_unit(0, 1, 0), _entry("b"), "v1")
+  clock.now = 2
+  assert cache.lookup(_unit(1, 0, 0), "v1")[0] is not None  # a свежее b
+  clock.now = 3
+  cache.add(_unit(0, 0, 1), _entry("c"), "v1")
+  assert cache.lookup(_unit(0, 1, 0), "v1")[0] is None
+  assert cache.lookup(_unit(1, 0, 0), "v1")[0].entry.answer == "a"
+  assert cache.lookup(_unit(0, 0, 1), "v1")[0].entry.answer == "c"
+  assert len(cache) == 2
+
+
+def test_index_version_change_clears_cache():
+  cache = SemanticAnswerCache(3)
+  cache.add(_unit(1, 0, 0), _entry("a"), "v1")
+
+  hit, invalidated = cache.lookup(_unit(1, 0, 0), "v2")
+  assert hit is None
+  assert invalidated
+  assert len(cache) == 0
+
+  # Повторный lookup с той же новой версией — уже без очистки.
+  assert cache.lookup(_unit(1, 0, 0), "v2") == (None, False)
+
+
+def test_first_version_is_not_reported_as_invalidation():
+  cache = SemanticAnswerCache(3)
+  assert cache.lookup(_unit(1, 0, 0), "v1") == (None, False)
+
+
+def test_add_with_new_version_drops_old_entries():
+  cache = SemanticAnswerCache(3)
+  cache.add(_unit(1, 0, 0), _entry("a"), "v1")
+  cache.add(_unit(0, 1, 0), _entry("b"), "v2")
+  assert len(cache) == 1
+  assert cache.lookup(_unit(1, 0, 0), "v2")[0] is None
+  assert cache.lookup(_unit(0, 1, 0), "v2")[0].entry.answer == "b"
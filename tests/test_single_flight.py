@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from src.util.single_flight import SingleFlight
+
+
+async def _collect(stream):
+  return [chunk async for chunk in stream]
+
+
+def test_concurrent_calls_share_one_producer():
+  async def scenario():
+    flight = SingleFlight("test_sf")
+    calls = 0
+    gate = asyncio.Event()
+
+    async def factory():
+      nonlocal calls
+      calls += 1
+      yield "a"
+      await gate.wait()
+      yield "b"
+
+    first = asyncio.create_task(_collect(flight.stream("q", factory)))
+    await asyncio.sleep(0.01)
+    # Опоздавший подписчик получает уже выданные чанки с начала.
+    second = asyncio.create_task(_collect(flight.stream("q", factory)))
+    await asyncio.sleep(0.01)
+    gate.set()
+    assert await first == ["a", "b"]
+    assert await second == ["a", "b"]
+    assert calls == 1
+
+  asyncio.run(scenario())
+
+
+def test_key_is_released_after_completion():
+  async def scenario():
+    flight = SingleFlight("test_sf")
+    calls = 0
+
+    async def factory():
+      nonlocal calls
+      calls += 1
+      yield calls
+
+    assert await _collect(flight.stream("q", factory)) == [1]
+    assert await _collect(flight.stream("q", factory)) == [2]
+
+  asyncio.run(scenario())
+
+
+def test_different_keys_run_separately():
+  async def scenario():
+    flight = SingleFlight("test_sf")
+
+    def factory_for(value):
+      async def factory():
+        yield value
+      return factory
+
+    results = await asyncio.gather(
+        _collect(flight.stream("a", factory_for(1))),
+        _collect(flight.stream("b", factory_for(2))),
+    )
+    assert results == [[1], [2]]
+
+  asyncio.run(scenario())
+
+
+def test_producer_error_reaches_every_subscriber():
+  async def scenario():
+    flight = SingleFlight("test_sf")
+    gate = asyncio.Event()
+
+    async def factory():
+      yield "partial"
+      await gate.wait()
+      raise RuntimeError("boom")
+
+    tasks = [asyncio.create_task(_collect(flight.stream("q", factory))) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    gate.set()
+    for task in tasks:
+      with pytest.raises(RuntimeError, match="boom"):
+        await task
+
+  asyncio.run(scenario())
+
+
+def test_producer_cancelled_only_when_all_subscribers_leave():
+  async def scenario():
+    flight = SingleFlight("test_sf")
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def factory():
+      started.set()
+      try:
+        await asyncio.sleep(10)
+        yield "never"
+      except asyncio.CancelledError:
+        cancelled.set()
+        raise
+
+    first = asyncio.create_task(_collect(flight.stream("q", factory)))
+    second = asyncio.create_task(_collect(flight.stream("q", factory)))
+    await started.wait()
+    first.cancel()
+    await asyncio.gather(first, return_exceptions=True)
+    await asyncio.sleep(0.01)
+    assert not cancelled.is_set()
+    second.cancel()
+    await asyncio.gather(second, return_exceptions=True)
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+  asyncio.run(scenario())
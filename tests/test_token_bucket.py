@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+import pytest
+
+from src.util.token_bucket import TokenBucket
+
+
+async def _timed_acquires(bucket: TokenBucket, n: int) -> float:
+  t0 = time.monotonic()
+  for _ in range(n):
+    await bucket.acquire()
+  return time.monotonic() - t0
+
+
+def test_rate_must_be_positive():
+  with pytest.raises(ValueError):
+    TokenBucket(0)
+
+
+def test_burst_up_to_capacity_is_immediate():
+  async def scenario():
+    return await _timed_acquires(TokenBucket(rate=10, capacity=5), 5)
+
+  assert asyncio.run(scenario()) < 0.05
+
+
+def test_acquires_beyond_capacity_follow_rate():
+  async def scenario():
+    return await _timed_acquires(TokenBucket(rate=50, capacity=1), 6)
+
+  # Первый токен есть сразу, остальные пять — по 1/50 с.
+  assert 0.09 <= asyncio.run(scenario()) < 1.0
+
+
+def test_concurrent_acquires_share_the_rate():
+  async def scenario():
+    bucket = TokenBucket(rate=100, capacity=1)
+    t0 = time.monotonic()
+    await asyncio.gather(*(bucket.acquire() for _ in range(11)))
+    return time.monotonic() - t0
+
+  assert 0.09 <= asyncio.run(scenario()) < 1.0
+
+
+def test_pause_blocks_and_empties_bucket():
+  async def scenario():
+    bucket = TokenBucket(rate=1000, capacity=10)
+    bucket.pause(0.1)
+    return await _timed_acquires(bucket, 1)
+
+  assert asyncio.run(scenario()) >= 0.09
+
+
+def test_shorter_pause_does_not_shorten_longer_one():
+  async def scenario():
+    bucket = TokenBucket(rate=1000, capacity=10)
+    bucket.pause(0.15)
+    bucket.pause(0.01)
+    return await _timed_acquires(bucket, 1)
+
+  assert asyncio.run(scenario()) >= 0.14
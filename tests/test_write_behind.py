@@ -0,0 +1,146 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+# Модели и asession импортируют настройки БД; соединение тестам не нужно — _insert подменяется.
+for _name, _value in (("DB__NAME", "test"), ("DB__USER", "test"), ("DB__PASS", "test"),
+                      ("TGSERVER__TOKEN", "0:test")):
+  os.environ.setdefault(_name, _value)
+
+from sqlalchemy.exc import IntegrityError  # noqa: E402
+
+from src.tg_bot.repositories.write_behind import WriteBehindAnswerRepository  # noqa: E402
+
+
+class FakeInnerRepo:
+  def __init__(self, stored=()):
+    self.stored = list(stored)
+
+  async def create(self, session_id, question, bot_answer):
+    raise AssertionError("write-behind не должен писать синхронно")
+
+  async def get_session_answers(self, session_id, limit=5):
+    return [a for a in self.stored if a.session_id == session_id][-limit:]
+
+
+class InsertRecorder:
+  """Подмена WriteBehindAnswerRepository._insert: пишет вопросы пачек, по правилам падает."""
+
+  def __init__(self, fail_batches=False, bad_questions=(), down_after=None):
+    self.batches = []
+    self.fail_batches = fail_batches
+    self.bad_questions = set(bad_questions)
+    self.down_after = down_after
+
+  async def __call__(self, repo, batch):
+    questions = [a.question for a in batch]
+    if len(batch) > 1 and self.fail_batches:
+      raise IntegrityError("INSERT", {}, Exception("batch rejected"))
+    if self.bad_questions.intersection(questions):
+      raise IntegrityError("INSERT", {}, Exception("null value"))
+    if self.down_after is not None and len(self.batches) >= self.down_after:
+      raise ConnectionError("db is down")
+    self.batches.append(questions)
+
+
+def _repo(monkeypatch, recorder, **kwargs):
+  async def _insert(self, batch):
+    await recorder(self, batch)
+
+  monkeypatch.setattr(WriteBehindAnswerRepository, "_insert", _insert)
+  kwargs.setdefault("flush_interval_ms", 60_000)
+  return WriteBehindAnswerRepository(FakeInnerRepo(), **kwargs)
+
+
+async def _close(repo):
+  if repo._flusher is not None:
+    repo._flusher.cancel()
+    await asyncio.gather(repo._flusher, return_exceptions=True)
+
+
+def test_flush_writes_buffer_in_batches(monkeypatch):
+  recorder = InsertRecorder()
+  repo = _repo(monkeypatch, recorder, max_batch_rows=2)
+
+  async def scenario():
+    for i in range(5):
+      await repo.create("s1", f"q{i}", f"a{i}")
+    written = await repo.flush()
+    await _close(repo)
+    return written
+
+  assert asyncio.run(scenario()) == 5
+  assert recorder.batches == [["q0", "q1"], ["q2", "q3"], ["q4"]]
+  assert repo._buffer == []
+  assert repo._pending_by_session == {}
+
+
+def test_rejected_batch_drops_only_bad_rows(monkeypatch):
+  recorder = InsertRecorder(fail_batches=True, bad_questions={"q2"})
+  repo = _repo(monkeypatch, recorder)
+
+  async def scenario():
+    for i in range(1, 4):
+      await repo.create("s1", f"q{i}", f"a{i}")
+    written = await repo.flush()
+    await _close(repo)
+    return written
+
+  assert asyncio.run(scenario()) == 2
+  assert recorder.batches == [["q1"], ["q3"]]
+  assert repo._buffer == []
+  assert repo._pending_by_session == {}
+
+
+def test_connection_error_keeps_rest_for_next_flush(monkeypatch):
+  recorder = InsertRecorder(fail_batches=True, down_after=1)
+  repo = _repo(monkeypatch, recorder)
+
+  async def scenario():
+    for i in range(1, 4):
+      await repo.create("s1", f"q{i}", f"a{i}")
+    first = await repo.flush()
+    pending = [a.question for a in repo._buffer]
+    recorder.fail_batches = False
+    recorder.down_after = None
+    second = await repo.flush()
+    await _close(repo)
+    return first, pending, second
+
+  first, pending, second = asyncio.run(scenario())
+  assert first == 1
+  assert pending == ["q2", "q3"]
+  assert second == 2
+  assert recorder.batches == [["q1"], ["q2", "q3"]]
+  assert repo._buffer == []
+
+
+def test_full_buffer_drops_new_answers(monkeypatch):
+  recorder = InsertRecorder()
+  repo = _repo(monkeypatch, recorder, max_batch_rows=2, max_buffer_rows=3)
+
+  async def scenario():
+    for i in range(5):
+      await repo.create("s1", f"q{i}", f"a{i}")
+    buffered = [a.question for a in repo._buffer]
+    await _close(repo)
+    return buffered
+
+  assert asyncio.run(scenario()) == ["q0", "q1", "q2"]
+
+
+def test_session_history_sees_unwritten_answers(monkeypatch):
+  recorder = InsertRecorder()
+  repo = _repo(monkeypatch, recorder)
+
+  async def scenario():
+    await repo.create("s1", "q1", "a1")
+    await repo.create("s2", "other", "x")
+    await repo.create("s1", "q2", "a2")
+    rows = await repo.get_session_answers("s1", limit=5)
+    await _close(repo)
+    return [a.question for a in rows]
+
+  assert asyncio.run(scenario()) == ["q1", "q2"]